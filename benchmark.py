@@ -0,0 +1,119 @@
+# Copyright (C) 2021 and later: Unicode, Inc. and others.
+# License & terms of use: http://www.unicode.org/copyright.html
+# Lint as: python3
+from lstm_word_segmentation.benchmark import get_available_models, run_benchmark, compare_benchmarks
+import sys, getopt, json
+
+"""
+Benchmarks the throughput and latency of segmenting text with the shipped
+models and with ICU as a baseline, and writes the results as JSON.
+
+Each model is measured on a fixed slice of its test data (if Data/ is
+available) and on synthetic lines of a few lengths, in a new process, so its
+load time and peak RSS are its own. With -b, the results are compared with
+earlier results, and the program exits with status 1 if a metric is worse
+than in the baseline by more than the tolerance.
+"""
+
+def print_usage():
+  print('benchmark.py -h -l -m models -n lines -L lengths -r repeats -s -o output -b baseline -t tolerance')
+  print("""
+        -h      \tHelp / Usage
+        -l      \tList models
+        -m models\tComma separated models to benchmark (default all)
+        -n lines\tNumber of lines of each dataset (default 100)
+        -L lengths\tComma separated lengths of synthetic lines
+                \t(default 16,64,256,1024)
+        -r repeats\tNumber of times each measurement is repeated (default 3)
+        -s      \tOnly use synthetic lines, not the test data
+        --no-icu\tDo not benchmark ICU
+        -o output\tWrite the results to output (default standard output)
+        -b baseline\tCompare the results with a baseline results file
+        -t tolerance\tRelative change that is not a regression (default 0.1)
+        """)
+
+def print_summary(results):
+  print("{:45} {:14} {:>12} {:>10} {:>10} {:>10}".format(
+      "Model", "Dataset", "chars/s", "p50 ms", "p99 ms", "batch c/s"),
+      file=sys.stderr)
+  for name, model_results in results["models"].items():
+    print("{:45} load {:.1f} ms, peak RSS {:.0f} MB".format(
+        name, model_results["load_time_s"] * 1000, model_results["peak_rss_mb"]),
+        file=sys.stderr)
+    for dataset, metrics in model_results["datasets"].items():
+      print("{:45} {:14} {:12.0f} {:10.3f} {:10.3f} {:10.0f}".format(
+          "", dataset, metrics["chars_per_sec"], metrics["latency_p50_ms"],
+          metrics["latency_p99_ms"], metrics["batched_chars_per_sec"]),
+          file=sys.stderr)
+
+def main(argv):
+   models = get_available_models()
+   num_lines = 100
+   lengths = [16, 64, 256, 1024]
+   repeats = 3
+   synthetic_only = False
+   icu_baseline = True
+   output_file = None
+   baseline_file = None
+   tolerance = 0.1
+   try:
+     opts, args = getopt.getopt(argv, "hlm:n:L:r:so:b:t:", ["no-icu"])
+   except getopt.GetoptError:
+     print_usage()
+     sys.exit(2)
+   for opt, arg in opts:
+      if opt == '-m':
+        models = arg.split(",")
+      if opt == '-n':
+        num_lines = max(int(arg), 1)
+      if opt == '-L':
+        lengths = [int(length) for length in arg.split(",") if length]
+      if opt == '-r':
+        repeats = max(int(arg), 1)
+      if opt == '-s':
+        synthetic_only = True
+      if opt == '--no-icu':
+        icu_baseline = False
+      if opt == '-o':
+        output_file = arg
+      if opt == '-b':
+        baseline_file = arg
+      if opt == '-t':
+        tolerance = float(arg)
+      if opt == '-h':
+        print_usage()
+        sys.exit()
+      if opt == '-l':
+        print("Supported Models")
+        for m in get_available_models():
+          print("  ", m)
+        sys.exit()
+
+   unknown = [m for m in models if m not in get_available_models()]
+   if unknown:
+     print("Unknown models:", ", ".join(unknown), file=sys.stderr)
+     sys.exit(2)
+
+   results = run_benchmark(models, num_lines=num_lines,
+                           synthetic_lengths=lengths, repeats=repeats,
+                           icu_baseline=icu_baseline,
+                           synthetic_only=synthetic_only, verbose=False)
+   print_summary(results)
+   if output_file is None:
+     print(json.dumps(results, indent=2))
+   else:
+     with open(output_file, "w") as wfile:
+       json.dump(results, wfile, indent=2)
+
+   if baseline_file is not None:
+     with open(baseline_file) as rfile:
+       baseline = json.load(rfile)
+     regressions = compare_benchmarks(results, baseline, tolerance)
+     for regression in regressions:
+       print("Regression:", regression, file=sys.stderr)
+     if regressions:
+       sys.exit(1)
+     print("No regressions against", baseline_file, file=sys.stderr)
+
+if __name__ == "__main__":
+  main(sys.argv[1:])
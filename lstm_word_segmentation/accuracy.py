@@ -1,4 +1,9 @@
-from lstm_word_segmentation.helpers import diff_strings
+import numpy as np
+from lstm_word_segmentation.bies import bies_to_codes
+
+# A lookup table from the ASCII code of a BIES label to whether the label starts a word (b or s)
+_IS_WORD_START = np.zeros(256, dtype=bool)
+_IS_WORD_START[[ord("b"), ord("s")]] = True
 
 
 class Accuracy:
@@ -19,31 +24,84 @@ class Accuracy:
         """
         This function updates the accuracy with respect to a new segmented line and its true segmentation.
         Args:
-            true_bies: a string that indicates the true BIES sequence
-            est_bies: a string that indicates the estimated BIES sequence
+            true_bies: a string (or a numpy array of label indices) that indicates the true BIES sequence
+            est_bies: a string (or a numpy array of label indices) that indicates the estimated BIES sequence
+        """
+        true_codes = bies_to_codes(true_bies)
+        est_codes = bies_to_codes(est_bies)
+        if len(true_codes) != len(est_codes):
+            self.update_many([true_bies], [est_bies])
+            return
+        self.bies_length += len(true_codes)
+        self.bies_mismatch += int(np.count_nonzero(true_codes != est_codes))
+        self._update_words(true_codes, est_codes, len(true_codes), len(est_codes))
+
+    def update_many(self, true_bies_list, est_bies_list):
+        """
+        This function updates the accuracy with respect to several segmented lines at once. It gives the same counts as
+        calling update for each line, but all lines are handled by a few numpy operations on their concatenated labels,
+        which is much faster for many short lines.
+        Args:
+            true_bies_list: a list of strings (or numpy arrays of label indices) of the true BIES sequences
+            est_bies_list: a list of strings (or numpy arrays of label indices) of the estimated BIES sequences
+        """
+        if len(true_bies_list) == 0:
+            return
+        true_codes = [bies_to_codes(bies) for bies in true_bies_list]
+        est_codes = [bies_to_codes(bies) for bies in est_bies_list]
+        true_lengths = np.array([len(codes) for codes in true_codes], dtype=np.int64)
+        est_lengths = np.array([len(codes) for codes in est_codes], dtype=np.int64)
+        same_length = true_lengths == est_lengths
+        spans = np.maximum(true_lengths, est_lengths)
+        self.bies_length += int(true_lengths.sum())
+
+        # Lines are concatenated, and a line whose sequences have different lengths is padded to the longer one with
+        # zeros, which are not word starts. Such lines count as -1 mismatches, as in diff_strings.
+        if same_length.all():
+            true_all = np.concatenate(true_codes)
+            est_all = np.concatenate(est_codes)
+            self.bies_mismatch += int(np.count_nonzero(true_all != est_all))
+        else:
+            true_all = np.concatenate([np.pad(codes, (0, span - len(codes))) for codes, span in zip(true_codes, spans)])
+            est_all = np.concatenate([np.pad(codes, (0, span - len(codes))) for codes, span in zip(est_codes, spans)])
+            for _ in range(np.count_nonzero(~same_length)):
+                print("Warning: length of true_bies and est_bies are different")
+            in_same_length = np.repeat(same_length, spans)
+            self.bies_mismatch += int(np.count_nonzero((true_all != est_all) & in_same_length))
+            self.bies_mismatch -= int(np.count_nonzero(~same_length))
+        line_offsets = np.cumsum(spans) - spans
+        self._update_words(true_all, est_all, line_offsets + true_lengths, line_offsets + est_lengths)
+
+    def _update_words(self, true_codes, est_codes, true_ends, est_ends):
+        """
+        This function updates the word counts with respect to the (concatenated) BIES codes of lines. A word is a unit
+        that starts with b or s and all units up to the next word boundary: the next such unit or the end of its line.
+        So the number of words is the number of b and s labels, and an estimated word is correct if the true sequence
+        has a word with the same start, whose end is the next word boundary of the estimated sequence too.
+        Args:
+            true_codes: the ASCII codes of the true BIES sequences (see bies_to_codes)
+            est_codes: the ASCII codes of the estimated BIES sequences
+            true_ends: the index (or an array of indices) of the end of each line in true_codes
+            est_ends: the index (or an array of indices) of the end of each line in est_codes
         """
-        if len(true_bies) != len(est_bies):
-            print("Warning: length of true_bies and est_bies are different")
-        self.bies_length += len(true_bies)
-        self.bies_mismatch += diff_strings(true_bies, est_bies)
+        # Boundary bitmaps: word starts and the end of each line
+        true_starts = _IS_WORD_START[true_codes]
+        est_starts = _IS_WORD_START[est_codes]
+        true_boundaries = np.append(true_starts, False)
+        true_boundaries[true_ends] = True
+        est_boundaries = np.append(est_starts, False)
+        est_boundaries[est_ends] = True
+        self.true_words += int(np.count_nonzero(true_starts))
+        self.segmented_words += int(np.count_nonzero(est_starts))
 
-        true_word_brkpoints = []
-        for i in range(len(true_bies)):
-            if true_bies[i] in ['b', 's']:
-                true_word_brkpoints.append(i)
-        true_word_brkpoints.append(len(true_bies))
-        est_word_brkpoints = []
-        for i in range(len(est_bies)):
-            if est_bies[i] in ['b', 's']:
-                est_word_brkpoints.append(i)
-        est_word_brkpoints.append(len(est_bies))
-        true_words_tuples = [(true_word_brkpoints[i], true_word_brkpoints[i + 1]) for i in
-                             range(len(true_word_brkpoints) - 1)]
-        est_words_tuples = [(est_word_brkpoints[i], est_word_brkpoints[i + 1]) for i in
-                            range(len(est_word_brkpoints) - 1)]
-        self.true_words += len(true_words_tuples)
-        self.segmented_words += len(est_words_tuples)
-        self.correctly_segmented_words += len(set(est_words_tuples).intersection(true_words_tuples))
+        # A word that starts in both sequences is correct if the next true boundary is an estimated boundary, and there
+        # is no estimated boundary before it. est_boundary_counts[k] is the number of estimated boundaries up to k.
+        common_starts = np.nonzero(true_starts & est_starts)[0]
+        true_boundary_positions = np.nonzero(true_boundaries)[0]
+        word_ends = true_boundary_positions[np.searchsorted(true_boundary_positions, common_starts, side="right")]
+        est_boundary_counts = np.cumsum(est_boundaries)
+        correct = est_boundaries[word_ends] & (est_boundary_counts[word_ends - 1] == est_boundary_counts[common_starts])
+        self.correctly_segmented_words += int(np.count_nonzero(correct))
 
     def merge_accuracy(self, other):
         """
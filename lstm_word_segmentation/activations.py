@@ -0,0 +1,26 @@
+import numpy as np
+
+
+def sigmoid(inp, out=None):
+    """
+    Computes the sigmoid function of a numpy array element-wise, with no Python loop. It uses the identity
+    sigmoid(x) = (1 + tanh(x/2)) / 2, which never overflows for large negative or positive inputs.
+    Args:
+        inp: the input numpy array
+        out: an optional array (can be inp itself) that the output is written in, to avoid allocating a new array
+    """
+    out = np.multiply(inp, 0.5, out=out)
+    np.tanh(out, out=out)
+    out *= 0.5
+    out += 0.5
+    return out
+
+
+def tanh(inp, out=None):
+    """
+    Computes the tanh function of a numpy array element-wise.
+    Args:
+        inp: the input numpy array
+        out: an optional array (can be inp itself) that the output is written in, to avoid allocating a new array
+    """
+    return np.tanh(inp, out=out)
@@ -0,0 +1,301 @@
+from pathlib import Path
+import contextlib
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+import numpy as np
+from . import constants
+from .break_iterators import get_break_iterator, get_brkpoints_list
+from .model_io import MODELS_DIR, embedding_from_name
+from .text_helpers import get_best_files, iterate_lines_of_text
+
+# The version of the layout of benchmark results. Results of different versions are not compared.
+BENCHMARK_VERSION = 1
+
+# The name that the ICU baseline has in benchmark results
+ICU_BASELINE = "ICU"
+
+# Metrics of a dataset or model for which larger values are better; for all other compared metrics smaller values are
+# better
+_HIGHER_IS_BETTER = ["chars_per_sec", "lines_per_sec", "batched_chars_per_sec", "batched_lines_per_sec"]
+_LOWER_IS_BETTER = ["latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "load_time_s", "peak_rss_mb"]
+
+
+def get_available_models():
+    """
+    This function returns the sorted names of all models in the Models directory that can be loaded.
+    """
+    return sorted(model_dir.name for model_dir in MODELS_DIR.iterdir()
+                  if any(Path.joinpath(model_dir, name).exists() for name in ["weights.bin", "weights.json"]))
+
+
+def get_model_language(model_name):
+    """
+    This function returns the language of a model based on its name ("Thai" or "Burmese"), or None.
+    Args:
+        model_name: name of the model
+    """
+    for language in ["Thai", "Burmese"]:
+        if language in model_name:
+            return language
+    return None
+
+
+def get_test_lines(language, exclusive, num_lines):
+    """
+    This function returns the first num_lines unsegmented lines of the test data of a language (BEST texts 40 and later
+    for Thai, and my_test_segmented.txt for Burmese), or an empty list if the data is not available.
+    Args:
+        language: "Thai" or "Burmese"
+        exclusive: if True, the exclusive version of the test data is used
+        num_lines: the number of lines
+    """
+    data_dir = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data")
+    files = []
+    if language == "Thai":
+        files = get_best_files(starting_text=40, ending_text=60, exclusive=exclusive)
+    elif language == "Burmese":
+        name = "my_test_segmented_exclusive.txt" if exclusive else "my_test_segmented.txt"
+        files = [Path.joinpath(data_dir, name)]
+    lines = []
+    for file in files:
+        if not Path(file).exists():
+            continue
+        for line in iterate_lines_of_text(file, "man_segmented"):
+            if len(lines) == num_lines:
+                return lines
+            lines.append(line.unsegmented)
+    return lines
+
+
+def make_synthetic_lines(language, length, num_lines, seed=0):
+    """
+    This function returns num_lines random lines of a language with `length` code points each. Grapheme clusters are
+    drawn by their frequency in the language (see constants), with a space after one in 20 of them, so the lines look
+    like text to the models, and the same seed always gives the same lines.
+    Args:
+        language: "Thai" or "Burmese"
+        length: the number of code points of each line
+        num_lines: the number of lines
+        seed: the seed of the random generator
+    """
+    ratios = constants.THAI_GRAPH_CLUST_RATIO
+    if language == "Burmese":
+        ratios = constants.BURMESE_GRAPH_CLUST_RATIO
+    clusters = list(ratios.keys())
+    probs = np.array(list(ratios.values()), dtype=np.float64)
+    probs /= probs.sum()
+    rng = np.random.default_rng(seed)
+    lines = []
+    for _ in range(num_lines):
+        pieces = []
+        size = 0
+        while size < length:
+            cluster = clusters[rng.choice(len(clusters), p=probs)]
+            if rng.random() < 0.05:
+                cluster += " "
+            pieces.append(cluster)
+            size += len(cluster)
+        lines.append("".join(pieces)[:length])
+    return lines
+
+
+def get_benchmark_datasets(language, num_lines, synthetic_lengths, seed=0, exclusive=False, synthetic_only=False):
+    """
+    This function returns a dictionary from dataset names to lists of lines that models of a language are benchmarked
+    on: "test", a fixed slice of the test data (if the data is available), and "synthetic_L" for each length L.
+    Args:
+        language: "Thai" or "Burmese"
+        num_lines: the number of lines of each dataset
+        synthetic_lengths: the lengths (in code points) of lines of synthetic datasets
+        seed: the seed of synthetic lines
+        exclusive: if True, the exclusive version of the test data is used
+        synthetic_only: if True, the test data is not used
+    """
+    datasets = {}
+    if not synthetic_only:
+        test_lines = get_test_lines(language, exclusive, num_lines)
+        if test_lines:
+            datasets["test"] = test_lines
+    for length in synthetic_lengths:
+        datasets["synthetic_{}".format(length)] = make_synthetic_lines(language, length, num_lines, seed)
+    return datasets
+
+
+def get_peak_rss_mb():
+    """
+    This function returns the peak resident set size of the current process in megabytes.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak_rss / (1024 * 1024)
+    return peak_rss / 1024
+
+
+def measure_lines(segment_line, segment_lines, lines, repeats=3, warmup=3):
+    """
+    This function measures how fast a segmenter segments a list of lines, and returns a dictionary of metrics:
+    characters and lines per second and percentiles of the latency of segmenting lines one by one, and characters and
+    lines per second of segmenting all lines at once. Each measurement is repeated, and the fastest time of each line
+    (and of the whole list) is used, which makes the results less sensitive to other work on the machine.
+    Args:
+        segment_line: a function that segments one line
+        segment_lines: a function that segments a list of lines
+        lines: the list of lines
+        repeats: the number of times each measurement is repeated
+        warmup: the number of lines that are segmented before measuring, e.g. to fill the memo of generalized vectors
+    """
+    for line in lines[:warmup]:
+        segment_line(line)
+    latencies = np.full(len(lines), np.inf)
+    batched_time = np.inf
+    for _ in range(max(repeats, 1)):
+        for i, line in enumerate(lines):
+            start = time.perf_counter()
+            segment_line(line)
+            latencies[i] = min(latencies[i], time.perf_counter() - start)
+        start = time.perf_counter()
+        segment_lines(lines)
+        batched_time = min(batched_time, time.perf_counter() - start)
+    batched_time = max(batched_time, 1e-9)
+    total_time = max(float(latencies.sum()), 1e-9)
+    num_chars = sum(len(line) for line in lines)
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1000 if len(lines) > 0 else [0, 0, 0]
+    return {"lines": len(lines), "chars": num_chars,
+            "chars_per_sec": num_chars / total_time, "lines_per_sec": len(lines) / total_time,
+            "latency_p50_ms": float(percentiles[0]), "latency_p95_ms": float(percentiles[1]),
+            "latency_p99_ms": float(percentiles[2]),
+            "batched_chars_per_sec": num_chars / batched_time, "batched_lines_per_sec": len(lines) / batched_time}
+
+
+def _icu_segment_line(line):
+    """
+    This function segments a line with the ICU word break iterator, in the format of segment_arbitrary_line.
+    Args:
+        line: the unsegmented line
+    """
+    brkpoints = get_brkpoints_list(line, "word")
+    return "|" + "|".join(line[brkpoints[i]: brkpoints[i + 1]] for i in range(len(brkpoints) - 1)) + "|"
+
+
+def benchmark_model(model_name, datasets, repeats=3):
+    """
+    This function loads a model and measures it on datasets (see measure_lines). It returns a dictionary with the
+    time that loading and compiling the model takes, the peak RSS of the process, and the metrics of each dataset.
+    Since the peak RSS of a process never decreases, each model should be benchmarked in a new process (see
+    run_benchmark).
+    Args:
+        model_name: name of the model, or ICU_BASELINE for ICU's dictionary based segmentation
+        datasets: a dictionary from dataset names to lists of lines
+        repeats: the number of times each measurement is repeated (see measure_lines)
+    """
+    # Imported here so that only the processes that benchmark models import the model code
+    from .word_segmenter import pick_lstm_model
+    start = time.perf_counter()
+    if model_name == ICU_BASELINE:
+        # Loading ICU is creating its break iterators
+        get_break_iterator("word")
+        segment_line = _icu_segment_line
+
+        def segment_lines(lines):
+            return [_icu_segment_line(line) for line in lines]
+    else:
+        # Messages printed while loading go to stderr, so that results can be printed to stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            word_segmenter = pick_lstm_model(model_name=model_name, embedding=embedding_from_name(model_name),
+                                             train_data="", eval_data="")
+            word_segmenter.compile_model()
+        segment_line = word_segmenter.segment_arbitrary_line
+        segment_lines = word_segmenter.segment_lines
+    load_time = time.perf_counter() - start
+    results = {name: measure_lines(segment_line, segment_lines, lines, repeats) for name, lines in datasets.items()}
+    return {"load_time_s": load_time, "peak_rss_mb": get_peak_rss_mb(), "datasets": results}
+
+
+def run_benchmark(model_names, num_lines=100, synthetic_lengths=(16, 64, 256, 1024), seed=0, repeats=3,
+                  icu_baseline=True, synthetic_only=False, verbose=True):
+    """
+    This function benchmarks models and returns the results as a JSON-serializable dictionary. Each model (and the ICU
+    baseline, once per language) is run in a new process, so that its load time and peak RSS are not affected by
+    other models.
+    Args:
+        model_names: a list of names of models in the Models directory
+        num_lines: the number of lines of each dataset (see get_benchmark_datasets)
+        synthetic_lengths: the lengths of lines of synthetic datasets
+        seed: the seed of synthetic lines
+        repeats: the number of times each measurement is repeated (see measure_lines)
+        icu_baseline: if True, ICU is benchmarked too, on the datasets of each language of the models
+        synthetic_only: if True, only synthetic lines are used, e.g. to compare runs on machines with different data
+        verbose: if True, the progress is printed
+    """
+    jobs = []
+    for model_name in model_names:
+        language = get_model_language(model_name)
+        if language is None:
+            print("Warning: the language of model {} is not known, so it is not benchmarked".format(model_name))
+            continue
+        jobs.append((model_name, language, "exclusive" in model_name))
+    if icu_baseline:
+        for language in sorted(set(language for _, language, _ in jobs)):
+            jobs.append(("{}_{}".format(ICU_BASELINE, language), language, False))
+
+    results = {}
+    datasets_cache = {}
+    context = multiprocessing.get_context("spawn")
+    for name, language, exclusive in jobs:
+        key = (language, exclusive)
+        if key not in datasets_cache:
+            datasets_cache[key] = get_benchmark_datasets(language, num_lines, synthetic_lengths, seed, exclusive,
+                                                         synthetic_only)
+        if verbose:
+            print("benchmarking {}".format(name))
+        model_name = ICU_BASELINE if name.startswith(ICU_BASELINE + "_") else name
+        with context.Pool(1) as pool:
+            results[name] = pool.apply(benchmark_model, (model_name, datasets_cache[key], repeats))
+    return {"version": BENCHMARK_VERSION,
+            "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                            "platform": platform.platform(), "processor": platform.processor(),
+                            "cpu_count": multiprocessing.cpu_count()},
+            "settings": {"num_lines": num_lines, "synthetic_lengths": list(synthetic_lengths), "seed": seed,
+                         "repeats": repeats, "synthetic_only": synthetic_only},
+            "models": results}
+
+
+def compare_benchmarks(results, baseline, tolerance=0.1):
+    """
+    This function compares benchmark results with baseline results, and returns a list of messages, one for each
+    metric that is worse than in the baseline by more than the tolerance (e.g. chars_per_sec lower, or latency higher,
+    by more than 10%). Only models, datasets, and metrics that are in both results are compared, and ICU is not
+    compared, since it is a reference for how fast the machine is rather than code of this package.
+    Args:
+        results: the output of run_benchmark
+        baseline: the output of an earlier run_benchmark, e.g. loaded from a JSON file
+        tolerance: the relative change that is not reported
+    """
+    if results.get("version") != baseline.get("version"):
+        print("Warning: the benchmark results have different versions, so they are not compared")
+        return []
+    if results.get("settings") != baseline.get("settings"):
+        print("Warning: the benchmark settings are different from the baseline, so the comparison may not be fair")
+    regressions = []
+    for model_name, model_results in results["models"].items():
+        base_model = baseline["models"].get(model_name)
+        if base_model is None or model_name.startswith(ICU_BASELINE + "_"):
+            continue
+        metric_pairs = [("", model_results, base_model)]
+        for dataset, dataset_results in model_results["datasets"].items():
+            if dataset in base_model["datasets"]:
+                metric_pairs.append((dataset + " ", dataset_results, base_model["datasets"][dataset]))
+        for label, current, base in metric_pairs:
+            for metric in _HIGHER_IS_BETTER + _LOWER_IS_BETTER:
+                if metric not in current or metric not in base or base[metric] <= 0:
+                    continue
+                change = current[metric] / base[metric] - 1
+                if (metric in _HIGHER_IS_BETTER and change < -tolerance) or \
+                        (metric in _LOWER_IS_BETTER and change > tolerance):
+                    regressions.append("{} {}{}: {:.4g} -> {:.4g} ({:+.1%})".format(
+                        model_name, label, metric, base[metric], current[metric], change))
+    return regressions
@@ -1,5 +1,130 @@
 import numpy as np
 
+# Indices of the BIES labels in the columns of a BIES matrix
+B, I, E, S = 0, 1, 2, 3
+_LABEL_CHARS = np.frombuffer(b"bies", dtype=np.uint8)
+_CHAR_LABELS = np.zeros(256, dtype=np.int8)
+_CHAR_LABELS[_LABEL_CHARS] = [B, I, E, S]
+
+
+def labels_to_str(labels):
+    """
+    This function converts an array of BIES label indices to a BIES string, e.g. [0, 1, 2, 3] to "bies".
+    Args:
+        labels: a numpy array of label indices
+    """
+    return _LABEL_CHARS[labels].tobytes().decode("ascii")
+
+
+def bies_to_codes(bies):
+    """
+    This function returns the ASCII codes of the labels of a BIES sequence (e.g. ord("b") for b) as a uint8 numpy array,
+    so that strings and arrays of label indices can be compared in the same way.
+    Args:
+        bies: a BIES string, or a numpy array of BIES label indices
+    """
+    if isinstance(bies, str):
+        return np.frombuffer(bies.encode("ascii", "replace"), dtype=np.uint8)
+    return _LABEL_CHARS[np.asarray(bies, dtype=np.intp)]
+
+
+def labels_from_word_starts(is_start):
+    """
+    This function returns the valid BIES labels of a sequence whose word starts are given. The first unit is always a
+    word start.
+    Args:
+        is_start: a boolean numpy array that is True for units that start a word
+    """
+    is_start = np.array(is_start, dtype=bool)
+    is_start[:1] = True
+    is_end = np.ones_like(is_start)
+    is_end[:-1] = is_start[1:]
+    return np.where(is_start, np.where(is_end, S, B), np.where(is_end, E, I)).astype(np.int8)
+
+
+def decode_argmax(mat):
+    """
+    This function decodes a [T, 4] matrix of BIES probabilities to valid BIES labels in one vectorized pass. A unit
+    starts a word if it is the first unit or its most probable label is b or s, and the labels of all units are then
+    derived from the word starts. These are the same words that the segmentation output shows.
+    Args:
+        mat: the [T, 4] BIES matrix
+    """
+    labels = np.argmax(mat, axis=1)
+    return labels_from_word_starts((labels == B) | (labels == S))
+
+
+def decode_normalized(mat):
+    """
+    This function decodes a [T, 4] matrix of BIES probabilities the way that models have always been evaluated: the
+    most probable label of each unit is taken, and the sequence is made valid by Bies.normalize_bies. It is slower than
+    decode_argmax and can find different words for invalid sequences (e.g. "bb" becomes "be" rather than "ss"), but the
+    BIES accuracy and F1 scores that it gives are the published ones.
+    Args:
+        mat: the [T, 4] BIES matrix
+    """
+    bies = Bies(input_bies=labels_to_str(np.argmax(mat, axis=1)), input_type="str")
+    if len(bies.str) > 0:
+        bies.normalize_bies()
+    return _CHAR_LABELS[np.frombuffer(bies.str.encode("ascii"), dtype=np.uint8)]
+
+
+def decode_viterbi(mat):
+    """
+    This function finds the valid BIES label sequence with the highest probability (the product of the probabilities
+    of its labels) for a [T, 4] matrix of BIES probabilities, using the Viterbi algorithm over the allowed transitions.
+    Since b and s can only come after e or s, and i and e can only come after b or i, each step only needs two
+    comparisons, so the recursion is done with Python floats rather than small numpy arrays.
+    Args:
+        mat: the [T, 4] BIES matrix
+    """
+    length = mat.shape[0]
+    labels = np.zeros(length, dtype=np.int8)
+    if length == 0:
+        return labels
+    log_probs = np.log(np.maximum(np.asarray(mat, dtype=np.float64), 1e-30)).tolist()
+    # Scores of the best valid prefixes that end in each label. A sequence can only start with b or s.
+    score_b, score_i, score_e, score_s = log_probs[0][B], -np.inf, -np.inf, log_probs[0][S]
+    # For each step, whether the best previous label is s (rather than e) for b and s, and i (rather than b) for i and e
+    after_s = [False] * length
+    after_i = [False] * length
+    for t in range(1, length):
+        after_s[t] = score_s > score_e
+        after_i[t] = score_i > score_b
+        word_end = score_s if after_s[t] else score_e
+        word_inside = score_i if after_i[t] else score_b
+        log_b, log_i, log_e, log_s = log_probs[t]
+        score_b, score_i = word_end + log_b, word_inside + log_i
+        score_e, score_s = word_inside + log_e, word_end + log_s
+
+    # A sequence can only end with e or s
+    label = S if score_s > score_e else E
+    for t in range(length - 1, -1, -1):
+        labels[t] = label
+        if label in [B, S]:
+            label = S if after_s[t] else E
+        else:
+            label = I if after_i[t] else B
+    return labels
+
+
+def decode_bies(mat, method="argmax"):
+    """
+    This function decodes a [T, 4] matrix of BIES probabilities to an array of valid BIES label indices.
+    Args:
+        mat: the [T, 4] BIES matrix
+        method: "argmax" for the fast decoder based on the most probable label of each unit (see decode_argmax),
+        "viterbi" for the most probable valid sequence (see decode_viterbi), or "normalize" for the decoder that models
+        have always been evaluated with (see decode_normalized)
+    """
+    if method == "viterbi":
+        return decode_viterbi(mat)
+    if method == "normalize":
+        return decode_normalized(mat)
+    if method != "argmax":
+        print("Warning: BIES decoding method {} is not known, argmax is used instead".format(method))
+    return decode_argmax(mat)
+
 
 class Bies:
     """
@@ -23,19 +148,26 @@ class Bies:
 
     def compute_str_from_mat(self):
         """
-        This function uses the matrix format of the bies sequence to generate a string version.
+        This function uses the matrix format of the bies sequence to generate a string version, using the most probable
+        label of each unit. The output can be an invalid BIES sequence; use decode for a valid one.
+        """
+        self.str = labels_to_str(np.argmax(self.mat, axis=1))
+
+    def decode(self, method="argmax"):
+        """
+        This function sets self.str to a valid BIES sequence decoded from self.mat (see decode_bies). It replaces
+        normalize_bies for sequences that have a matrix format.
+        Args:
+            method: "argmax", "viterbi", or "normalize"
+        """
+        self.str = labels_to_str(decode_bies(self.mat, method))
+
+    def get_word_starts(self):
+        """
+        This function returns a numpy array of the indices of units that start a word (b or s) in self.str.
         """
-        self.str = ""
-        for i in range(self.mat.shape[0]):
-            max_ind = np.argmax(self.mat[i, :])
-            if max_ind == 0:
-                self.str += "b"
-            elif max_ind == 1:
-                self.str += "i"
-            elif max_ind == 2:
-                self.str += "e"
-            elif max_ind == 3:
-                self.str += "s"
+        codes = np.frombuffer(self.str.encode("ascii"), dtype=np.uint8)
+        return np.flatnonzero((codes == ord("b")) | (codes == ord("s")))
 
     def normalize_bies(self):
         """
@@ -0,0 +1,92 @@
+import itertools
+import threading
+import numpy as np
+from icu import BreakIterator, Locale
+
+# Creating a rule-based ICU BreakIterator is much more expensive than running it on a short line, so one iterator of
+# each type is created per thread and reused for all lines by setText. Iterators are not shared between threads because
+# an ICU BreakIterator is not thread-safe.
+_pool = threading.local()
+
+_FACTORIES = {
+    "character": BreakIterator.createCharacterInstance,
+    "word": BreakIterator.createWordInstance,
+}
+
+
+def get_break_iterator(iterator_type):
+    """
+    This function returns the break iterator of the given type of the current thread, creating it on first use. Note
+    that the returned iterator is shared by all callers in the thread, so it must be used (setText and iterating) before
+    this function is called again with the same type.
+    Args:
+        iterator_type: "character" for extended grapheme clusters, or "word" for words
+    """
+    iterators = getattr(_pool, "iterators", None)
+    if iterators is None:
+        iterators = {}
+        _pool.iterators = iterators
+    iterator = iterators.get(iterator_type)
+    if iterator is None:
+        if iterator_type not in _FACTORIES:
+            print("Warning: break iterator type {} is not supported".format(iterator_type))
+            return None
+        iterator = _FACTORIES[iterator_type](Locale.getRoot())
+        iterators[iterator_type] = iterator
+    return iterator
+
+
+def _has_surrogate_pairs(text):
+    """
+    This function returns True if a text has code points outside the Basic Multilingual Plane, which are two code units
+    (a surrogate pair) in UTF-16.
+    Args:
+        text: the input string
+    """
+    return not text.isascii() and max(text) > "\uffff"
+
+
+def _to_code_point_offsets(text, brkpoints):
+    """
+    This function converts offsets in the UTF-16 code units of a text, which ICU returns, to offsets in its code
+    points, which Python strings use. It returns a numpy int array.
+    Args:
+        text: the input string, which has surrogate pairs in UTF-16 (see _has_surrogate_pairs)
+        brkpoints: the offsets in UTF-16 code units, at code point boundaries
+    """
+    code_points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    code_unit_ends = np.cumsum(1 + (code_points > 0xFFFF))
+    return np.searchsorted(code_unit_ends, brkpoints, side="right").astype(np.int32)
+
+
+def get_brkpoints(text, iterator_type):
+    """
+    This function returns the breakpoints of a text as a numpy int array, starting with 0 and ending with the length of
+    the text (for a non-empty text). It uses the pooled break iterator of the current thread. ICU returns offsets in
+    UTF-16 code units, so they are converted to offsets in code points if the text has surrogate pairs.
+    Args:
+        text: the input string
+        iterator_type: "character" for extended grapheme clusters, or "word" for words
+    """
+    iterator = get_break_iterator(iterator_type)
+    iterator.setText(text)
+    brkpoints = np.fromiter(itertools.chain((0,), iterator), dtype=np.int32)
+    if _has_surrogate_pairs(text):
+        return _to_code_point_offsets(text, brkpoints)
+    return brkpoints
+
+
+def get_brkpoints_list(text, iterator_type):
+    """
+    This function is the same as get_brkpoints, but returns a list of Python ints.
+    Args:
+        text: the input string
+        iterator_type: "character" for extended grapheme clusters, or "word" for words
+    """
+    iterator = get_break_iterator(iterator_type)
+    iterator.setText(text)
+    brkpoints = [0]
+    brkpoints.extend(iterator)
+    if _has_surrogate_pairs(text):
+        return _to_code_point_offsets(text, brkpoints).tolist()
+    return brkpoints
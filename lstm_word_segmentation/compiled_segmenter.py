@@ -0,0 +1,270 @@
+import numpy as np
+from .activations import tanh
+
+
+class CompiledSegmenter:
+    """
+    A class that holds the weights of a trained bi-directional LSTM model as C-contiguous float32 arrays, and runs the
+    model manually (the same way WordSegmenter._manual_predict used to do it). Weights are extracted from the model only
+    once, when an instance is built, instead of once per line. An instance also keeps preallocated state buffers that
+    are reused between lines, so it should not be shared between threads.
+    """
+    def __init__(self, weights, embedding_type, generalized_vec_memo=None):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            weights: a list of the nine weight matrices of the model, in the order of model.weights, i.e. embedding,
+            forward W, U, b, backward W, U, b, and the dense layer's weight and bias
+            embedding_type: the embedding type of the model, as stored in WordSegmenter.embedding_type
+            generalized_vec_memo: the GeneralizedVectorMemo of the model's Featurizer, for generalized vectors models
+            that get their input as row ids of the memo (see Featurizer.get_unit_ids)
+        """
+        dtype = np.float32
+        weights = [np.ascontiguousarray(np.asarray(mat), dtype=dtype) for mat in weights]
+        self.embedding_type = embedding_type
+        self.embedarr = weights[0]
+        self.hunits = weights[2].shape[0]
+
+        # Keras stores the columns of LSTM weights in the gate order [i, f, c, o]. They are reordered to [i, f, o, c]
+        # and the columns of the sigmoid gates (i, f, o) are scaled by 0.5. Since sigmoid(x) = (1 + tanh(x/2)) / 2,
+        # this lets _compute_hc apply a single tanh call to all four gates. Scaling by 0.5 is exact in floating point.
+        self.fw_warr, self.fw_uarr, self.fw_barr = [self._prepare_gates(mat) for mat in weights[1:4]]
+        self.bw_warr, self.bw_uarr, self.bw_barr = [self._prepare_gates(mat) for mat in weights[4:7]]
+
+        # The dense layer is applied to the concatenation of forward and backward h values. Splitting its weight matrix
+        # into the forward and backward halves lets us skip the concatenation.
+        timew = weights[7]
+        self.timew_fw = np.ascontiguousarray(timew[:self.hunits, :])
+        self.timew_bw = np.ascontiguousarray(timew[self.hunits:, :])
+        self.timeb = weights[8]
+
+        # The input of the LSTM at each time step is embedding(x_t).W + b, and both the embedding matrix and W are
+        # fixed. For embeddings that map each unit to an id (all but generalized vectors), the [vocab, 4 * hunits]
+        # table of these products is computed here once, so each time step's input becomes a row gather. For
+        # generalized vectors, the input is genvec.embedarr.W + b, so only the product embedarr.W is precomputed.
+        self.fw_table = np.ascontiguousarray(self.embedarr.dot(self.fw_warr))
+        self.bw_table = np.ascontiguousarray(self.embedarr.dot(self.bw_warr))
+        if self.embedding_type != "generalized_vectors":
+            self.fw_table += self.fw_barr
+            self.bw_table += self.bw_barr
+
+        # For generalized vectors given as row ids of a GeneralizedVectorMemo, genvec.embedarr.W + b is computed once
+        # for each row of the memo and kept in these tables, which are extended when the memo has new rows and rebuilt
+        # when the memo is reset (i.e. its generation changes).
+        self.generalized_vec_memo = generalized_vec_memo
+        self._memo_generation = None
+        self._memo_fw_proj = None
+        self._memo_bw_proj = None
+
+        # Preallocated state buffers for single-line prediction. The h buffers grow when a longer line is seen.
+        self._h = np.zeros([1, self.hunits], dtype=dtype)
+        self._c = np.zeros([1, self.hunits], dtype=dtype)
+        self._s = np.zeros([1, 4 * self.hunits], dtype=dtype)
+        self._capacity = 0
+        self._all_h_fw = None
+        self._all_h_bw = None
+
+    def _prepare_gates(self, mat):
+        """
+        This function reorders the gate columns of a LSTM weight matrix or bias from [i, f, c, o] to [i, f, o, c], and
+        scales the columns of the sigmoid gates by 0.5.
+        Args:
+            mat: W, U, or b of one direction of the LSTM
+        """
+        hunits = self.hunits
+        perm = np.concatenate((np.arange(0, 2 * hunits), np.arange(3 * hunits, 4 * hunits),
+                               np.arange(2 * hunits, 3 * hunits)))
+        mat = mat[..., perm]
+        mat[..., :3 * hunits] *= 0.5
+        return np.ascontiguousarray(mat)
+
+    def _ensure_capacity(self, length):
+        """
+        This function makes sure that the buffers that store h values of all time steps can hold a line of given length.
+        Args:
+            length: the length of the line
+        """
+        if length > self._capacity:
+            self._capacity = max(length, 2 * self._capacity)
+            self._all_h_fw = np.zeros([self._capacity, self.hunits], dtype=np.float32)
+            self._all_h_bw = np.zeros([self._capacity, self.hunits], dtype=np.float32)
+
+    def _project_input(self, test_input):
+        """
+        This function returns the input projections (embedding(x).W + b) of the forward and backward LSTMs for all
+        units of a line, as two arrays of shape [len(test_input), 4 * hunits].
+        Args:
+            test_input: the output of Featurizer.featurize for the line, i.e. an array of unit ids, or a matrix of
+            generalized vectors. For generalized vectors, it can also be an array of row ids of generalized_vec_memo.
+        """
+        if self.embedding_type in ["grapheme_clusters_tf", "grapheme_clusters_man", "codepoints"]:
+            return self.fw_table[test_input], self.bw_table[test_input]
+        elif self.embedding_type == "generalized_vectors":
+            if np.ndim(test_input) == 1:
+                self._update_memo_projections()
+                return self._memo_fw_proj[test_input], self._memo_bw_proj[test_input]
+            vecs = np.asarray(test_input, dtype=np.float32)
+            return vecs.dot(self.fw_table) + self.fw_barr, vecs.dot(self.bw_table) + self.bw_barr
+        else:
+            print("Warning: this embedding type is not implemented for manual prediction")
+
+    def _update_memo_projections(self):
+        """
+        This function makes sure that the projection tables of generalized vectors have a row for every row of
+        generalized_vec_memo, by projecting only the rows that were added to the memo since the last call.
+        """
+        memo = self.generalized_vec_memo
+        if self._memo_generation != memo.generation:
+            self._memo_generation = memo.generation
+            self._memo_fw_proj = np.zeros([0, 4 * self.hunits], dtype=np.float32)
+            self._memo_bw_proj = np.zeros([0, 4 * self.hunits], dtype=np.float32)
+        num_projected = self._memo_fw_proj.shape[0]
+        if num_projected < memo.size:
+            new_vecs = memo.vecs[num_projected:]
+            self._memo_fw_proj = np.concatenate((self._memo_fw_proj, new_vecs.dot(self.fw_table) + self.fw_barr))
+            self._memo_bw_proj = np.concatenate((self._memo_bw_proj, new_vecs.dot(self.bw_table) + self.bw_barr))
+
+    def _compute_hc(self, s_t, c_tm1):
+        """
+        Given the pre-activation values of all four LSTM gates (x_t.W + h_tm1.U + b) and the value of c at time t-1,
+        this function computes the values of h and c at time t. It works for a single line or a batch of lines. The
+        gates are in the order [i, f, o, c] and the sigmoid gates are already divided by 2 (see _prepare_gates), so
+        sigmoid gates are computed as (1 + tanh(s_t)) / 2. The activation functions are applied to s_t in place, so
+        s_t is overwritten.
+        Args:
+            s_t: an array of shape [B, 4 * hunits]
+            c_tm1: value of c for time t-1, of shape [B, hunits]
+        """
+        # Implementing forget, input, and output gates in LSTM model
+        hunits = self.hunits
+        tanh(s_t, out=s_t)
+        sigmoid_gates = s_t[:, :3 * hunits]
+        sigmoid_gates *= 0.5
+        sigmoid_gates += 0.5
+        i = s_t[:, :hunits]
+        f = s_t[:, hunits:2 * hunits]
+        o = s_t[:, 2 * hunits:3 * hunits]
+        _c = s_t[:, 3 * hunits:]
+        c_t = i * _c + f * c_tm1
+        h_t = o * tanh(c_t)
+        return h_t, c_t
+
+    def _run_lstm(self, x_proj, uarr, all_h, reverse):
+        """
+        This function runs one direction of the LSTM over a single line, and stores h values in all_h.
+        Args:
+            x_proj: the input projection (embedding(x).W + b) of all time steps, of shape [T, 4 * hunits]
+            uarr: the matrix from h to cell
+            all_h: the buffer that h values of all time steps are written in
+            reverse: if True, the LSTM runs from the last time step to the first one (backward LSTM)
+        """
+        h = self._h
+        c = self._c
+        s = self._s
+        h.fill(0)
+        c.fill(0)
+        length = x_proj.shape[0]
+        time_steps = range(length - 1, -1, -1) if reverse else range(length)
+        for i in time_steps:
+            np.dot(h, uarr, out=s)
+            s += x_proj[i]
+            h_t, c_t = self._compute_hc(s, c)
+            h[...] = h_t
+            c[...] = c_t
+            all_h[i, :] = h[0]
+
+    def predict(self, test_input):
+        """
+        This function returns the [len(test_input), 4] array of BIES probabilities for a single line.
+        Args:
+            test_input: the output of Featurizer.featurize for the line
+        """
+        length = len(test_input)
+        if length == 0:
+            return np.zeros([0, 4], dtype=np.float32)
+        self._ensure_capacity(length)
+        x_proj_fw, x_proj_bw = self._project_input(test_input)
+        all_h_fw = self._all_h_fw[:length]
+        all_h_bw = self._all_h_bw[:length]
+        self._run_lstm(x_proj_fw, self.fw_uarr, all_h_fw, reverse=False)
+        self._run_lstm(x_proj_bw, self.bw_uarr, all_h_bw, reverse=True)
+        return self._softmax(all_h_fw.dot(self.timew_fw) + all_h_bw.dot(self.timew_bw) + self.timeb)
+
+    def _run_lstm_batch(self, x_proj, uarr, mask, reverse, exact=False):
+        """
+        This function runs one direction of the LSTM over a padded batch and returns the [B, T, hunits] array of h
+        values.
+        Args:
+            x_proj: the input projection (embedding(x).W + b) of all time steps, of shape [B, T, 4 * hunits]
+            uarr: the matrix from h to cell
+            mask: a boolean array of shape [B, T] which is False for padded time steps
+            reverse: if True, the LSTM runs from the last time step to the first one (backward LSTM)
+            exact: if True, each step is a stack of [1, hunits] products rather than one [B, hunits] product (see
+            predict_batch)
+        """
+        batch_size, max_len = mask.shape
+        h = np.zeros([batch_size, self.hunits], dtype=np.float32)
+        c = np.zeros([batch_size, self.hunits], dtype=np.float32)
+        all_h = np.zeros([batch_size, max_len, self.hunits], dtype=np.float32)
+        time_steps = range(max_len - 1, -1, -1) if reverse else range(max_len)
+        for i in time_steps:
+            if exact:
+                h_u = np.matmul(h[:, None, :], uarr)[:, 0, :]
+            else:
+                h_u = h.dot(uarr)
+            h_t, c_t = self._compute_hc(x_proj[:, i, :] + h_u, c)
+            if reverse:
+                # Padded steps are visited first in the backward direction, so their state must stay zero
+                step_mask = mask[:, i:i + 1]
+                h_t = np.where(step_mask, h_t, h)
+                c_t = np.where(step_mask, c_t, c)
+            h, c = h_t, c_t
+            all_h[:, i, :] = h
+        return all_h
+
+    def predict_batch(self, test_inputs, exact=False):
+        """
+        Batched version of the predict function. The inputs are packed into a padded [B, T] batch so that the forward
+        and backward LSTM recurrences need only one matrix multiplication per time step for the whole batch. Padded
+        time steps are masked in the backward direction so that each line starts from a zero state at its own last unit.
+        BLAS rounds a product differently depending on its number of rows, so the probabilities can differ from those
+        of predict in the last bits, which can rarely change a label whose probabilities are almost tied.
+        Args:
+            test_inputs: a list of inputs, where each input is what the predict function accepts for a single line
+            exact: if True, the products are done row by row as in predict, so the output for each line is bitwise the
+            same as the output of predict. It is slower, and is meant for evaluation, where the accuracy should not
+            depend on how lines are batched.
+        """
+        batch_size = len(test_inputs)
+        lengths = np.array([len(test_input) for test_input in test_inputs], dtype=np.int64)
+        max_len = int(lengths.max()) if batch_size > 0 else 0
+        if max_len == 0:
+            return [np.zeros([0, 4], dtype=np.float32) for _ in range(batch_size)]
+
+        # Projecting all units of all lines at once, padded to max_len
+        x_proj_fw = np.zeros([batch_size, max_len, 4 * self.hunits], dtype=np.float32)
+        x_proj_bw = np.zeros([batch_size, max_len, 4 * self.hunits], dtype=np.float32)
+        for b in range(batch_size):
+            if lengths[b] > 0:
+                x_proj_fw[b, :lengths[b], :], x_proj_bw[b, :lengths[b], :] = self._project_input(test_inputs[b])
+        mask = np.arange(max_len)[None, :] < lengths[:, None]
+
+        # Forward LSTM. Padded steps come after the end of each line, so they never affect the kept outputs.
+        all_h_fw = self._run_lstm_batch(x_proj_fw, self.fw_uarr, mask, reverse=False, exact=exact)
+        all_h_bw = self._run_lstm_batch(x_proj_bw, self.bw_uarr, mask, reverse=True, exact=exact)
+        if exact:
+            # The dense layer is applied to each line on its own, with the same products as in predict
+            return [self._softmax(all_h_fw[b, :length].dot(self.timew_fw) + all_h_bw[b, :length].dot(self.timew_bw) +
+                                  self.timeb) for b, length in enumerate(lengths)]
+        est = self._softmax(all_h_fw.dot(self.timew_fw) + all_h_bw.dot(self.timew_bw) + self.timeb)
+        return [est[b, :lengths[b], :] for b in range(batch_size)]
+
+    @staticmethod
+    def _softmax(logits):
+        """
+        This function applies softmax over the last axis of the output of the dense layer.
+        Args:
+            logits: output of the dense layer
+        """
+        est = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return est / est.sum(axis=-1, keepdims=True)
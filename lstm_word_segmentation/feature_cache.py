@@ -0,0 +1,124 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# The directory that featurized data is cached in by default
+FEATURE_CACHE_DIR = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data", "feature_cache")
+
+# The version of the code that makes featurized data (Featurizer, Line, and WordSegmenter._get_trainable_data). It is a
+# part of every key, so it should be increased whenever a change in that code changes the arrays it makes.
+FEATURE_VERSION = 2
+
+
+def get_feature_key(dataset, text_range, embedding_type, dics):
+    """
+    This function returns the key of a featurized dataset: a hex digest of everything that the arrays depend on.
+    Args:
+        dataset: name of the dataset (e.g. "BEST", "my") or the address of a file
+        text_range: the part of the dataset that is featurized (e.g. "train", "valid", or a range of texts)
+        embedding_type: the embedding type of the model, including the version of generalized vectors if any
+        dics: a list of the dictionaries that the model uses to featurize text
+    """
+    description = json.dumps([FEATURE_VERSION, str(dataset), str(text_range), embedding_type, dics],
+                             ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+def get_file_digest(file):
+    """
+    This function returns the hex digest of the SHA-256 hash of the content of a file, so that keys of featurized files
+    change whenever the files change, even if their size and modification time don't.
+    Args:
+        file: the address of the file
+    """
+    digest = hashlib.sha256()
+    with open(str(file), "rb") as rfile:
+        for block in iter(lambda: rfile.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    An on-disk cache of featurized data, i.e. the x and y arrays that are made from a dataset before a model is trained
+    or evaluated on it. Each entry is a directory named by its key (see get_feature_key) that holds one .npy file per
+    array, and the arrays are loaded as read-only memory maps, so loading them takes a few milliseconds no matter how
+    large they are. Entries are written to a temporary directory and then renamed, so a run that is stopped while
+    writing doesn't leave a broken entry. Entries of test files are keyed by the hash of their content (see
+    get_file_digest), so they are made again when the files change. Entries of training and validation data are keyed
+    by the name of the dataset, so they go stale when the data files change, and the cache should be cleared then.
+    """
+    def __init__(self, cache_dir=FEATURE_CACHE_DIR):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            cache_dir: the directory that entries are saved in. It is made when the first entry is saved.
+        """
+        self.cache_dir = Path(cache_dir)
+
+    def _get_entry_dir(self, key):
+        return Path.joinpath(self.cache_dir, key)
+
+    def load(self, key, names):
+        """
+        This function returns a dictionary from the names of the arrays of an entry to the arrays (as read-only memory
+        maps), or None if the entry is not in the cache.
+        Args:
+            key: the key of the entry
+            names: the names of the arrays of the entry
+        """
+        entry_dir = self._get_entry_dir(key)
+        if not entry_dir.is_dir():
+            return None
+        try:
+            return {name: np.load(str(Path.joinpath(entry_dir, name + ".npy")), mmap_mode="r") for name in names}
+        except (OSError, ValueError):
+            print("Warning: the feature cache entry {} is not readable, so it is made again".format(key))
+            return None
+
+    def save(self, key, arrays, description=None):
+        """
+        This function saves the arrays of an entry.
+        Args:
+            key: the key of the entry
+            arrays: a dictionary from the names of the arrays to numpy arrays
+            description: a JSON-serializable description of the entry, which is saved next to the arrays to make the
+            cache easier to inspect
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=str(self.cache_dir), prefix=".tmp_"))
+        try:
+            for name, arr in arrays.items():
+                np.save(str(Path.joinpath(tmp_dir, name + ".npy")), np.asarray(arr))
+            with open(str(Path.joinpath(tmp_dir, "description.json")), "w") as wfile:
+                json.dump(description, wfile, ensure_ascii=False)
+            os.replace(str(tmp_dir), str(self._get_entry_dir(key)))
+        except OSError:
+            # Another process may have saved the same entry meanwhile
+            shutil.rmtree(str(tmp_dir), ignore_errors=True)
+
+    def get_or_make(self, key, names, make_arrays, description=None):
+        """
+        This function returns the arrays of an entry, making and saving them first if they are not in the cache.
+        Args:
+            key: the key of the entry
+            names: the names of the arrays of the entry
+            make_arrays: a function that takes no arguments and returns a dictionary from names to arrays
+            description: the description of the entry (see save)
+        """
+        arrays = self.load(key, names)
+        if arrays is not None:
+            return arrays
+        arrays = make_arrays()
+        self.save(key, arrays, description)
+        return arrays
+
+    def clear(self):
+        """
+        This function removes all entries of the cache.
+        """
+        shutil.rmtree(str(self.cache_dir), ignore_errors=True)
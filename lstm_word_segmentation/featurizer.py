@@ -0,0 +1,266 @@
+import numpy as np
+from icu import Char
+from . import constants
+from .break_iterators import get_brkpoints
+from .line import Line
+
+
+def get_generalized_vec(grapheme_cluster, letters_dic):
+    """
+    This function computes the generalized vector of a grapheme cluster: a vector of length len(letters_dic) + 4 that
+    has 1/m for each code point found in the grapheme cluster, where m is the number of code points in the grapheme
+    cluster. Code points in letters_dic have their own slots, and other code points share four slots based on their
+    character type (letters; marks, punctuations and symbols; digits; separators and others).
+    Args:
+        grapheme_cluster: the input grapheme cluster
+        letters_dic: a dictionary that determines how different code points are mapped to different slots
+    """
+    num_letters = len(letters_dic)
+    generalized_vec = np.zeros(num_letters + 4)
+    for ch in grapheme_cluster:
+        if ch in letters_dic:
+            generalized_vec[letters_dic.get(ch)] += 1
+            continue
+        bucket = constants.CHAR_TYPE_TO_BUCKET[Char.charType(ch)]
+        if bucket == 1:
+            generalized_vec[num_letters] += 1
+        elif bucket in [2, 5, 6]:
+            generalized_vec[num_letters + 1] += 1
+        elif bucket == 3:
+            generalized_vec[num_letters + 2] += 1
+        elif bucket in [4, 7]:
+            generalized_vec[num_letters + 3] += 1
+    return generalized_vec / np.sum(generalized_vec)
+
+
+class GeneralizedVectorMemo:
+    """
+    A memo of the generalized vectors of distinct grapheme clusters. Each new grapheme cluster gets the next row of
+    self.vecs, so a text can be represented by an int32 array of row ids, and the generalized vector (and anything
+    computed from it, such as its projection in CompiledSegmenter) is computed once per distinct grapheme cluster. Only
+    a few thousand distinct grapheme clusters occur in a language, but to keep the memo bounded, reset_if_full resets
+    it when it has max_size rows. Each reset increments self.generation, so that users of the row ids know that they
+    changed. Row ids are only valid until the next reset, so reset_if_full should be called before featurizing a group
+    of texts whose ids are used together, and not in between.
+    """
+    def __init__(self, letters_dic, max_size=65536):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            letters_dic: the dictionary that maps code points to slots of generalized vectors
+            max_size: the number of rows after which the memo is reset
+        """
+        self.letters_dic = letters_dic
+        self.max_size = max_size
+        self.generation = 0
+        self.size = 0
+        self._ids = {}
+        self._vecs = np.zeros([256, len(letters_dic) + 4], dtype=np.float32)
+
+    @property
+    def vecs(self):
+        """
+        The [size, L] float32 matrix of memoized generalized vectors.
+        """
+        return self._vecs[:self.size]
+
+    def reset_if_full(self):
+        """
+        This function empties the memo if it has max_size rows or more.
+        """
+        if self.size >= self.max_size:
+            self._ids = {}
+            self.size = 0
+            self.generation += 1
+
+    def get_ids(self, clusters):
+        """
+        This function returns the int32 array of row ids of a list of grapheme clusters, computing the generalized
+        vectors of grapheme clusters that are not memoized yet. It never resets the memo, so the memo can grow past
+        max_size until reset_if_full is called.
+        Args:
+            clusters: a list of grapheme clusters (strings)
+        """
+        ids = self._ids
+        out = np.zeros(len(clusters), dtype=np.int32)
+        for i, cluster in enumerate(clusters):
+            cluster_id = ids.get(cluster)
+            if cluster_id is None:
+                cluster_id = self._add(cluster)
+            out[i] = cluster_id
+        return out
+
+    def _add(self, cluster):
+        """
+        This function computes the generalized vector of a new grapheme cluster and adds it to the memo.
+        Args:
+            cluster: the grapheme cluster
+        """
+        if self.size == self._vecs.shape[0]:
+            self._vecs = np.concatenate((self._vecs, np.zeros_like(self._vecs)))
+        self._vecs[self.size] = get_generalized_vec(cluster, self.letters_dic)
+        self._ids[cluster] = self.size
+        self.size += 1
+        return self.size - 1
+
+
+class Featurizer:
+    """
+    A class that turns text into the input of a model as numpy arrays, without making a GraphemeCluster or CodePoint
+    object for each unit. For grapheme cluster embeddings and code points, the input is an int32 array of ids (the one
+    hot vectors of "grapheme_clusters_man" are only made when batches are generated for training). For generalized
+    vectors, it is a float32 matrix with one generalized vector per grapheme cluster, and the vectors of distinct
+    grapheme clusters are memoized in self.generalized_vec_memo.
+    """
+    def __init__(self, embedding_type, graph_clust_dic, codepoint_dic, letters_dic):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            embedding_type: the embedding type of the model, as stored in WordSegmenter.embedding_type
+            graph_clust_dic: the dictionary of top grapheme clusters of the model
+            codepoint_dic: the dictionary of code points of the model
+            letters_dic: the dictionary that maps code points to slots of generalized vectors
+        """
+        self.embedding_type = embedding_type
+        self.graph_clust_dic = graph_clust_dic
+        self.codepoint_dic = codepoint_dic
+        self.letters_dic = letters_dic
+        self.graph_clust_unknown_id = len(graph_clust_dic)
+        self.codepoint_unknown_id = len(codepoint_dic)
+        self.generalized_vec_length = len(letters_dic) + 4
+        self.generalized_vec_memo = GeneralizedVectorMemo(letters_dic)
+        self._codepoint_base = 0
+        self._codepoint_table = None
+        if embedding_type == "codepoints":
+            self._codepoint_table = self._make_codepoint_table()
+
+    def _make_codepoint_table(self):
+        """
+        This function makes the lookup table that get_codepoint_ids uses: an int32 array whose entry c - base is the id
+        of code point c, for all code points from the smallest (base) to the largest code point in the dictionary (e.g.
+        the Thai or Burmese block). It has one more entry at the end, which is the unknown id. It returns None if the
+        dictionary has keys that are not single code points, so the lookup table cannot be used.
+        """
+        if len(self.codepoint_dic) == 0 or any(len(ch) != 1 for ch in self.codepoint_dic):
+            return None
+        self._codepoint_base = min(ord(ch) for ch in self.codepoint_dic)
+        span = max(ord(ch) for ch in self.codepoint_dic) - self._codepoint_base + 1
+        table = np.full(span + 1, self.codepoint_unknown_id, dtype=np.int32)
+        for ch, codepoint_id in self.codepoint_dic.items():
+            table[ord(ch) - self._codepoint_base] = codepoint_id
+        return table
+
+    def featurize(self, text, char_brkpoints=None):
+        """
+        This function returns the input of the model for a text: an int32 array of length T, or a [T, L] float32 matrix
+        for generalized vectors, where T is the number of units (code points or grapheme clusters) of the text.
+        Args:
+            text: the unsegmented text
+            char_brkpoints: the grapheme cluster breakpoints of the text (a list or an int array), if they are already
+            computed. If None, they are computed using ICU when needed.
+        """
+        if self.embedding_type == "generalized_vectors":
+            self.generalized_vec_memo.reset_if_full()
+            unit_ids = self._get_unit_ids(text, char_brkpoints)
+            return self.generalized_vec_memo.vecs[unit_ids]
+        return self._get_unit_ids(text, char_brkpoints)
+
+    def get_trainable_data(self, input_line):
+        """
+        Given a segmented line, this function returns the input of the model for the unsegmented line (see featurize)
+        and a n*4 np array that represents BIES where n is the number of units of the line. It only uses the Featurizer,
+        so it can run in worker processes that featurize training data in parallel.
+        Args:
+            input_line: the segmented line
+        """
+        # Finding word breakpoints
+        # Note that it is possible that input is segmented manually instead of icu. However, for both cases we set that
+        # input_type equal to "icu_segmented" because that doesn't affect performance of this function. This way we
+        # won't need unnecessary if/else for "man_segmented" and "icu_segmented" throughout rest of this function.
+        line = Line(input_line, "icu_segmented")
+
+        # x_data and y_data will be code point based if self.embedding_type is codepoints, and grapheme clusters based
+        # if self.embedding type is grapheme_clusters or generalized_vectors
+        if self.embedding_type == "codepoints":
+            true_bies = line.get_bies_codepoints("icu")
+        else:
+            true_bies = line.get_bies_grapheme_clusters("icu")
+        y_data = true_bies.mat
+        x_data = self.featurize(line.unsegmented, char_brkpoints=line.char_brkpoints)
+        return x_data, y_data
+
+    def get_unit_ids(self, text, char_brkpoints=None):
+        """
+        This function returns an int32 array of ids of the units of a text. It is the same as featurize, except that for
+        generalized vectors, the ids are rows of self.generalized_vec_memo.vecs instead of the vectors themselves, which
+        are valid until the next call of this function.
+        Args:
+            text: the unsegmented text
+            char_brkpoints: the grapheme cluster breakpoints of the text, if they are already computed
+        """
+        return self.get_unit_ids_many([text], [char_brkpoints])[0]
+
+    def get_unit_ids_many(self, texts, char_brkpoints_list=None):
+        """
+        This function returns the list of unit ids (see get_unit_ids) of several texts. For generalized vectors, the
+        memo is only reset before the first text, so the ids of all texts are valid together.
+        Args:
+            texts: a list of unsegmented texts
+            char_brkpoints_list: a list of the grapheme cluster breakpoints of each text (or None for texts whose
+            breakpoints are not computed yet), or None
+        """
+        if char_brkpoints_list is None:
+            char_brkpoints_list = [None] * len(texts)
+        if self.embedding_type == "generalized_vectors":
+            self.generalized_vec_memo.reset_if_full()
+        return [self._get_unit_ids(text, char_brkpoints) for text, char_brkpoints in zip(texts, char_brkpoints_list)]
+
+    def _get_unit_ids(self, text, char_brkpoints):
+        """
+        This function returns the unit ids of one text, without resetting the generalized vector memo.
+        Args:
+            text: the unsegmented text
+            char_brkpoints: the grapheme cluster breakpoints of the text, or None
+        """
+        if self.embedding_type == "codepoints":
+            return self.get_codepoint_ids(text)
+        if char_brkpoints is None:
+            char_brkpoints = get_brkpoints(text, "character")
+        clusters = [text[char_brkpoints[i]: char_brkpoints[i + 1]] for i in range(len(char_brkpoints) - 1)]
+        if self.embedding_type in ["grapheme_clusters_tf", "grapheme_clusters_man"]:
+            return self.get_graph_clust_ids(clusters)
+        if self.embedding_type == "generalized_vectors":
+            return self.generalized_vec_memo.get_ids(clusters)
+        print("Warning: this embedding type is not implemented for the featurizer")
+        return None
+
+    def get_codepoint_ids(self, text):
+        """
+        This function returns the int32 array of code point ids of a text. Code points that are not in the dictionary
+        get the id of unknown code points. The text is viewed as an array of UTF-32 code points, and ids are found by
+        one gather from the lookup table. Code points outside of the table (including those below base, which wrap
+        around to large numbers in uint32 subtraction) are clipped to its last entry, the unknown id.
+        Args:
+            text: the input string
+        """
+        table = self._codepoint_table
+        if table is not None:
+            codepoints = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype="<u4")
+            offsets = codepoints - np.uint32(self._codepoint_base)
+            np.minimum(offsets, len(table) - 1, out=offsets)
+            return table[offsets]
+        codepoint_dic = self.codepoint_dic
+        unknown_id = self.codepoint_unknown_id
+        return np.fromiter((codepoint_dic.get(ch, unknown_id) for ch in text), dtype=np.int32, count=len(text))
+
+    def get_graph_clust_ids(self, clusters):
+        """
+        This function returns the int32 array of ids of a list of grapheme clusters. Grapheme clusters that are not in
+        the dictionary get the id of unknown grapheme clusters.
+        Args:
+            clusters: a list of grapheme clusters (strings)
+        """
+        graph_clust_dic = self.graph_clust_dic
+        unknown_id = self.graph_clust_unknown_id
+        return np.fromiter((graph_clust_dic.get(cluster, unknown_id) for cluster in clusters), dtype=np.int32,
+                           count=len(clusters))
@@ -1,6 +1,5 @@
 import numpy as np
-from . import constants
-from icu import Char
+from .featurizer import get_generalized_vec
 
 
 class GraphemeCluster:
@@ -29,19 +28,7 @@ class GraphemeCluster:
         # Making the generalized vectors representation with respect to the letters_dic
         self.num_letters = len(letters_dic)
         self.generalized_vec_length = self.num_letters + 4
-        self.generalized_vec = np.zeros(self.generalized_vec_length)
-        for ch in self.graph_clust:
-            if ch in letters_dic:
-                self.generalized_vec[letters_dic.get(ch)] += 1
-            elif constants.CHAR_TYPE_TO_BUCKET[Char.charType(ch)] == 1:
-                self.generalized_vec[self.num_letters] += 1
-            elif constants.CHAR_TYPE_TO_BUCKET[Char.charType(ch)] in [2, 5, 6]:
-                self.generalized_vec[self.num_letters + 1] += 1
-            elif constants.CHAR_TYPE_TO_BUCKET[Char.charType(ch)] == 3:
-                self.generalized_vec[self.num_letters + 2] += 1
-            elif constants.CHAR_TYPE_TO_BUCKET[Char.charType(ch)] in [4, 7]:
-                self.generalized_vec[self.num_letters + 3] += 1
-        self.generalized_vec = self.generalized_vec/np.sum(self.generalized_vec)
+        self.generalized_vec = get_generalized_vec(self.graph_clust, letters_dic)
 
     def display(self):
         """
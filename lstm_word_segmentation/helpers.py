@@ -1,5 +1,6 @@
 import numpy as np
 from . import constants
+from . import activations
 
 
 def is_ascii(input_str):
@@ -39,13 +40,9 @@ def sigmoid(inp):
     # used. A common example is when A = np.array([np.array([1, 2, 3])]).
     if type(inp[0]) == np.ndarray:
         inp = inp[0]
-    out = []
-    for x in inp:
-        if x < -20:
-            out.append(0)
-        else:
-            out.append(1.0/(1.0 + np.exp(-x)))
-    out = np.array(out)
+    inp = np.asarray(inp, dtype=float)
+    out = activations.sigmoid(inp)
+    out[inp < -20] = 0
     if scalar_input:
         return np.squeeze(out)
     return out
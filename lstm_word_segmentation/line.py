@@ -1,13 +1,15 @@
 import numpy as np
-from icu import BreakIterator, Locale
 from .bies import Bies
+from .break_iterators import get_brkpoints_list
 from collections import Counter
-import deepcut
+from functools import cached_property
 
 
 class Line:
     """
     A class that stores different versions of a line: unsegmented, ICU segmented, and manually segmented (if exists).
+    The ICU segmented version and the breakpoints (char_brkpoints, icu_word_brkpoints, and man_word_brkpoints) are
+    computed when they are used for the first time, and then cached.
     """
     def __init__(self, input_line, input_type):
         """
@@ -19,46 +21,47 @@ class Line:
         """
         if input_type == "unsegmented":
             self.unsegmented = input_line
-            self._compute_char_brkpoints()
-            self._compute_icu_segmented()
-            self.icu_word_brkpoints = self._compute_word_brkpoints(input_type="icu_segmented")
             self.man_segmented = None
-            self.man_word_brkpoints = None
 
         elif input_type == "icu_segmented":
             self.icu_segmented = input_line
             self.icu_word_brkpoints = self._compute_word_brkpoints(input_type="icu_segmented")
             self.unsegmented = input_line.replace("|", "")
-            self._compute_char_brkpoints()
             self.man_segmented = None
-            self.man_word_brkpoints = None
 
         elif input_type == "man_segmented":
             self.man_segmented = input_line
-            self.man_word_brkpoints = self._compute_word_brkpoints(input_type="man_segmented")
             self.unsegmented = input_line.replace("|", "")
-            self._compute_char_brkpoints()
-            self._compute_icu_segmented()
-            self.icu_word_brkpoints = self._compute_word_brkpoints(input_type="icu_segmented")
 
         else:
             print("Warning: this input_type is not implemented")
 
         self.deepcut = None
 
-    def _compute_icu_segmented(self):
+    @cached_property
+    def icu_word_brkpoints(self):
+        """
+        The word breakpoints of the line found by ICU BreakIterator, using the unsegmented version.
+        """
+        return get_brkpoints_list(self.unsegmented, "word")
+
+    @cached_property
+    def icu_segmented(self):
+        """
+        The ICU segmented version of the line, where "|" separates the words found by ICU.
+        """
+        words = [self.unsegmented[self.icu_word_brkpoints[i]: self.icu_word_brkpoints[i + 1]]
+                 for i in range(len(self.icu_word_brkpoints) - 1)]
+        return "|" + "".join(word + "|" for word in words)
+
+    @cached_property
+    def man_word_brkpoints(self):
         """
-        This function computes the ICU segmented version of the line using the unsegmented version. Therefore, in order
-        to use it the unsegmented version must have been already computed.
+        The word breakpoints of the manually segmented version of the line, or None if it doesn't exist.
         """
-        words_break_iterator = BreakIterator.createWordInstance(Locale.getRoot())
-        words_break_iterator.setText(self.unsegmented)
-        self.icu_word_brkpoints = [0]
-        for brkpoint in words_break_iterator:
-            self.icu_word_brkpoints.append(brkpoint)
-        self.icu_segmented = "|"
-        for i in range(len(self.icu_word_brkpoints) - 1):
-            self.icu_segmented += self.unsegmented[self.icu_word_brkpoints[i]: self.icu_word_brkpoints[i + 1]] + "|"
+        if self.man_segmented is None:
+            return None
+        return self._compute_word_brkpoints(input_type="man_segmented")
 
     def _compute_word_brkpoints(self, input_type):
         """
@@ -85,20 +88,19 @@ class Line:
                 found_bars += 1
         return word_brkpoints
 
-    def _compute_char_brkpoints(self):
+    @cached_property
+    def char_brkpoints(self):
         """
-        This function uses ICU BreakIterator to identify and store extended grapheme clusters.
+        The breakpoints of extended grapheme clusters of the line, found by ICU BreakIterator.
         """
-        chars_break_iterator = BreakIterator.createCharacterInstance(Locale.getRoot())
-        chars_break_iterator.setText(self.unsegmented)
-        self.char_brkpoints = [0]
-        for brkpoint in chars_break_iterator:
-            self.char_brkpoints.append(brkpoint)
+        return get_brkpoints_list(self.unsegmented, "character")
 
     def get_deepcut_segmented(self):
         """
         This function returns a clean string that is the output of applying deepcut on unsegmented version of line
         """
+        # deepcut is imported here because it loads TensorFlow, which is not needed anywhere else in this class
+        import deepcut
         deepcut_out = deepcut.tokenize(self.unsegmented)
         out_line = "|"
         for word in deepcut_out:
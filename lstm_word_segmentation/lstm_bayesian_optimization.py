@@ -9,7 +9,8 @@ class LSTMBayesianOptimization:
     """
     def __init__(self, input_n, input_t, input_language, input_epochs, input_embedding_type, input_clusters_num,
                  input_training_data, input_evaluation_data, input_hunits_lower, input_hunits_upper,
-                 input_embedding_dim_lower, input_embedding_dim_upper, input_c, input_iterations):
+                 input_embedding_dim_lower, input_embedding_dim_upper, input_c, input_iterations,
+                 input_feature_cache=None):
         """
         The __init__ function creates a new instance of the class based on the input line and its type.
         Args:
@@ -25,6 +26,8 @@ class LSTMBayesianOptimization:
             input_embedding_dim_lower and input_embedding_dim_upper: the range of search area for embedding_dim
             input_c: the constant value used in the penalty function of the lstm_score
             input_iterations: the number of iterations for Bayesian optimization algorithm
+            input_feature_cache: a FeatureCache that all trained models share, so that the data is featurized only once
+            for all trials (see WordSegmenter.set_feature_cache)
         """
         self.n = input_n
         self.t = input_t
@@ -40,6 +43,7 @@ class LSTMBayesianOptimization:
         self.embedding_dim_upper = input_embedding_dim_upper
         self.c = input_c
         self.iterations = input_iterations
+        self.feature_cache = input_feature_cache
 
         # Setting self.lambda to the number of the parameters of the largest possible model
         word_segmenter = WordSegmenter(input_name="temp", input_n=50, input_t=10000,
@@ -49,6 +53,7 @@ class LSTMBayesianOptimization:
                                        input_training_data=self.training_data,
                                        input_evaluation_data=self.evaluation_data, input_language=self.language,
                                        input_embedding_type=self.embedding_type)
+        word_segmenter.set_feature_cache(self.feature_cache)
         word_segmenter.train_model()
         self.lam = 1/word_segmenter.model.count_params()
 
@@ -68,6 +73,7 @@ class LSTMBayesianOptimization:
                                        input_epochs=self.epochs, input_training_data=self.training_data,
                                        input_evaluation_data=self.training_data, input_language=self.language,
                                        input_embedding_type=self.embedding_type)
+        word_segmenter.set_feature_cache(self.feature_cache)
         word_segmenter.train_model()
         return word_segmenter.test_model_line_by_line(verbose=False).get_f1_score() - self.c * self.lam * \
             word_segmenter.model.count_params()
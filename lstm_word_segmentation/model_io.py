@@ -0,0 +1,200 @@
+from pathlib import Path
+import numpy as np
+import struct
+import json
+
+# The directory that all trained models are saved in
+MODELS_DIR = Path.joinpath(Path(__file__).parent.parent.absolute(), "Models")
+
+# Number of weight matrices in a bi-directional LSTM model: embedding, forward W, U, b, backward W, U, b, and weight and
+# bias of the output dense layer
+NUM_WEIGHTS = 9
+
+# The binary model format (weights.bin) is laid out as follows:
+#   1) an 8-byte magic string, followed by two little-endian uint32 values: the format version and the header length
+#   2) a UTF-8 JSON header that holds the model name, embedding type, dimensions, the dictionary, and for each weight
+#      matrix its shape and the byte offset of its data in the file
+#   3) raw little-endian float32 blocks of the weight matrices, each starting at a multiple of BIN_ALIGNMENT bytes
+# Since the blocks are aligned raw float32 data, they can be memory-mapped by np.memmap with no parsing or copying.
+BIN_MAGIC = b"LSTMWSEG"
+BIN_VERSION = 1
+BIN_ALIGNMENT = 64
+_BIN_PREFIX = struct.Struct("<8sII")
+
+
+def get_model_dir(model_name):
+    """
+    This function returns the directory that a model with the given name is saved in.
+    Args:
+        model_name: name of the model
+    """
+    return Path.joinpath(MODELS_DIR, model_name)
+
+
+def load_weights_json(file):
+    """
+    This function reads a weights.json file written by WordSegmenter.save_model. It returns a dictionary with keys
+    "model" (name of the model), "dic" (the grapheme cluster or code point dictionary, or None if the model doesn't have
+    one), and "weights" (a list of nine float32 numpy arrays in the order of model.weights).
+    Args:
+        file: address of the weights.json file
+    """
+    with open(str(file)) as rfile:
+        input_json = json.load(rfile)
+    weights = []
+    for i in range(NUM_WEIGHTS):
+        dic_model = input_json["mat{}".format(i + 1)]
+        mat = np.array(dic_model["data"], dtype=np.float32)
+        weights.append(mat.reshape(dic_model["dim"]))
+    return {"model": input_json["model"], "dic": input_json.get("dic"), "weights": weights}
+
+
+def load_weights_npy(file):
+    """
+    This function reads a weights.npy file written by WordSegmenter.save_model. It returns a dictionary with the same
+    keys as load_weights_json. weights.npy files don't store the dictionary of the model, so "dic" is always None. Note
+    that weights.npy files written by older versions of save_model hold pickled TensorFlow tensors, and reading them
+    imports TensorFlow.
+    Args:
+        file: address of the weights.npy file
+    """
+    file = Path(file)
+    weights = np.load(str(file), allow_pickle=True)
+    weights = [np.asarray(mat, dtype=np.float32) for mat in weights]
+    return {"model": file.parent.name, "dic": None, "weights": weights}
+
+
+def _align(offset):
+    """
+    This function rounds up an offset in the binary model file to the next multiple of BIN_ALIGNMENT.
+    Args:
+        offset: the offset in bytes
+    """
+    return (offset + BIN_ALIGNMENT - 1) // BIN_ALIGNMENT * BIN_ALIGNMENT
+
+
+def save_weights_bin(file, model_name, embedding_type, weights, dic):
+    """
+    This function writes a model in the binary model format (see BIN_MAGIC above for the layout).
+    Args:
+        file: address of the output file
+        model_name: name of the model
+        embedding_type: the embedding type of the model, e.g. "codepoints" or "generalized_vectors_123"
+        weights: a list of the nine weight matrices of the model, in the order of model.weights
+        dic: the grapheme cluster or code point dictionary of the model, or None if the model doesn't have one
+    """
+    weights = [np.ascontiguousarray(mat, dtype="<f4") for mat in weights]
+    header = {"model": model_name, "embedding": embedding_type, "embedding_dim": int(weights[0].shape[1]),
+              "hunits": int(weights[2].shape[0]), "dic": dic, "weights": []}
+
+    # The offsets of the blocks depend on the length of the header, and the length of the header depends on the
+    # offsets. So the offsets are computed relative to the start of data, and the start of data is moved forward until
+    # the header with the shifted offsets fits before it. It only moves forward, so the loop ends.
+    relative_offsets = []
+    offset = 0
+    for mat in weights:
+        relative_offsets.append(offset)
+        offset = _align(offset + mat.nbytes)
+    data_start = 0
+    while True:
+        header["weights"] = [{"dim": list(mat.shape), "offset": data_start + relative_offset}
+                             for mat, relative_offset in zip(weights, relative_offsets)]
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        needed_start = _align(_BIN_PREFIX.size + len(header_bytes))
+        if needed_start <= data_start:
+            break
+        data_start = needed_start
+
+    with open(str(file), "wb") as wfile:
+        wfile.write(_BIN_PREFIX.pack(BIN_MAGIC, BIN_VERSION, len(header_bytes)))
+        wfile.write(header_bytes)
+        for entry, mat in zip(header["weights"], weights):
+            wfile.write(b"\0" * (entry["offset"] - wfile.tell()))
+            wfile.write(mat.tobytes())
+
+
+def load_weights_bin(file, mmap=True):
+    """
+    This function reads a file in the binary model format. It returns a dictionary with the same keys as
+    load_weights_json, plus "embedding" (the embedding type of the model). If mmap is True, the weight matrices are
+    read-only np.memmap arrays, so nothing but the header is read until the weights are used, and the pages of the file
+    are shared between all processes that load the same model.
+    Args:
+        file: address of the weights.bin file
+        mmap: determines if the weights are memory-mapped or read into memory
+    """
+    with open(str(file), "rb") as rfile:
+        magic, version, header_len = _BIN_PREFIX.unpack(rfile.read(_BIN_PREFIX.size))
+        if magic != BIN_MAGIC:
+            print("Warning: {} is not a binary model file".format(file))
+            return None
+        if version > BIN_VERSION:
+            print("Warning: version {} of the binary model format is not supported".format(version))
+            return None
+        header = json.loads(rfile.read(header_len).decode("utf-8"))
+        weights = []
+        for entry in header["weights"]:
+            shape = tuple(entry["dim"])
+            if mmap:
+                mat = np.memmap(str(file), dtype="<f4", mode="r", offset=entry["offset"], shape=shape)
+            else:
+                rfile.seek(entry["offset"])
+                mat = np.frombuffer(rfile.read(int(np.prod(shape)) * 4), dtype="<f4").reshape(shape)
+            weights.append(mat)
+    return {"model": header["model"], "embedding": header["embedding"], "dic": header["dic"], "weights": weights}
+
+
+def convert_model_to_bin(model_name):
+    """
+    This function writes the weights.bin file of a saved model using its weights.json file, so that the model can be
+    loaded faster.
+    Args:
+        model_name: name of the model
+    """
+    model_dir = get_model_dir(model_name)
+    saved_model = load_weights_json(Path.joinpath(model_dir, "weights.json"))
+    save_weights_bin(Path.joinpath(model_dir, "weights.bin"), model_name=model_name,
+                     embedding_type=embedding_from_name(model_name), weights=saved_model["weights"],
+                     dic=saved_model["dic"])
+
+
+def load_model_weights(model_name, file_format=None):
+    """
+    This function reads the weights (and the dictionary, if it exists) of a saved model without using TensorFlow. See
+    load_weights_json for the structure of the output.
+    Args:
+        model_name: name of the model
+        file_format: the file to be read, "bin" for weights.bin, "json" for weights.json, or "npy" for weights.npy. If
+        None, weights.bin is used if it exists, and weights.json otherwise.
+    """
+    model_dir = get_model_dir(model_name)
+    if file_format is None:
+        file_format = "json"
+        if Path.joinpath(model_dir, "weights.bin").exists():
+            file_format = "bin"
+    if file_format == "bin":
+        return load_weights_bin(Path.joinpath(model_dir, "weights.bin"))
+    elif file_format == "json":
+        return load_weights_json(Path.joinpath(model_dir, "weights.json"))
+    elif file_format == "npy":
+        return load_weights_npy(Path.joinpath(model_dir, "weights.npy"))
+    else:
+        print("Warning: this file format is not supported for loading models")
+
+
+def embedding_from_name(model_name):
+    """
+    This function returns the embedding type of a saved model based on its name, e.g. "codepoints" for
+    Thai_codepoints_exclusive_model4_heavy and "generalized_vectors_123" for Thai_genvec123_model5_heavy.
+    Args:
+        model_name: name of the model
+    """
+    if "_codepoints" in model_name:
+        return "codepoints"
+    if "_graphclust" in model_name:
+        return "grapheme_clusters_tf"
+    if "_genvec" in model_name:
+        buckets = model_name.split("_genvec")[1].split("_")[0]
+        return "generalized_vectors_" + buckets
+    print("Warning: the embedding type cannot be inferred from the name of model {}".format(model_name))
+    return None
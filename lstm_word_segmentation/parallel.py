@@ -0,0 +1,47 @@
+import collections
+import multiprocessing
+import os
+
+
+def get_num_jobs(jobs):
+    """
+    This function returns the number of processes to use for a `jobs` argument: jobs itself, or the number of CPUs if
+    jobs is None or 0.
+    Args:
+        jobs: the requested number of processes
+    """
+    if not jobs:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def parallel_map(function, items, jobs=1, initializer=None, initargs=()):
+    """
+    This function yields function(item) for each item, in the order of items. If jobs is more than 1, the items are
+    processed by a pool of that many processes. Only a few items per process are sent ahead, so items can be a
+    generator over data that doesn't fit in memory. With jobs equal to 1, the items are processed in this process, and
+    the results are the same.
+    Args:
+        function: a function of one argument. For jobs > 1, it must be defined at the top level of a module, so that it
+        can be sent to the worker processes
+        items: an iterable of arguments of function
+        jobs: the number of processes (None or 0 for the number of CPUs)
+        initializer: a function that is called with initargs once in each process before function is called, e.g. to
+        set up state that is expensive to send with every item
+        initargs: the arguments of initializer
+    """
+    jobs = get_num_jobs(jobs)
+    if jobs <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield function(item)
+        return
+    with multiprocessing.Pool(jobs, initializer=initializer, initargs=initargs) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.apply_async(function, (item,)))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
@@ -1,7 +1,9 @@
 from pathlib import Path
+import functools
 import numpy as np
 from collections import Counter
-from .text_helpers import get_lines_of_text, compute_accuracy, compute_accuracy_best
+from .text_helpers import iterate_lines_of_text, compute_accuracy, compute_accuracy_best, get_best_files
+from .parallel import parallel_map
 from . import constants
 
 
@@ -63,7 +65,26 @@ def evaluate_existing_algorithms(algorithm, data, fast=False):
     return acc
 
 
-def find_grapheme_clusters(language, exclusive, verbose):
+def _count_grapheme_clusters_and_keep_lines(file, keep_lines):
+    """
+    This function returns a Counter dictionary that holds the frequency of different grapheme clusters in a manually
+    segmented file, and the list of its lines if keep_lines is True (otherwise an empty list). Counters of different
+    files can be added, so files can be counted in parallel. find_grapheme_clusters runs it in worker processes and
+    displays the lines itself, so that the output of different files isn't interleaved.
+    Args:
+        file: address of the file
+        keep_lines: determines if the lines are returned
+    """
+    grapheme_clusters_dic = Counter()
+    lines = []
+    for line in iterate_lines_of_text(file=file, type_of_lines="man_segmented"):
+        grapheme_clusters_dic.update(line.get_grapheme_clusters())
+        if keep_lines:
+            lines.append(line)
+    return grapheme_clusters_dic, lines
+
+
+def find_grapheme_clusters(language, exclusive, verbose, jobs=1):
     """
     This function uses the BEST data set to
         1) compute the grapheme cluster dictionary that holds the frequency of different grapheme clusters
@@ -72,40 +93,31 @@ def find_grapheme_clusters(language, exclusive, verbose):
         verbose: shows if we want to see how the algorithm is working or not
         exclusive: determines to use a data set where all code points are in the script associated with the language or
                    not
+        jobs: the number of processes that count the BEST texts, one text at a time (None or 0 for the number of CPUs).
+              The counts are added, and the lines are displayed, in the order of the texts, so neither depends on it.
     """
     grapheme_clusters_dic = Counter()
-    lines = []
+    files = []
 
     # For Thai use BEST data set
     if language == "Thai":
-        num_texts = 96
-        for text_num in range(1, num_texts):
-            for cat in ["news", "encyclopedia", "article", "novel"]:
-                text_num_str = "{}".format(text_num).zfill(5)
-                if exclusive:
-                    file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/exclusive_Best/{}/{}_".
-                                         format(cat, cat) + text_num_str + ".txt")
-                else:
-                    file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/Best/{}/{}_".format(cat, cat) +
-                                         text_num_str + ".txt")
-
-                lines += get_lines_of_text(file=file, type_of_lines="man_segmented")
+        files = get_best_files(starting_text=1, ending_text=96, exclusive=exclusive)
 
     # For Burmese use "my" data set
     elif language == "Burmese":
         if exclusive:
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/my_exclusive.txt")
+            files = [Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/my_exclusive.txt")]
         else:
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/my.txt")
-        lines = get_lines_of_text(file=file, type_of_lines="man_segmented")
+            files = [Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/my.txt")]
 
     else:
         print("Warning: the input language is not supported")
 
-    for line in lines:
-        grapheme_clusters_dic += line.get_grapheme_clusters()
-        if verbose:
+    count_file = functools.partial(_count_grapheme_clusters_and_keep_lines, keep_lines=verbose)
+    for file_dic, lines in parallel_map(count_file, files, jobs):
+        for line in lines:
             line.display()
+        grapheme_clusters_dic.update(file_dic)
 
     # Saving the dictionary based on frequency of grapheme clusters
     graph_clust_freq = dict(grapheme_clusters_dic)
@@ -0,0 +1,135 @@
+import collections
+import re
+import sys
+import threading
+import unicodedata
+
+# The regular expression of chunks, which is made on the first call of split_chunks (see _get_chunk_re)
+_chunk_re = None
+# Characters that delimit the chunks of a line are whitespace, punctuation, and symbols. All of them are in the first
+# two planes (up to U+1FFFF), so other planes are not searched.
+_DELIMITERS_END = 0x20000
+
+
+def _get_chunk_re():
+    """
+    This function returns the regular expression of chunks: a (possibly empty) run of delimiters followed by a
+    (possibly empty) run of non-delimiters. The delimiters are found with unicodedata, which takes a few tens of
+    milliseconds, so it is done the first time that the expression is needed rather than when the module is imported.
+    The character class is made of ranges of consecutive delimiters, so it stays small.
+    """
+    global _chunk_re
+    if _chunk_re is None:
+        ranges = []
+        for code in range(_DELIMITERS_END):
+            char = chr(code)
+            if char.isspace() or unicodedata.category(char)[0] in ["P", "S"]:
+                if ranges and ranges[-1][1] == code - 1:
+                    ranges[-1][1] = code
+                else:
+                    ranges.append([code, code])
+        char_class = "".join(re.escape(chr(start)) if start == end else
+                             re.escape(chr(start)) + "-" + re.escape(chr(end)) for start, end in ranges)
+        _chunk_re = re.compile("[{0}]*[^{0}]*".format(char_class))
+    return _chunk_re
+
+
+def split_chunks(line):
+    """
+    This function splits a line into chunks that are cached independently. Each chunk is a run of whitespace,
+    punctuation, and symbols, followed by the run of other characters after it. Joining the chunks gives the line.
+    Keeping the delimiters before a word (rather than after it) gives the LSTM model the same left context for the first
+    letters of the word as in the full line, which is where segmenting a chunk on its own makes most of its errors.
+    Args:
+        line: the input string
+    """
+    return [chunk for chunk in _get_chunk_re().findall(line) if chunk]
+
+
+class SegmentationCache:
+    """
+    A bounded LRU cache of the word boundary offsets of chunks of text (see split_chunks), which lets WordSegmenter skip
+    the LSTM model for chunks it has seen before. Keys are (model name, chunk), so one cache can be shared between
+    several WordSegmenter instances. When the cache has more than max_entries chunks or uses more than max_bytes
+    bytes, the least recently used chunks are evicted. The size of an entry is estimated by sys.getsizeof of the chunk
+    and its offsets.
+    """
+    def __init__(self, max_entries=100000, max_bytes=64 * 1024 * 1024):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            max_entries: the maximum number of chunks in the cache
+            max_bytes: the maximum estimated memory usage of the cached chunks and offsets
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.num_bytes = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, model_name, chunk):
+        """
+        This function returns the cached offsets of a chunk (as a tuple), or None if it is not in the cache.
+        Args:
+            model_name: name of the model that segments the chunk
+            chunk: the chunk of text
+        """
+        key = (model_name, chunk)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model_name, chunk, offsets):
+        """
+        This function adds the offsets of a chunk to the cache, and evicts the least recently used chunks if the cache
+        is over its limits.
+        Args:
+            model_name: name of the model that segmented the chunk
+            chunk: the chunk of text
+            offsets: the word boundary offsets of the chunk, starting with 0 and ending with len(chunk)
+        """
+        key = (model_name, chunk)
+        offsets = tuple(offsets)
+        size = sys.getsizeof(chunk) + sys.getsizeof(offsets)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.num_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (offsets, size)
+            self.num_bytes += size
+            while len(self._entries) > self.max_entries or self.num_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.num_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """
+        This function removes all chunks from the cache and resets its counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get_stats(self):
+        """
+        This function returns a dictionary with the number of entries, estimated bytes, hits, misses, evictions, and the
+        hit rate of the cache.
+        """
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "bytes": self.num_bytes, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups > 0 else 0}
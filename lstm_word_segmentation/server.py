@@ -0,0 +1,409 @@
+import asyncio
+import collections
+import getopt
+import json
+import sys
+import time
+import numpy as np
+
+from .word_segmenter import pick_lstm_model
+from .model_io import embedding_from_name
+
+# Maximum number of requests of one connection that can wait for their responses. When a client sends more requests
+# without reading the responses, reading from that connection pauses.
+MAX_PIPELINED_REQUESTS = 1024
+
+# Default maximum size of a request line in bytes, and of a response line that the client reads. asyncio's own limit
+# (64 KiB) is too small for long documents. A longer request gets an error response, and the connection stays open.
+MAX_REQUEST_SIZE = 16 * 2 ** 20
+MAX_RESPONSE_SIZE = 16 * MAX_REQUEST_SIZE
+
+
+class SegmentationServer:
+    """
+    A local server that wraps a loaded WordSegmenter, so that several services can share one model. It speaks a simple
+    protocol over a Unix socket or a localhost TCP port: each request is one line of JSON, and each response is one line
+    of JSON, sent in the order of requests of that connection. The requests are:
+        {"text": "..."}: segments the text and returns {"offsets": [...]}, the word boundary offsets of the text (see
+        WordSegmenter.segment_lines)
+        {"stats": true}: returns the statistics of the server (see get_stats)
+    Requests of all connections are put in one queue and segmented together in micro-batches. A micro-batch is run as
+    soon as it has max_batch_size lines, or max_wait seconds after its first line arrived.
+    """
+    def __init__(self, word_segmenter, max_batch_size=64, max_wait=0.005, latency_window=10000,
+                 max_request_size=MAX_REQUEST_SIZE):
+        """
+        The __init__ function creates a new instance of the class.
+        Args:
+            word_segmenter: a WordSegmenter instance with a trained model
+            max_batch_size: the maximum number of lines in a micro-batch
+            max_wait: the maximum time (in seconds) that a line waits for other lines before its micro-batch is run
+            latency_window: the number of most recent requests that latency percentiles are computed over
+            max_request_size: the maximum size of a request line in bytes
+        """
+        self.word_segmenter = word_segmenter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_request_size = max_request_size
+        self.num_requests = 0
+        self.num_batches = 0
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._queue = None
+        self._server = None
+        self._batcher = None
+
+    async def start(self, unix_path=None, host="127.0.0.1", port=0):
+        """
+        This function starts listening for connections, on a Unix socket if unix_path is given and on a TCP port
+        otherwise. It returns the asyncio server.
+        Args:
+            unix_path: path of the Unix socket
+            host: the host of the TCP server. It should be a local address, since the protocol has no authentication
+            port: the TCP port. If 0, a free port is chosen (see get_address)
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.ensure_future(self._run_batches())
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path,
+                                                           limit=self.max_request_size)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host=host, port=port,
+                                                      limit=self.max_request_size)
+        return self._server
+
+    def get_address(self):
+        """
+        This function returns the address that the server listens on: the Unix socket path, or a (host, port) tuple.
+        """
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        """
+        This function stops the server and its batching task.
+        """
+        self._server.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+
+    async def segment(self, text):
+        """
+        This function puts a line in the queue and returns its word boundary offsets once its micro-batch is run.
+        Args:
+            text: the unsegmented line
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    def get_stats(self):
+        """
+        This function returns a dictionary with the current queue depth, the number of requests and micro-batches
+        served so far, the mean micro-batch size, and the 50th, 95th, and 99th percentiles of latency (in milliseconds,
+        from arriving in the queue to being segmented) over the most recent requests.
+        """
+        stats = {"queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                 "requests": self.num_requests, "batches": self.num_batches,
+                 "mean_batch_size": self.num_requests / self.num_batches if self.num_batches > 0 else 0}
+        latencies = np.array(self._latencies)
+        for percentile in [50, 95, 99]:
+            value = None
+            if len(latencies) > 0:
+                value = float(np.percentile(latencies, percentile)) * 1000
+            stats["latency_p{}_ms".format(percentile)] = value
+        return stats
+
+    async def _next_batch(self):
+        """
+        This function waits for the first line of the next micro-batch, and then collects more lines until the batch is
+        full or max_wait seconds have passed.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batches(self):
+        """
+        This function runs the micro-batches one after another. The model is run in a worker thread, so the server
+        keeps accepting requests meanwhile. Only one micro-batch is run at a time, since WordSegmenter is not
+        thread-safe.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            texts = [text for text, _, _ in batch]
+            try:
+                offsets = await loop.run_in_executor(None, self.word_segmenter.segment_lines, texts,
+                                                     self.max_batch_size, "offsets")
+            except Exception as err:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(err)
+                continue
+            finish = time.perf_counter()
+            self.num_batches += 1
+            self.num_requests += len(batch)
+            for (_, future, start), line_offsets in zip(batch, offsets):
+                self._latencies.append(finish - start)
+                if not future.done():
+                    future.set_result(line_offsets)
+
+    async def _handle_request(self, request_line):
+        """
+        This function returns the response to one request line.
+        Args:
+            request_line: the request, as bytes
+        """
+        try:
+            request = json.loads(request_line)
+        except ValueError:
+            return {"error": "the request is not valid JSON"}
+        if not isinstance(request, dict):
+            return {"error": "the request should be a JSON object"}
+        if isinstance(request.get("text"), str):
+            return {"offsets": await self.segment(request["text"])}
+        if request.get("stats"):
+            return self.get_stats()
+        return {"error": "unknown request"}
+
+    async def _handle_connection(self, reader, writer):
+        """
+        This function serves one connection. Requests are handled concurrently (so that the requests of one client can
+        share a micro-batch), and their responses are written in order by a separate task. If writing fails (e.g. the
+        client reset the connection), reading stops too, so that the connection doesn't wait forever for room in the
+        queue of responses.
+        Args:
+            reader: the asyncio StreamReader of the connection
+            writer: the asyncio StreamWriter of the connection
+        """
+        responses = asyncio.Queue(maxsize=MAX_PIPELINED_REQUESTS)
+        reader_task = asyncio.ensure_future(self._read_requests(reader, responses))
+        writer_task = asyncio.ensure_future(self._write_responses(responses, writer))
+        try:
+            await asyncio.wait([reader_task, writer_task], return_when=asyncio.FIRST_COMPLETED)
+            if reader_task.done() and not reader_task.cancelled() and reader_task.exception() is None:
+                # All requests were read and followed by None, so the writer finishes after the last response
+                await asyncio.wait([writer_task])
+        finally:
+            for task in [reader_task, writer_task]:
+                task.cancel()
+            await asyncio.gather(reader_task, writer_task, return_exceptions=True)
+            while not responses.empty():
+                task = responses.get_nowait()
+                if task is not None:
+                    task.cancel()
+            writer.close()
+
+    async def _read_requests(self, reader, responses):
+        """
+        This function reads the requests of a connection, and puts the tasks that compute their responses in the queue
+        of responses, followed by None when the client closes its side of the connection.
+        Args:
+            reader: the asyncio StreamReader of the connection
+            responses: the queue of tasks that compute the responses
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            request_line = await self._read_request_line(reader)
+            if request_line is None:
+                response = loop.create_future()
+                response.set_result({"error": "the request is longer than {} bytes".format(self.max_request_size)})
+            elif not request_line:
+                break
+            else:
+                response = asyncio.ensure_future(self._handle_request(request_line))
+            await responses.put(response)
+        await responses.put(None)
+
+    @staticmethod
+    async def _read_request_line(reader):
+        """
+        This function returns the next request line of a connection, b"" at the end of the connection, or None if the
+        line is longer than the limit of the reader. In that case, the line is skipped without keeping it in memory.
+        Args:
+            reader: the asyncio StreamReader of the connection
+        """
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as err:
+            return err.partial
+        except asyncio.LimitOverrunError as err:
+            consumed = err.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                return None
+            except asyncio.IncompleteReadError:
+                return None
+            except asyncio.LimitOverrunError as err:
+                consumed = err.consumed
+
+    @staticmethod
+    async def _write_responses(responses, writer):
+        """
+        This function writes the responses of a connection in the order of requests.
+        Args:
+            responses: a queue of tasks that compute the responses, terminated by None
+            writer: the asyncio StreamWriter of the connection
+        """
+        while True:
+            task = await responses.get()
+            if task is None:
+                return
+            try:
+                response = await task
+            except Exception as err:
+                response = {"error": str(err)}
+            writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+
+
+class SegmentationClient:
+    """
+    An asyncio client for SegmentationServer. Requests of one call are pipelined, so that they can be segmented in the
+    same micro-batches on the server.
+    """
+    def __init__(self):
+        """
+        The __init__ function creates a new instance of the class. Use connect to connect it to a server.
+        """
+        self._reader = None
+        self._writer = None
+        self._lock = None
+
+    async def connect(self, unix_path=None, host="127.0.0.1", port=None):
+        """
+        This function connects the client to a server, over a Unix socket if unix_path is given and over TCP otherwise.
+        Args:
+            unix_path: path of the Unix socket of the server
+            host: the host of the server
+            port: the TCP port of the server
+        """
+        if unix_path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(path=unix_path, limit=MAX_RESPONSE_SIZE)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(host=host, port=port, limit=MAX_RESPONSE_SIZE)
+        self._lock = asyncio.Lock()
+        return self
+
+    async def _request_many(self, requests):
+        """
+        This function sends a list of requests and returns their responses in the same order.
+        Args:
+            requests: a list of JSON-serializable requests
+        """
+        async def send():
+            for request in requests:
+                self._writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+                await self._writer.drain()
+
+        async def receive():
+            return [json.loads(await self._reader.readline()) for _ in requests]
+
+        # Responses are read while requests are being sent, so that neither side blocks on a full socket buffer
+        async with self._lock:
+            _, responses = await asyncio.gather(send(), receive())
+        return responses
+
+    async def segment_many(self, texts):
+        """
+        This function returns the list of word boundary offsets of each of the given lines.
+        Args:
+            texts: a list of unsegmented lines
+        """
+        responses = await self._request_many([{"text": text} for text in texts])
+        for response in responses:
+            if "error" in response:
+                print("Warning: the server could not segment a line: {}".format(response["error"]))
+        return [response.get("offsets") for response in responses]
+
+    async def segment(self, text):
+        """
+        This function returns the word boundary offsets of one line.
+        Args:
+            text: the unsegmented line
+        """
+        return (await self.segment_many([text]))[0]
+
+    async def get_stats(self):
+        """
+        This function returns the statistics of the server (see SegmentationServer.get_stats).
+        """
+        return (await self._request_many([{"stats": True}]))[0]
+
+    async def close(self):
+        """
+        This function closes the connection.
+        """
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def serve(model_name, unix_path=None, host="127.0.0.1", port=8765, max_batch_size=64, max_wait=0.005):
+    """
+    This function loads a saved model and serves it until it is cancelled (e.g. by Ctrl-C).
+    Args:
+        model_name: name of the model
+        unix_path: path of the Unix socket. If None, the server listens on host:port
+        host: the host of the TCP server
+        port: the TCP port
+        max_batch_size: the maximum number of lines in a micro-batch
+        max_wait: the maximum time (in seconds) that a line waits for other lines before its micro-batch is run
+    """
+    word_segmenter = pick_lstm_model(model_name=model_name, embedding=embedding_from_name(model_name),
+                                     train_data="", eval_data="")
+    server = SegmentationServer(word_segmenter, max_batch_size=max_batch_size, max_wait=max_wait)
+    await server.start(unix_path=unix_path, host=host, port=port)
+    print("Serving model {} on {}".format(model_name, server.get_address()))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv):
+    """
+    Runs the server from the command line:
+        python -m lstm_word_segmentation.server -m model [-u socket_path | -p port] [-b max_batch_size] [-w max_wait_ms]
+    """
+    kwargs = {"model_name": "Thai_codepoints_exclusive_model4_heavy"}
+    try:
+        opts, _ = getopt.getopt(argv, "m:u:p:b:w:")
+    except getopt.GetoptError:
+        print(main.__doc__)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == "-m":
+            kwargs["model_name"] = arg
+        if opt == "-u":
+            kwargs["unix_path"] = arg
+        if opt == "-p":
+            kwargs["port"] = int(arg)
+        if opt == "-b":
+            kwargs["max_batch_size"] = int(arg)
+        if opt == "-w":
+            kwargs["max_wait"] = float(arg) / 1000
+    try:
+        asyncio.run(serve(**kwargs))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
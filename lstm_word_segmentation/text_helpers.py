@@ -1,12 +1,18 @@
+import functools
 import numpy as np
 from pathlib import Path
 from .line import Line
+from .break_iterators import get_brkpoints
 from .accuracy import Accuracy
 from .helpers import is_ascii
+from .parallel import parallel_map
 from icu import Char, Script, UCharCategory
 from . import constants
 from icu import UnicodeSet
 
+# The genres of the BEST data set, in the order that texts with the same number are used in
+BEST_CATEGORIES = ["news", "encyclopedia", "article", "novel"]
+
 
 def remove_tags(line, st_tag, fn_tag):
     """
@@ -21,6 +27,9 @@ def remove_tags(line, st_tag, fn_tag):
         st_tag: the first substring
         fn_tag: the secibd substring
     """
+    # Most lines have no tags, and the loop below copies them unchanged one character at a time
+    if st_tag not in line:
+        return line
     new_line = ""
     last_bar = 0
     ind = 0
@@ -189,9 +198,9 @@ def divide_train_test_data(input_text, train_text, valid_text, test_text, line_l
                 test_file.write(line + "\n")
 
 
-def get_lines_of_text(file, type_of_lines):
+def iterate_lines_of_text(file, type_of_lines):
     """
-    Given a file, this function returns a list of line objects in that file.
+    Given a file, this function yields the line objects in that file one by one, without reading the whole file first.
     Args:
         file: Address of the file
         type_of_lines: It shows what is the type of sentences in the file. It can take 3 different values: unsegmented,
@@ -200,15 +209,94 @@ def get_lines_of_text(file, type_of_lines):
     segmented = True
     if type_of_lines == "unsegmented":
         segmented = False
-    out = []
     with open(file) as f:
         for file_line in f:
             file_line = clean_line(file_line, segmented)
             if file_line == -1:
                 continue
-            line = Line(file_line, type_of_lines)
-            out.append(line)
-    return out
+            yield Line(file_line, type_of_lines)
+
+
+def get_lines_of_text(file, type_of_lines):
+    """
+    Given a file, this function returns a list of line objects in that file.
+    Args:
+        file: Address of the file
+        type_of_lines: It shows what is the type of sentences in the file. It can take 3 different values: unsegmented,
+        man_segmented, or icu_segmented
+    """
+    return list(iterate_lines_of_text(file, type_of_lines))
+
+
+def _can_split_before(text):
+    """
+    This function returns True if ICU puts both a grapheme cluster boundary and a word boundary between a space and the
+    start of text. In that case, a string that ends with a space and a string that starts with text can be segmented
+    (or featurized) separately and give the same result as their concatenation. This is not the case when text starts
+    with e.g. a combining mark or a format character, which ICU attaches to the space before it.
+    Args:
+        text: the unsegmented start of a line
+    """
+    if len(text) == 0:
+        return False
+    head = " " + text[:8]
+    return get_brkpoints(head, "character")[1] == 1 and get_brkpoints(head, "word")[1] == 1
+
+
+def join_lines_in_blocks(lines, block_size=100000, segmented=True):
+    """
+    This function joins lines with single spaces (as get_segmented_file_in_one_line does), but yields the result in
+    blocks of about block_size characters instead of as one string, so that " ".join(blocks) is the same as
+    " ".join(lines). A block only ends before a line that can be segmented separately from the text before it (see
+    _can_split_before), so each block can be segmented or featurized on its own, and for segmented lines, a block
+    only ends between two lines that end and start with "|".
+    Args:
+        lines: an iterable of lines
+        block_size: the number of characters after which a block ends, at the next line where it can end
+        segmented: if True, the lines are segmented lines that start and end with "|"
+    """
+    block = []
+    block_len = 0
+    for line in lines:
+        if block_len >= block_size:
+            if segmented:
+                can_split = block[-1].endswith("|") and line.startswith("|") and \
+                    _can_split_before(line[:16].replace("|", ""))
+            else:
+                can_split = len(block[-1]) > 0 and _can_split_before(line)
+            if can_split:
+                yield " ".join(block)
+                block = []
+                block_len = 0
+        block.append(line)
+        block_len += len(line) + 1
+    if block:
+        yield " ".join(block)
+
+
+def iterate_segmented_file_lines(filename, input_type, output_type, block_size=100000):
+    """
+    This function is the streaming version of get_segmented_file_in_one_line: it yields segmented strings such that
+    " ".join of them is the output of get_segmented_file_in_one_line. For manually segmented output, it yields the
+    segmented lines of the file. For ICU segmented output, it yields the ICU segmentation of blocks of lines (see
+    join_lines_in_blocks), which is the same as the ICU segmentation of all lines of the file together.
+    Args:
+        filename: address of the input file
+        input_type: determines if the input is unsegmented, manually segmented, or ICU segmented
+        output_type: determines if the output is manually segmented or ICU segmented
+        block_size: the approximate number of characters that ICU segments at once
+    """
+    lines = iterate_lines_of_text(filename, input_type)
+    if output_type == "man_segmented":
+        for line in lines:
+            yield line.man_segmented
+    if output_type == "icu_segmented":
+        empty = True
+        for block in join_lines_in_blocks((line.unsegmented for line in lines), block_size, segmented=False):
+            empty = False
+            yield Line(block, "unsegmented").icu_segmented
+        if empty:
+            yield Line("", "unsegmented").icu_segmented
 
 
 def get_segmented_file_in_one_line(filename, input_type, output_type):
@@ -224,24 +312,65 @@ def get_segmented_file_in_one_line(filename, input_type, output_type):
         input_type: determines if the input is unsegmented, manually segmented, or ICU segmented
         output_type: determines if the output is manually segmented or ICU segmented
     """
-    lines = get_lines_of_text(filename, input_type)
-    all_file_line = ""
-    if output_type == "man_segmented":
-        for i in range(len(lines)):
-            all_file_line += lines[i].man_segmented
-            if i != len(lines) - 1:
-                all_file_line += " "
-        return all_file_line
-    if output_type == "icu_segmented":
-        for i in range(len(lines)):
-            all_file_line += lines[i].unsegmented
-            if i != len(lines)-1:
-                all_file_line += " "
-        all_file_line = Line(all_file_line, "unsegmented")
-        return all_file_line.icu_segmented
+    return " ".join(iterate_segmented_file_lines(filename, input_type, output_type))
 
 
-def get_best_data_text(starting_text, ending_text, pseudo, exclusive):
+def get_best_files(starting_text, ending_text, exclusive):
+    """
+    This function returns the addresses of the BEST texts with text number in a given range, in the order that they are
+    used in: the four genres of the first text, then the four genres of the next text, and so on.
+    Args:
+        starting_text: number or the smallest text
+        ending_text: number or the largest text + 1
+        exclusive: determines if we want use original BEST data set or exclusive BEST data set
+    """
+    data_dir = "Data/exclusive_Best" if exclusive else "Data/Best"
+    files = []
+    for text_num in range(starting_text, ending_text):
+        for cat in BEST_CATEGORIES:
+            text_num_str = "{}".format(text_num).zfill(5)
+            files.append(Path.joinpath(Path(__file__).parent.parent.absolute(), "{}/{}/{}_".format(data_dir, cat, cat) +
+                                       text_num_str + ".txt"))
+    return files
+
+
+def _get_segmented_file_lines(filename, input_type, output_type):
+    """
+    This function returns the list of segmented strings of iterate_segmented_file_lines, so that a whole file can be
+    processed in a worker process of parallel_map.
+    """
+    return list(iterate_segmented_file_lines(filename, input_type, output_type))
+
+
+def iterate_best_data_lines(starting_text, ending_text, pseudo, exclusive, jobs=1):
+    """
+    This function is the streaming version of get_best_data_text: it yields segmented strings (see
+    iterate_segmented_file_lines) of the BEST texts one after another, such that " ".join of them is the output of
+    get_best_data_text.
+    Args:
+        starting_text: number or the smallest text
+        ending_text: number or the largest text + 1
+        pseudo: if True, it means we use pseudo segmented data, if False, we use BEST manually segmentation
+        exclusive: determines if we want use original BEST data set or exclusive BEST data set where any non-thai code
+        point is excluded from texts
+        jobs: the number of processes that read, clean, and (for pseudo) segment the texts with ICU, one text at a time
+        (None or 0 for the number of CPUs). The output doesn't depend on it.
+    """
+    output_type = "man_segmented"
+    if pseudo:
+        output_type = "icu_segmented"
+    read_file = functools.partial(_get_segmented_file_lines, input_type="man_segmented", output_type=output_type)
+    started = False
+    for segmented_lines in parallel_map(read_file, get_best_files(starting_text, ending_text, exclusive), jobs):
+        if segmented_lines:
+            started = True
+            yield from segmented_lines
+        elif started:
+            # An empty text after the first non-empty one adds a space, as it always has in get_best_data_text
+            yield ""
+
+
+def get_best_data_text(starting_text, ending_text, pseudo, exclusive, jobs=1):
     """
     Gives a long string, that contains all lines (separated by a single space) from BEST data. This function uses data
     from all genres (news, encyclopedia, article, and novel) with text numbr in a given range.
@@ -254,28 +383,9 @@ def get_best_data_text(starting_text, ending_text, pseudo, exclusive):
         pseudo: if True, it means we use pseudo segmented data, if False, we use BEST manually segmentation
         exclusive: determines if we want use original BEST data set or exclusive BEST data set where any non-thai code
         point is excluded from texts
+        jobs: the number of processes that the texts are read with (see iterate_best_data_lines)
     """
-    out_str = ""
-    category = ["news", "encyclopedia", "article", "novel"]
-    for text_num in range(starting_text, ending_text):
-        for cat in category:
-            text_num_str = "{}".format(text_num).zfill(5)
-            if exclusive:
-                file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/exclusive_Best/{}/{}_".
-                                     format(cat, cat) + text_num_str + ".txt")
-            else:
-                file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/Best/{}/{}_".format(cat, cat) +
-                                     text_num_str + ".txt")
-            output_type = "man_segmented"
-            if pseudo:
-                output_type = "icu_segmented"
-            new_line = get_segmented_file_in_one_line(filename=file, input_type="man_segmented",
-                                                      output_type=output_type)
-            if len(out_str) == 0:
-                out_str = new_line
-            else:
-                out_str = out_str + " " + new_line
-    return out_str
+    return " ".join(iterate_best_data_lines(starting_text, ending_text, pseudo, exclusive, jobs))
 
 
 def compute_accuracy(file, segmentation_type):
@@ -287,15 +397,16 @@ def compute_accuracy(file, segmentation_type):
         segmentation_type: Indicates what algorithm we want to test. For now, it can be "icu" or "deep".
     """
     accuracy = Accuracy()
-    lines = get_lines_of_text(file, "man_segmented")
-    for line in lines:
-        true_bies = line.get_bies_grapheme_clusters(segmentation_type="man")
-        algo_bies = line.get_bies_grapheme_clusters(segmentation_type=segmentation_type)
-        accuracy.update(true_bies=true_bies.str, est_bies=algo_bies.str)
+    true_bies_list = []
+    est_bies_list = []
+    for line in iterate_lines_of_text(file, "man_segmented"):
+        true_bies_list.append(line.get_bies_grapheme_clusters(segmentation_type="man").str)
+        est_bies_list.append(line.get_bies_grapheme_clusters(segmentation_type=segmentation_type).str)
+    accuracy.update_many(true_bies_list=true_bies_list, est_bies_list=est_bies_list)
     return accuracy
 
 
-def compute_accuracy_best(starting_text, ending_text, algorithm, exclusive):
+def compute_accuracy_best(starting_text, ending_text, algorithm, exclusive, jobs=1):
     """
     This function uses BEST data set to compute the accuracy of an existing algorithm such as ICU or Deepcut.
     Args:
@@ -303,19 +414,16 @@ def compute_accuracy_best(starting_text, ending_text, algorithm, exclusive):
         ending_text: number or the largest text + 1
         algorithm: the algorithm to be tested. It can be "icu" or "deep" for now.
         exclusive: identifies to use BEST data or exclusive BEST data
+        jobs: the number of processes that compute the accuracy of the texts, one text at a time (None or 0 for the
+        number of CPUs). The accuracies of the texts are merged in order, so the output doesn't depend on it.
     """
-    category = ["news", "encyclopedia", "article", "novel"]
     accuracy = Accuracy()
-    for text_num in range(starting_text, ending_text):
-        print("comuting accuracy for text number {}".format(text_num))
-        for cat in category:
-            text_num_str = "{}".format(text_num).zfill(5)
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/Best/{}/{}_".format(cat, cat) +
-                                 text_num_str + ".txt")
-            if exclusive:
-                file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/exclusive_Best/{}/{}_".format(
-                                     cat, cat) + text_num_str + ".txt")
-            accuracy.merge_accuracy(compute_accuracy(file, segmentation_type=algorithm))
+    files = get_best_files(starting_text, ending_text, exclusive)
+    file_accuracies = parallel_map(functools.partial(compute_accuracy, segmentation_type=algorithm), files, jobs)
+    for i, file_accuracy in enumerate(file_accuracies):
+        if i % len(BEST_CATEGORIES) == 0:
+            print("comuting accuracy for text number {}".format(starting_text + i // len(BEST_CATEGORIES)))
+        accuracy.merge_accuracy(file_accuracy)
     return accuracy
 
 
@@ -434,17 +542,20 @@ def only_one_script_text(input_text, output_text, script, segmented):
                     new_str = ""
 
 
-def make_thai_specific_best_data():
+def _make_thai_specific_text(files):
+    """
+    This function makes the exclusive version of one BEST text, given the pair of its input and output addresses.
+    """
+    only_one_script_text(input_text=files[0], output_text=files[1], script="Thai", segmented=True)
+
+
+def make_thai_specific_best_data(jobs=1):
     """
     This function makes a copy of BEST data with only those code points that are identified by ICU Thai engine. This
     copy is called "exclusive BEST"
+    Args:
+        jobs: the number of processes that make the texts, one text at a time (None or 0 for the number of CPUs)
     """
-    category = ["news", "encyclopedia", "article", "novel"]
-    for text_num in range(1, 96):
-        for cat in category:
-            text_num_str = "{}".format(text_num).zfill(5)
-            input_text = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/Best/{}/{}_".format(cat, cat) +
-                                       text_num_str + ".txt")
-            output_text = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/exclusive_Best/{}/{}_".
-                                        format(cat, cat) + text_num_str + ".txt")
-            only_one_script_text(input_text=input_text, output_text=output_text, script="Thai", segmented=True)
+    files = zip(get_best_files(1, 96, exclusive=False), get_best_files(1, 96, exclusive=True))
+    for _ in parallel_map(_make_thai_specific_text, files, jobs):
+        pass
@@ -1,76 +1,268 @@
 from pathlib import Path
+import copy
+import queue
+import threading
 import numpy as np
 import json
 from icu import Char
-from keras.models import Sequential
-from keras.layers import LSTM, Dense, TimeDistributed, Bidirectional, Embedding, Dropout
-from tensorflow import keras
 
 from . import constants
-from .helpers import sigmoid
-from .text_helpers import get_segmented_file_in_one_line, get_best_data_text, get_lines_of_text
+from .text_helpers import iterate_segmented_file_lines, iterate_best_data_lines, get_lines_of_text, \
+    join_lines_in_blocks, get_best_files
 from .accuracy import Accuracy
 from .line import Line
-from .bies import Bies
-from .grapheme_cluster import GraphemeCluster
-from .code_point import CodePoint
+from .bies import Bies, decode_bies
+from .featurizer import Featurizer
+from .compiled_segmenter import CompiledSegmenter
+from .model_io import get_model_dir, load_model_weights, save_weights_bin, embedding_from_name
+from .segmentation_cache import split_chunks
+from .feature_cache import get_feature_key, get_file_digest
+from .parallel import parallel_map, get_num_jobs
+
+# The featurizer that _get_trainable_data_in_worker uses in a process that featurizes training data
+_worker_featurizer = None
+
+
+def _init_featurizer_worker(featurizer):
+    """
+    This function sets the featurizer of the current process, once per worker process of parallel_map, so that it isn't
+    sent with every block of training data.
+    Args:
+        featurizer: a Featurizer instance
+    """
+    global _worker_featurizer
+    _worker_featurizer = featurizer
+
+
+def _get_trainable_data_in_worker(input_line):
+    """
+    This function returns Featurizer.get_trainable_data of a segmented line using the featurizer of the current process.
+    Args:
+        input_line: the segmented line
+    """
+    return _worker_featurizer.get_trainable_data(input_line)
+
+
+# The names of the arrays of a test file in the feature cache (see WordSegmenter._get_cached_test_arrays)
+_TEST_ARRAY_NAMES = ["x", "y", "offsets"]
+
+# The model that _test_shard_in_worker uses in a process that evaluates test files
+_worker_segmenter = None
+
+
+def _init_evaluation_worker(word_segmenter):
+    """
+    This function sets the model of the current process, once per worker process of parallel_map.
+    Args:
+        word_segmenter: a WordSegmenter instance without a Keras model (see WordSegmenter._get_evaluation_copy)
+    """
+    global _worker_segmenter
+    _worker_segmenter = word_segmenter
+
+
+def _test_shard_in_worker(task):
+    """
+    This function returns the Accuracy of a shard of the lines of a test file using the model of the current process.
+    Args:
+        task: a tuple of the segmented lines of the shard (or None), the key of the arrays of the file in the feature
+        cache and the indices of the lines of the shard (or None, None), and the batch size (see
+        WordSegmenter._get_test_shard_tasks)
+    """
+    lines, key, indices, batch_size = task
+    if key is None:
+        line_arrays = [_worker_segmenter._get_trainable_data(line) for line in lines]
+    else:
+        line_arrays = _slice_line_arrays(_worker_segmenter.feature_cache.load(key, _TEST_ARRAY_NAMES), indices)
+    return _worker_segmenter._test_line_arrays(line_arrays, batch_size)
+
+
+def _slice_line_arrays(arrays, indices):
+    """
+    This function returns the list of (x, y) arrays of some lines of arrays of a test file in the feature cache.
+    Args:
+        arrays: a dictionary of the "x", "y", and "offsets" arrays of a file (see WordSegmenter._get_cached_test_arrays)
+        indices: the indices of the lines
+    """
+    x_data, y_data, offsets = arrays["x"], arrays["y"], arrays["offsets"]
+    return [(x_data[offsets[i]: offsets[i + 1]], y_data[offsets[i]: offsets[i + 1]]) for i in indices]
+
+
+def _get_shard(items, shard, num_shards):
+    """
+    This function returns the shard-th of num_shards contiguous parts of a list (or range) of items, whose lengths
+    differ by at most one.
+    Args:
+        items: the list of items
+        shard: the index of the part
+        num_shards: the number of parts
+    """
+    return items[len(items) * shard // num_shards: len(items) * (shard + 1) // num_shards]
+
+
+def _get_length_buckets(lengths, batch_size, max_units=65536):
+    """
+    This function groups the indices of lines into batches of lines with similar lengths: the indices are sorted by
+    length, and each batch has at most batch_size lines and, when padded to its longest line, at most max_units units
+    (or a single line, if that line is longer), so that long lines don't make a large padded batch.
+    Args:
+        lengths: the list of the number of units of each line
+        batch_size: the maximum number of lines in a batch
+        max_units: the maximum number of units in a padded batch
+    """
+    buckets = []
+    bucket = []
+    for ind in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        if bucket and (len(bucket) == batch_size or (len(bucket) + 1) * lengths[ind] > max_units):
+            buckets.append(bucket)
+            bucket = []
+        bucket.append(ind)
+    if bucket:
+        buckets.append(bucket)
+    return buckets
+
+
+def _print_text_accuracy(file, accuracy):
+    """
+    This function prints the accuracy of the model on a test file.
+    Args:
+        file: the address of the file
+        accuracy: the Accuracy instance of the file
+    """
+    print("The BIES accuracy (line by line) for file {} : {:.3f}".format(file, accuracy.get_bies_accuracy()))
+    print("The F1 score (line by line) for file {} : {:.3f}".format(file, accuracy.get_f1_score()))
+
+
+def _prefetch(iterator, size):
+    """
+    This function runs an iterator in a background thread, keeping up to `size` of its items ready, and yields them in
+    the same order. It lets batches be made while the model is trained on the previous batches.
+    Args:
+        iterator: the iterator to be run in the background
+        size: the maximum number of items that are made ahead
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        # Each item is sent as (False, item), and the end of the iterator or its exception as (True, exception or None)
+        try:
+            for item in iterator:
+                put((False, item))
+                if stop.is_set():
+                    return
+            put((True, None))
+        except Exception as err:
+            put((True, err))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            finished, item = items.get()
+            if finished:
+                if item is not None:
+                    raise item
+                return
+            yield item
+    finally:
+        stop.set()
 
 
 class KerasBatchGenerator(object):
     """
-    A batch generator component, which is used to generate batches for training, validation, and evaluation.
+    A batch generator component, which is used to generate batches for training, validation, and evaluation. The data
+    is cut into windows of n consecutive units, and each batch has batch_size windows.
     Args:
-        x_data: A list of GraphemeCluster objects that is the input of the model
+        x_data: A np array that is the input of the model (the output of Featurizer.featurize): ids of units, or a
+        matrix with one generalized vector per unit. It can be a np.memmap, since only the units of one batch are read
+        at a time.
         y_data: A np array that contains output of the model
         n: length of the input and output in each batch
         batch_size: number of batches
+        num_clusters: number of grapheme cluster ids, used to make one hot vectors for "grapheme_clusters_man"
+        seed: the seed of the random generator that shuffles windows
     """
-    def __init__(self, x_data, y_data, n, batch_size):
+    def __init__(self, x_data, y_data, n, batch_size, num_clusters=None, seed=None):
         self.x_data = x_data
         self.y_data = y_data
         self.n = n
         self.batch_size = batch_size
+        self.num_clusters = num_clusters
         self.dim_output = self.y_data.shape[1]
+        self.num_windows = len(x_data) // n
+        self.rng = np.random.default_rng(seed)
         if len(x_data) != y_data.shape[0]:
             print("Warning: x_data and y_data have not compatible sizes!")
         if len(x_data) < batch_size * n:
             print("Warning: x_data or y_data is not large enough!")
 
-    def generate(self, embedding_type):
+    def get_steps_per_pass(self):
+        """
+        This function returns the number of batches in one pass over the data. The windows that do not fill a whole
+        batch are left out of that pass (when windows are shuffled, different windows are left out in each pass).
         """
-        This function generates batches used for training and validation
+        return max(1, self.num_windows // self.batch_size)
+
+    def generate(self, embedding_type, shuffle=True, prefetch=2):
         """
-        x, y = self.generate_once(embedding_type)
+        This function generates batches used for training and validation. It goes over all windows of the data again
+        and again, in a new random order in each pass if shuffle is True, and only makes one batch at a time.
+        Args:
+            embedding_type: the embedding type of the model
+            shuffle: if True, the order of windows is shuffled in each pass
+            prefetch: the number of batches that are made ahead in a background thread. If 0, batches are made when
+            they are requested.
+        """
+        batches = self._generate_batches(embedding_type, shuffle)
+        if prefetch > 0:
+            batches = _prefetch(batches, prefetch)
+        yield from batches
+
+    def _generate_batches(self, embedding_type, shuffle):
+        """
+        This function is the generator behind the generate function, without prefetching.
+        Args:
+            embedding_type: the embedding type of the model
+            shuffle: if True, the order of windows is shuffled in each pass
+        """
+        steps = self.get_steps_per_pass()
         while True:
-            yield x, y
+            windows = self.rng.permutation(self.num_windows) if shuffle else np.arange(self.num_windows)
+            for step in range(steps):
+                # Sorting the windows of a batch doesn't change the gradient, but reads a memmap in order
+                batch_windows = np.sort(windows[step * self.batch_size: (step + 1) * self.batch_size])
+                yield self._make_batch(batch_windows, embedding_type)
 
     def generate_once(self, embedding_type):
         """
-        This function generates batches only once and is used for testing
+        This function generates batches only once and is used for testing. The batch has the first batch_size windows.
+        """
+        return self._make_batch(np.arange(min(self.batch_size, self.num_windows)), embedding_type)
+
+    def _make_batch(self, windows, embedding_type):
         """
-        y = np.zeros([self.batch_size, self.n, self.dim_output])
+        This function makes the x and y arrays of a batch, by gathering all units of the given windows at once.
+        Args:
+            windows: an array of the indices of windows in the batch
+            embedding_type: the embedding type of the model
+        """
+        indices = (windows * self.n)[:, np.newaxis] + np.arange(self.n)
+        y = np.asarray(self.y_data[indices], dtype=float)
         x = None
-        if embedding_type == "grapheme_clusters_tf":
-            x = np.zeros([self.batch_size, self.n])
+        if embedding_type in ["grapheme_clusters_tf", "codepoints", "generalized_vectors"]:
+            x = np.asarray(self.x_data[indices])
         elif embedding_type == "grapheme_clusters_man":
-            x = np.zeros([self.batch_size, self.n, self.x_data[0].num_clusters])
-        elif embedding_type == "generalized_vectors":
-            x = np.zeros([self.batch_size, self.n, self.x_data[0].generalized_vec_length])
-        elif embedding_type == "codepoints":
-            x = np.zeros([self.batch_size, self.n])
+            x = np.eye(self.num_clusters)[self.x_data[indices]]
         else:
             print("Warning: the embedding type is not valid")
-        for i in range(self.batch_size):
-            for j in range(self.n):
-                if embedding_type == "grapheme_clusters_tf":
-                    x[i, j] = self.x_data[self.n*i + j].graph_clust_id
-                if embedding_type == "grapheme_clusters_man":
-                    x[i, j, :] = self.x_data[self.n*i + j].graph_clust_vec
-                if embedding_type == "generalized_vectors":
-                    x[i, j, :] = self.x_data[self.n*i + j].generalized_vec
-                if embedding_type == "codepoints":
-                    x[i, j] = self.x_data[self.n * i + j].codepoint_id
-            y[i, :, :] = self.y_data[self.n * i: self.n * (i + 1), :]
         return x, y
 
 
@@ -114,7 +306,16 @@ class WordSegmenter:
         self.evaluation_data = input_evaluation_data
         self.language = input_language
         self.embedding_type = input_embedding_type
+        # The embedding type before different versions of generalized vectors are merged (see the end of this function)
+        self.input_embedding_type = input_embedding_type
         self.model = None
+        self.model_weights = None
+        self.compiled_segmenter = None
+        self.cache = None
+        self.feature_cache = None
+        self.featurizer = None
+        # None for the default decoders (see _get_bies_decoder)
+        self.bies_decoder = None
 
         # Constructing the grapheme cluster dictionary -- this will be used if self.embedding_type is Grapheme Clusters
         ratios = None
@@ -205,106 +406,75 @@ class WordSegmenter:
     def _get_trainable_data(self, input_line):
         """
         Given a segmented line, generates a list of input data (with respect to the embedding type) and a n*4 np array
-        that represents BIES where n is the length of the unsegmented line.
+        that represents BIES where n is the length of the unsegmented line (see Featurizer.get_trainable_data).
         Args:
-            input_line: the unsegmented line
+            input_line: the segmented line
         """
-        # Finding word breakpoints
-        # Note that it is possible that input is segmented manually instead of icu. However, for both cases we set that
-        # input_type equal to "icu_segmented" because that doesn't affect performance of this function. This way we
-        # won't need unnecessary if/else for "man_segmented" and "icu_segmented" throughout rest of this function.
-        line = Line(input_line, "icu_segmented")
-
-        # x_data and y_data will be code point based if self.embedding_type is codepoints
-        if self.embedding_type == "codepoints":
-            true_bies = line.get_bies_codepoints("icu")
-            y_data = true_bies.mat
-            line_len = len(line.unsegmented)
-            x_data = []
-            for i in range(line_len):
-                x_data.append(CodePoint(line.unsegmented[i], self.codepoint_dic))
-
-        # x_data and y_data will be grapheme clusters based if self.embedding type is grapheme_clusters or generalized_
-        # vectors
-        else:
-            true_bies = line.get_bies_grapheme_clusters("icu")
-            y_data = true_bies.mat
-            line_len = len(line.char_brkpoints) - 1
-            x_data = []
-            for i in range(line_len):
-                char_start = line.char_brkpoints[i]
-                char_finish = line.char_brkpoints[i + 1]
-                curr_char = line.unsegmented[char_start: char_finish]
-                x_data.append(GraphemeCluster(curr_char, self.graph_clust_dic, self.letters_dic))
+        return self._get_featurizer().get_trainable_data(input_line)
 
-        return x_data, y_data
+    def _get_trainable_data_of_lines(self, input_lines, jobs=1):
+        """
+        This function returns the same arrays as _get_trainable_data for the segmented lines joined by single spaces,
+        without making that string. Lines are joined into blocks (see join_lines_in_blocks), and the arrays of blocks
+        and the spaces between them are concatenated. The only difference is when the segmented data has a word
+        boundary inside a grapheme cluster (e.g. a line that starts with a combining mark): then
+        Line.get_bies_grapheme_clusters loses track of the words and labels all following grapheme clusters as "i",
+        which now ends at the end of the block instead of the end of the data.
+        Args:
+            input_lines: an iterable of segmented lines that start and end with "|"
+            jobs: the number of processes that featurize the blocks (None or 0 for the number of CPUs). The blocks are
+            the same for any number of processes, so the arrays are too.
+        """
+        x_parts = []
+        y_parts = []
+        space_x, space_y = self._get_trainable_data("| |")
+        block_arrays = parallel_map(_get_trainable_data_in_worker, join_lines_in_blocks(input_lines), jobs,
+                                    initializer=_init_featurizer_worker, initargs=(self._get_featurizer(),))
+        for x_data, y_data in block_arrays:
+            if x_parts:
+                x_parts.append(space_x)
+                y_parts.append(space_y)
+            x_parts.append(x_data)
+            y_parts.append(y_data)
+        if not x_parts:
+            return self._get_trainable_data("")
+        return np.concatenate(x_parts), np.concatenate(y_parts)
 
-    def train_model(self):
+    def train_model(self, full_corpus=False, jobs=1):
         """
         This function trains the model using the dataset specified in the __init__ function. It combine all lines in
         the data set with a space between them and then divide this large string into batches of fixed length self.n.
         in reading files, if `pseudo` is True then we use icu segmented text instead of manually segmented texts to
         train the model.
+        Args:
+            full_corpus: if True, all of the training and validation data is used, in shuffled batches of
+            self.batch_size windows, and an epoch is one pass over the training data. If False, only the first self.t
+            units of each are used.
+            jobs: the number of processes that read and featurize the data (None or 0 for the number of CPUs). The
+            data doesn't depend on it.
         """
-        # Get training data of length self.t
-        input_str = None
-        if self.training_data == "BEST":
-            input_str = get_best_data_text(starting_text=1, ending_text=10, pseudo=False, exclusive=False)
-        elif self.training_data == "exclusive BEST":
-            input_str = get_best_data_text(starting_text=1, ending_text=10, pseudo=False, exclusive=True)
-        elif self.training_data == "pseudo BEST":
-            input_str = get_best_data_text(starting_text=1, ending_text=10, pseudo=True, exclusive=False)
-        elif self.training_data == "my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_train.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="unsegmented", output_type="icu_segmented")
-        elif self.training_data == "exclusive my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_train_exclusive.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="unsegmented", output_type="icu_segmented")
-        elif self.training_data == "SAFT_Burmese":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/SAFT_burmese_train.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="man_segmented", output_type="man_segmented")
-        elif self.training_data == "BEST_my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/Best_my_train.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="man_segmented", output_type="man_segmented")
-        else:
-            print("Warning: no implementation for this training data exists!")
-        x_data, y_data = self._get_trainable_data(input_str)
+        # Get training and validation data of length self.t
+        x_data, y_data = self._get_training_arrays(validation=False, jobs=jobs)
         if self.t > len(x_data):
             print("Warning: size of the training data is less than self.t")
-        x_data = x_data[:self.t]
-        y_data = y_data[:self.t, :]
-        train_generator = KerasBatchGenerator(x_data, y_data, n=self.n, batch_size=self.batch_size)
-
-        # Get validation data of length self.t
-        if self.training_data == "BEST":
-            input_str = get_best_data_text(starting_text=10, ending_text=20, pseudo=False, exclusive=False)
-        elif self.training_data == "exclusive BEST":
-            input_str = get_best_data_text(starting_text=10, ending_text=20, pseudo=False, exclusive=True)
-        elif self.training_data == "pseudo BEST":
-            input_str = get_best_data_text(starting_text=10, ending_text=20, pseudo=True, exclusive=False)
-        elif self.training_data == "my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_valid.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="unsegmented", output_type="icu_segmented")
-        elif self.training_data == "exclusive my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_valid_exclusive.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="unsegmented", output_type="icu_segmented")
-        elif self.training_data == "SAFT_Burmese":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/SAFT_burmese_test.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="man_segmented", output_type="man_segmented")
-        elif self.training_data == "BEST_my":
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/Best_my_valid.txt')
-            input_str = get_segmented_file_in_one_line(file, input_type="man_segmented", output_type="man_segmented")
-        else:
-            print("Warning: no implementation for this validation data exists!")
-        x_data, y_data = self._get_trainable_data(input_str)
-
+        if not full_corpus:
+            x_data = x_data[:self.t]
+            y_data = y_data[:self.t, :]
+        train_generator = KerasBatchGenerator(x_data, y_data, n=self.n, batch_size=self.batch_size,
+                                              num_clusters=self.clusters_num)
+        x_data, y_data = self._get_training_arrays(validation=True, jobs=jobs)
         if self.t > len(x_data):
             print("Warning: size of the validation data is less than self.t")
-        x_data = x_data[:self.t]
-        y_data = y_data[:self.t, :]
-        valid_generator = KerasBatchGenerator(x_data, y_data, n=self.n, batch_size=self.batch_size)
+        if not full_corpus:
+            x_data = x_data[:self.t]
+            y_data = y_data[:self.t, :]
+        valid_generator = KerasBatchGenerator(x_data, y_data, n=self.n, batch_size=self.batch_size,
+                                              num_clusters=self.clusters_num)
 
-        # Building the model
+        # Building the model. Keras is imported here because training is the only part of the code that needs it.
+        from keras.models import Sequential
+        from keras.layers import LSTM, Dense, TimeDistributed, Bidirectional, Embedding, Dropout
+        from tensorflow import keras
         model = Sequential()
         if self.embedding_type == "grapheme_clusters_tf":
             model.add(Embedding(input_dim=self.clusters_num, output_dim=self.embedding_dim, input_length=self.n))
@@ -327,13 +497,146 @@ class WordSegmenter:
         model.compile(loss='categorical_crossentropy', optimizer=opt, metrics=['accuracy'])
 
         # Fitting the model
+        steps_per_epoch = self.t // self.batch_size
+        validation_steps = self.t // self.batch_size
+        if full_corpus:
+            steps_per_epoch = train_generator.get_steps_per_pass()
+            validation_steps = valid_generator.get_steps_per_pass()
         model.fit(train_generator.generate(embedding_type=self.embedding_type),
-                  steps_per_epoch=self.t // self.batch_size, epochs=self.epochs,
-                  validation_data=valid_generator.generate(embedding_type=self.embedding_type),
-                  validation_steps=self.t // self.batch_size)
+                  steps_per_epoch=steps_per_epoch, epochs=self.epochs,
+                  validation_data=valid_generator.generate(embedding_type=self.embedding_type, shuffle=False),
+                  validation_steps=validation_steps)
         self.model = model
+        self.compiled_segmenter = None
+
+    def _read_training_lines(self, validation, jobs=1):
+        """
+        This function returns an iterator over the segmented lines of the training (or validation) data specified in
+        the __init__ function. The data is all of these lines joined by single spaces, but it is read as it is used, so
+        it is never held as one string.
+        Args:
+            validation: if True, the validation data is read instead of the training data
+            jobs: the number of processes that the texts of BEST data are read with (see iterate_best_data_lines)
+        """
+        data_dir = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data")
+        starting_text, ending_text = (10, 20) if validation else (1, 10)
+        input_lines = []
+        if self.training_data == "BEST":
+            input_lines = iterate_best_data_lines(starting_text=starting_text, ending_text=ending_text, pseudo=False,
+                                                  exclusive=False, jobs=jobs)
+        elif self.training_data == "exclusive BEST":
+            input_lines = iterate_best_data_lines(starting_text=starting_text, ending_text=ending_text, pseudo=False,
+                                                  exclusive=True, jobs=jobs)
+        elif self.training_data == "pseudo BEST":
+            input_lines = iterate_best_data_lines(starting_text=starting_text, ending_text=ending_text, pseudo=True,
+                                                  exclusive=False, jobs=jobs)
+        elif self.training_data == "my":
+            file = Path.joinpath(data_dir, "my_valid.txt" if validation else "my_train.txt")
+            input_lines = iterate_segmented_file_lines(file, input_type="unsegmented",
+                                                       output_type="icu_segmented")
+        elif self.training_data == "exclusive my":
+            file = Path.joinpath(data_dir, "my_valid_exclusive.txt" if validation else "my_train_exclusive.txt")
+            input_lines = iterate_segmented_file_lines(file, input_type="unsegmented",
+                                                       output_type="icu_segmented")
+        elif self.training_data == "SAFT_Burmese":
+            file = Path.joinpath(data_dir, "SAFT_burmese_test.txt" if validation else "SAFT_burmese_train.txt")
+            input_lines = iterate_segmented_file_lines(file, input_type="man_segmented",
+                                                       output_type="man_segmented")
+        elif self.training_data == "BEST_my":
+            file = Path.joinpath(data_dir, "Best_my_valid.txt" if validation else "Best_my_train.txt")
+            input_lines = iterate_segmented_file_lines(file, input_type="man_segmented",
+                                                       output_type="man_segmented")
+        elif validation:
+            print("Warning: no implementation for this validation data exists!")
+        else:
+            print("Warning: no implementation for this training data exists!")
+        return input_lines
+
+    def _get_training_arrays(self, validation, jobs=1):
+        """
+        This function returns the x and y arrays of the training (or validation) data. If a feature cache is set (see
+        set_feature_cache), the arrays are loaded from it as memory maps, or made and saved in it the first time.
+        Args:
+            validation: if True, the arrays of the validation data are returned
+            jobs: the number of processes that read and featurize the data if it is not in the cache
+        """
+        if self.feature_cache is None:
+            return self._get_trainable_data_of_lines(self._read_training_lines(validation, jobs), jobs)
+        text_range = "validation" if validation else "training"
+
+        def make_arrays():
+            x_data, y_data = self._get_trainable_data_of_lines(self._read_training_lines(validation, jobs), jobs)
+            return {"x": x_data, "y": y_data}
+
+        arrays = self.feature_cache.get_or_make(
+            self._get_feature_key(self.training_data, text_range), ["x", "y"], make_arrays,
+            description={"dataset": self.training_data, "range": text_range, "embedding": self.input_embedding_type})
+        return arrays["x"], arrays["y"]
+
+    def _get_feature_key(self, dataset, text_range):
+        """
+        This function returns the key of featurized data of this model in the feature cache (see get_feature_key).
+        Args:
+            dataset: name of the dataset or the address of a file
+            text_range: the part of the dataset that is featurized
+        """
+        return get_feature_key(dataset, text_range, [self.input_embedding_type, self.embedding_type],
+                               [self.graph_clust_dic, self.codepoint_dic, self.letters_dic])
+
+    def _get_test_lines(self, file, line_limit):
+        """
+        This function returns the first line_limit segmented lines of a file (as in lines[:line_limit]) as strings.
+        Args:
+            file: the address of the file
+            line_limit: number of lines. If set to -1, all lines but the last one are returned.
+        """
+        lines = get_lines_of_text(file, "man_segmented")
+        if len(lines) < line_limit:
+            print("Warning: not enough lines in the test file")
+        return [line.man_segmented for line in lines[:line_limit]]
+
+    def _get_cached_test_arrays(self, file):
+        """
+        This function returns the key in the feature cache of the arrays of all lines of a segmented file, and the
+        arrays: "x" and "y" of all lines concatenated, and the "offsets" of the lines in them. The arrays are loaded
+        from the cache, or made and saved in it the first time. The hash of the content of the file is a part of the
+        key, so a changed file is featurized again.
+        Args:
+            file: the address of the file
+        """
+        def make_arrays():
+            # The arrays of an empty line are added so that the arrays have the right shapes when the file is empty
+            lines = get_lines_of_text(file, "man_segmented")
+            line_arrays = [self._get_trainable_data("")]
+            line_arrays += [self._get_trainable_data(line.man_segmented) for line in lines]
+            lengths = [len(x_data) for x_data, _ in line_arrays[1:]]
+            return {"x": np.concatenate([x_data for x_data, _ in line_arrays]),
+                    "y": np.concatenate([y_data for _, y_data in line_arrays]),
+                    "offsets": np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))}
+
+        text_range = "lines with sha256 {}".format(get_file_digest(file))
+        key = self._get_feature_key(Path(file).absolute(), text_range)
+        arrays = self.feature_cache.get_or_make(
+            key, _TEST_ARRAY_NAMES, make_arrays,
+            description={"dataset": str(file), "range": text_range, "embedding": self.input_embedding_type})
+        return key, arrays
+
+    def _get_test_arrays(self, file, line_limit):
+        """
+        This function returns a list of the x and y arrays of the first line_limit lines of a segmented file (as in
+        lines[:line_limit]). If a feature cache is set, the arrays are loaded from it (see _get_cached_test_arrays).
+        Args:
+            file: the address of the file
+            line_limit: number of lines. If set to -1, all lines but the last one are returned.
+        """
+        if self.feature_cache is None:
+            return [self._get_trainable_data(line) for line in self._get_test_lines(file, line_limit)]
+        arrays = self._get_cached_test_arrays(file)[1]
+        if len(arrays["offsets"]) - 1 < line_limit:
+            print("Warning: not enough lines in the test file")
+        return _slice_line_arrays(arrays, range(len(arrays["offsets"]) - 1)[:line_limit])
 
-    def _test_text_line_by_line(self, file, line_limit, verbose):
+    def _test_text_line_by_line(self, file, line_limit, verbose, batch_size=64):
         """
         This function tests the model fitted in self.train() line by line, using the lines in file. These lines must be
         already segmented so we can compute the performance of model.
@@ -341,103 +644,178 @@ class WordSegmenter:
             file: the address of the file that is going to be tested
             line_limit: number of lines to be tested. If set to -1, all lines will be tested.
             verbose: determines if we want to show results line by line
+            batch_size: the maximum number of lines that are run through the model together (see _test_line_arrays)
         """
-        lines = get_lines_of_text(file, "man_segmented")
-        if len(lines) < line_limit:
-            print("Warning: not enough lines in the test file")
-        accuracy = Accuracy()
-        for line in lines[:line_limit]:
-            x_data, y_data = self._get_trainable_data(line.man_segmented)
+        accuracy = self._test_line_arrays(self._get_test_arrays(file, line_limit), batch_size)
+        if verbose:
+            _print_text_accuracy(file, accuracy)
+        return accuracy
 
+    def _test_line_arrays(self, line_arrays, batch_size):
+        """
+        This function returns the Accuracy of the model on a list of the x and y arrays of lines. Lines are sorted by
+        length and run in batches (see _get_length_buckets), which gives the same BIES probabilities, and so the same
+        accuracy, as running them one by one (batch_size=1).
+        Args:
+            line_arrays: the list of (x, y) arrays of the lines
+            batch_size: the maximum number of lines that are run through the model together
+        """
+        accuracy = Accuracy()
+        for bucket in _get_length_buckets([len(x_data) for x_data, _ in line_arrays], batch_size):
             # Using the manual predict function for lines because they are not necessarily self.n long
-            y_hat = Bies(input_bies=self._manual_predict(x_data), input_type="mat")
-            y_hat.normalize_bies()
+            # Exact products make the accuracy independent of how the lines are batched
+            y_hats = self._manual_predict_batch([line_arrays[ind][0] for ind in bucket], exact=True)
 
-            # Updating overall accuracy using the new line
-            actual_y = Bies(input_bies=y_data, input_type="mat")
-            accuracy.update(true_bies=actual_y.str, est_bies=y_hat.str)
-        if verbose:
-            print("The BIES accuracy (line by line) for file {} : {:.3f}".format(file, accuracy.get_bies_accuracy()))
-            print("The F1 score (line by line) for file {} : {:.3f}".format(file, accuracy.get_f1_score()))
+            # Updating overall accuracy using the label arrays of the lines of the batch
+            est_labels = [decode_bies(y_hat, self._get_bies_decoder(evaluation=True)) for y_hat in y_hats]
+            true_labels = [np.argmax(line_arrays[ind][1], axis=1) for ind in bucket]
+            accuracy.update_many(true_bies_list=true_labels, est_bies_list=est_labels)
         return accuracy
 
-    def test_model_line_by_line(self, verbose, fast=False):
+    def _get_test_shard_tasks(self, files, line_limits, num_shards, batch_size):
+        """
+        This function yields the tasks of _test_shard_in_worker for the shards of lines of several files. Each file is
+        read once, here, and each task only holds its own lines: either the segmented lines, or, if a feature cache is
+        set, the key of the arrays of the file in the cache and the indices of the lines. The arrays of a file that is
+        not in the cache yet are made here, once, rather than in every worker.
+        Args:
+            files: a list of addresses of the files
+            line_limits: a list of the number of lines to be tested in each file
+            num_shards: the number of shards of each file
+            batch_size: the maximum number of lines that are run through the model together
+        """
+        for file, line_limit in zip(files, line_limits):
+            key = None
+            if self.feature_cache is not None:
+                key, arrays = self._get_cached_test_arrays(file)
+                if self.feature_cache.load(key, _TEST_ARRAY_NAMES) is None:
+                    # The arrays could not be saved (e.g. the cache directory is read-only), so workers featurize lines
+                    key = None
+            if key is None:
+                lines = self._get_test_lines(file, line_limit)
+                for shard in range(num_shards):
+                    yield _get_shard(lines, shard, num_shards), None, None, batch_size
+                continue
+            if len(arrays["offsets"]) - 1 < line_limit:
+                print("Warning: not enough lines in the test file")
+            indices = range(len(arrays["offsets"]) - 1)[:line_limit]
+            for shard in range(num_shards):
+                yield None, key, _get_shard(indices, shard, num_shards), batch_size
+
+    def _test_texts_line_by_line(self, files, line_limits, verbose, jobs, batch_size=64):
+        """
+        This function returns the list of accuracies of _test_text_line_by_line for several files. If jobs is more
+        than 1, the files are tested by that many worker processes, each with its own copy of the model, and files are
+        divided into shards of lines if there are fewer files than processes. Accuracies of shards are merged, which
+        gives the same numbers as testing the whole file.
+        Args:
+            files: a list of addresses of the files
+            line_limits: a list of the number of lines to be tested in each file (see _test_text_line_by_line)
+            verbose: determines if we want to show the accuracy of each file
+            jobs: the number of processes (None or 0 for the number of CPUs)
+            batch_size: the maximum number of lines that are run through the model together
+        """
+        jobs = get_num_jobs(jobs)
+        if jobs == 1 or len(files) == 0:
+            return [self._test_text_line_by_line(file=file, line_limit=line_limit, verbose=verbose,
+                                                 batch_size=batch_size) for file, line_limit in zip(files, line_limits)]
+        num_shards = -(-jobs // len(files))
+        tasks = self._get_test_shard_tasks(files, line_limits, num_shards, batch_size)
+        shard_accuracies = parallel_map(_test_shard_in_worker, tasks, jobs, initializer=_init_evaluation_worker,
+                                        initargs=(self._get_evaluation_copy(),))
+        accuracies = []
+        for i, shard_accuracy in enumerate(shard_accuracies):
+            if i % num_shards == 0:
+                accuracies.append(Accuracy())
+            accuracies[-1].merge_accuracy(shard_accuracy)
+            if verbose and i % num_shards == num_shards - 1:
+                _print_text_accuracy(files[i // num_shards], accuracies[-1])
+        return accuracies
+
+    def _get_evaluation_copy(self):
+        """
+        This function returns a shallow copy of the model for worker processes of _test_texts_line_by_line. It has the
+        weights as numpy arrays instead of a Keras model, so it can be sent to other processes, and no segmentation
+        cache or compiled model, so each process compiles its own.
+        """
+        word_segmenter = copy.copy(self)
+        word_segmenter.set_weights(self.get_weights())
+        word_segmenter.cache = None
+        word_segmenter.featurizer = None
+        return word_segmenter
+
+    def test_model_line_by_line(self, verbose, fast=False, jobs=1, batch_size=64):
         """
         This function uses the evaluating data to test the model line by line.
         Args:
             verbose: determines if we want to see the the accuracy of each text that is being tested.
             fast: determines if we use small amount of text to run the test or not.
+            jobs: the number of processes that test the texts (None or 0 for the number of CPUs). Each process has its
+            own copy of the model, and the accuracy doesn't depend on the number of processes.
+            batch_size: the maximum number of lines of similar lengths that are run through the model together. The
+            accuracy is the same as testing lines one by one (batch_size=1).
         """
         line_limit = -1
         if fast:
             line_limit = 1000
         accuracy = Accuracy()
         if self.evaluation_data in ["BEST", "exclusive BEST"]:
-            texts_range = range(40, 60)
+            starting_text, ending_text = 40, 60
             if fast:
-                texts_range = range(40, 45)
-            category = ["news", "encyclopedia", "article", "novel"]
-            for text_num in texts_range:
-                if verbose:
-                    print("testing text {}".format(text_num))
-                for cat in category:
-                    text_num_str = "{}".format(text_num).zfill(5)
-                    file = None
-                    if self.evaluation_data == "BEST":
-                        file = Path.joinpath(Path(__file__).parent.parent.absolute(),
-                                             "Data/Best/{}/{}_".format(cat, cat) + text_num_str + ".txt")
-                    elif self.evaluation_data == "exclusive BEST":
-                        file = Path.joinpath(Path(__file__).parent.parent.absolute(),
-                                             "Data/exclusive_Best/{}/{}_".format(cat, cat) + text_num_str + ".txt")
-                    text_acc = self._test_text_line_by_line(file=file, line_limit=-1, verbose=verbose)
-                    accuracy.merge_accuracy(text_acc)
+                starting_text, ending_text = 40, 45
+            if verbose:
+                print("testing texts {} to {}".format(starting_text, ending_text - 1))
+            files = get_best_files(starting_text, ending_text, exclusive=self.evaluation_data == "exclusive BEST")
+            for text_acc in self._test_texts_line_by_line(files, [-1] * len(files), verbose=verbose, jobs=jobs,
+                                                          batch_size=batch_size):
+                accuracy.merge_accuracy(text_acc)
 
         elif self.evaluation_data == "SAFT_Thai":
             if self.language != "Thai":
                 print("Warning: the current SAFT data is in Thai and you are testing a model in another language")
             file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/SAFT/test.txt')
-            text_acc = self._test_text_line_by_line(file=file, line_limit=-1, verbose=verbose)
+            text_acc = self._test_texts_line_by_line([file], [-1], verbose=verbose, jobs=jobs,
+                                                      batch_size=batch_size)[0]
             accuracy.merge_accuracy(text_acc)
         elif self.evaluation_data == "my":
             if self.language != "Burmese":
                 print("Warning: the my data is in Burmese and you are testing a model in another language")
             file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_test_segmented.txt')
-            text_acc = self._test_text_line_by_line(file=file, line_limit=line_limit, verbose=verbose)
+            text_acc = self._test_texts_line_by_line([file], [line_limit], verbose=verbose, jobs=jobs,
+                                                      batch_size=batch_size)[0]
             accuracy.merge_accuracy(text_acc)
         elif self.evaluation_data == "exclusive my":
             if self.language != "Burmese":
                 print("Warning: the exvlusive my data is in Burmese and you are testing a model in another language")
             file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_test_segmented_exclusive.txt')
-            text_acc = self._test_text_line_by_line(file=file, line_limit=line_limit, verbose=verbose)
+            text_acc = self._test_texts_line_by_line([file], [line_limit], verbose=verbose, jobs=jobs,
+                                                      batch_size=batch_size)[0]
             accuracy.merge_accuracy(text_acc)
         elif self.evaluation_data == "SAFT_Burmese":
             if self.language != "Burmese":
                 print("Warning: the my.text data is in Burmese and you are testing a model in another language")
             file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/SAFT_burmese_test.txt')
-            text_acc = self._test_text_line_by_line(file=file, line_limit=line_limit, verbose=verbose)
+            text_acc = self._test_texts_line_by_line([file], [line_limit], verbose=verbose, jobs=jobs,
+                                                      batch_size=batch_size)[0]
             accuracy.merge_accuracy(text_acc)
 
         elif self.evaluation_data == "BEST_my":
             if self.language != "Thai_Burmese":
                 print("Warning: the current data should be used only for Thai_Burmese multilingual models")
-            # Testing for BEST
+            # Testing for BEST (texts 40 to 44) and my in one group of files, so that they are tested in parallel
+            print("testing texts 40 to 44")
+            files = get_best_files(40, 45, exclusive=False)
+            files.append(Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_test_segmented.txt'))
+            text_accs = self._test_texts_line_by_line(files, [-1] * (len(files) - 1) + [line_limit], verbose=verbose,
+                                                      jobs=jobs, batch_size=batch_size)
             acc1 = Accuracy()
-            category = ["news", "encyclopedia", "article", "novel"]
-            for text_num in range(40, 45):
-                print("testing text {}".format(text_num))
-                for cat in category:
-                    text_num_str = "{}".format(text_num).zfill(5)
-                    file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Data/Best/{}/{}_".format(cat, cat)
-                                         + text_num_str + ".txt")
-                    text_acc = self._test_text_line_by_line(file=file, line_limit=-1, verbose=verbose)
-                    acc1.merge_accuracy(text_acc)
+            for text_acc in text_accs[:-1]:
+                acc1.merge_accuracy(text_acc)
             if verbose:
                 print("The BIES accuracy by test_model_line_by_line function (Thai): {:.3f}".
                       format(acc1.get_bies_accuracy()))
                 print("The F1 score by test_model_line_by_line function (Thai): {:.3f}".format(acc1.get_f1_score()))
-            # Testing for my
-            file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Data/my_test_segmented.txt')
-            acc2 = self._test_text_line_by_line(file, line_limit=line_limit, verbose=verbose)
+            acc2 = text_accs[-1]
             if verbose:
                 print("The BIES accuracy by test_model_line_by_line function (Burmese): {:.3f}".
                       format(acc2.get_bies_accuracy()))
@@ -452,104 +830,104 @@ class WordSegmenter:
             print("The F1 score by test_model_line_by_line function: {:.3f}".format(accuracy.get_f1_score()))
         return accuracy
 
+    def compile_model(self):
+        """
+        This function returns a CompiledSegmenter built from the weights of the model. It is built only once and then
+        reused, so the weights are not extracted from the model for every line.
+        """
+        if self.compiled_segmenter is None:
+            self.compiled_segmenter = CompiledSegmenter(
+                weights=self.get_weights(), embedding_type=self.embedding_type,
+                generalized_vec_memo=self._get_featurizer().generalized_vec_memo)
+        return self.compiled_segmenter
+
     def _manual_predict(self, test_input):
         """
         Implementation of the tf.predict function manually. This function works for inputs of any length, and only uses
-        model weights obtained from self.model.weights.
+        model weights obtained from self.get_weights() (through a CompiledSegmenter).
         Args:
             test_input: the input text
         """
-        # Forward LSTM
-        dtype = np.float32
-        embedarr = self.model.weights[0].numpy().astype(dtype)
-        lstm_weights = [self.model.weights[1].numpy().astype(dtype), self.model.weights[2].numpy().astype(dtype),
-                        self.model.weights[3].numpy().astype(dtype)]
-        c_fw = np.zeros([1, self.hunits], dtype=dtype)
-        h_fw = np.zeros([1, self.hunits], dtype=dtype)
-        all_h_fw = np.zeros([len(test_input), self.hunits], dtype=dtype)
-        for i in range(len(test_input)):
-            x_t = None
-            if self.embedding_type == "grapheme_clusters_tf":
-                input_graph_id = test_input[i].graph_clust_id
-                x_t = embedarr[input_graph_id, :]
-                x_t = x_t.reshape(1, x_t.shape[0])
-            elif self.embedding_type == "grapheme_clusters_man":
-                input_graph_vec = test_input[i].graph_clust_vec
-                x_t = input_graph_vec.dot(embedarr)
-            elif self.embedding_type == "generalized_vectors":
-                input_generalized_vec = test_input[i].generalized_vec
-                x_t = input_generalized_vec.dot(embedarr)
-            elif self.embedding_type == "codepoints":
-                input_codepoint_id = test_input[i].codepoint_id
-                x_t = embedarr[input_codepoint_id, :]
-                x_t = x_t.reshape(1, x_t.shape[0])
-            else:
-                print("Warning: this embedding type is not implemented for manual prediction")
-            h_fw, c_fw = self._compute_hc(lstm_weights, x_t, h_fw, c_fw)
-            all_h_fw[i, :] = h_fw
-
-        # Backward LSTM
-        lstm_weights = [self.model.weights[4].numpy().astype(dtype), self.model.weights[5].numpy().astype(dtype),
-                        self.model.weights[6].numpy().astype(dtype)]
-        c_bw = np.zeros([1, self.hunits], dtype=dtype)
-        h_bw = np.zeros([1, self.hunits], dtype=dtype)
-        all_h_bw = np.zeros([len(test_input), self.hunits])
-        for i in range(len(test_input) - 1, -1, -1):
-            x_t = None
-            if self.embedding_type == "grapheme_clusters_tf":
-                input_graph_id = test_input[i].graph_clust_id
-                x_t = embedarr[input_graph_id, :]
-                x_t = x_t.reshape(1, x_t.shape[0])
-            elif self.embedding_type == "grapheme_clusters_man":
-                input_graph_vec = test_input[i].graph_clust_vec
-                x_t = input_graph_vec.dot(embedarr)
-            elif self.embedding_type == "generalized_vectors":
-                input_generalized_vec = test_input[i].generalized_vec
-                x_t = input_generalized_vec.dot(embedarr)
-            elif self.embedding_type == "codepoints":
-                input_codepoint_id = test_input[i].codepoint_id
-                x_t = embedarr[input_codepoint_id, :]
-                x_t = x_t.reshape(1, x_t.shape[0])
-            else:
-                print("Warning: this embedding type is not implemented for manual prediction")
-            h_bw, c_bw = self._compute_hc(lstm_weights, x_t, h_bw, c_bw)
-            all_h_bw[i, :] = h_bw
-
-        # Combining Forward and Backward layers through dense time-distributed layer
-        timew = self.model.weights[7].numpy().astype(dtype)
-        timeb = self.model.weights[8].numpy().astype(dtype)
-        est = np.zeros([len(test_input), 4], dtype=dtype)
-        for i in range(len(test_input)):
-            final_h = np.concatenate((all_h_fw[i, :], all_h_bw[i, :]), axis=0)
-            final_h = final_h.reshape(1, 2 * self.hunits)
-            curr_est = final_h.dot(timew) + timeb
-            curr_est = curr_est[0]
-            curr_est = np.exp(curr_est) / sum(np.exp(curr_est))
-            est[i, :] = curr_est
-        return est
-
-    def _compute_hc(self, weights, x_t, h_tm1, c_tm1):
-        """
-        Given weights of a LSTM model, the input at time t, and values for h and c at time t-1, this function compute
-        the values of h and c at time t.
-        Args:
-            weights: a list of three matrices, which are W (from input to cell), U (from h to cell), and b (bias)
-            respectively.
-            x_t: the input at time t
-            h_tm1: value of h for time t-1
-            c_tm1: value of c for time t-1
-        """
-        # Implementing forget, input, and output gates in LSTM model
-        warr, uarr, barr = weights
-        s_t = (x_t.dot(warr) + h_tm1.dot(uarr) + barr)
-        hunit = uarr.shape[0]
-        i = sigmoid(s_t[:, :hunit])
-        f = sigmoid(s_t[:, 1 * hunit:2 * hunit])
-        _c = np.tanh(s_t[:, 2 * hunit:3 * hunit])
-        o = sigmoid(s_t[:, 3 * hunit:])
-        c_t = i * _c + f * c_tm1
-        h_t = o * np.tanh(c_t)
-        return [h_t, c_t]
+        return self.compile_model().predict(test_input)
+
+    def _manual_predict_batch(self, test_inputs, exact=False):
+        """
+        Batched version of the _manual_predict function. The output for each line is the same as the output of
+        _manual_predict for that line, up to rounding (see CompiledSegmenter.predict_batch).
+        Args:
+            test_inputs: a list of inputs, where each input is what _manual_predict accepts for a single line
+            exact: if True, the output is bitwise the same as the output of _manual_predict, at the cost of speed
+        """
+        return self.compile_model().predict_batch(test_inputs, exact=exact)
+
+    def _get_featurizer(self):
+        """
+        This function returns the Featurizer of the model. It is made again if the dictionaries of the model have been
+        replaced (e.g. by pick_lstm_model) since it was made. In that case the compiled model is made again too, since
+        it uses the generalized vector memo of the featurizer.
+        """
+        featurizer = self.featurizer
+        if featurizer is None or featurizer.graph_clust_dic is not self.graph_clust_dic or \
+                featurizer.codepoint_dic is not self.codepoint_dic or featurizer.letters_dic is not self.letters_dic:
+            featurizer = Featurizer(embedding_type=self.embedding_type, graph_clust_dic=self.graph_clust_dic,
+                                    codepoint_dic=self.codepoint_dic, letters_dic=self.letters_dic)
+            self.featurizer = featurizer
+            self.compiled_segmenter = None
+        return featurizer
+
+    def _get_line_unit_ids(self, line):
+        """
+        This function returns the input of the compiled model for a line as an int32 array of unit ids. It is the same
+        as Featurizer.featurize, except that generalized vectors are given as row ids of the featurizer's memo, so that
+        the compiled model can use its memoized input projections (see Featurizer.get_unit_ids).
+        Args:
+            line: a Line instance
+        """
+        return self._get_lines_unit_ids([line])[0]
+
+    def _get_lines_unit_ids(self, lines):
+        """
+        This function returns the list of inputs of the compiled model (see _get_line_unit_ids) of several lines. The
+        generalized vector memo is not reset in between, so the inputs of all lines can be run in one batch.
+        Args:
+            lines: a list of Line instances
+        """
+        if self.embedding_type == "codepoints":
+            return self._get_featurizer().get_unit_ids_many([line.unsegmented for line in lines])
+        return self._get_featurizer().get_unit_ids_many([line.unsegmented for line in lines],
+                                                        [line.char_brkpoints for line in lines])
+
+    def _get_pretty_segmented(self, line, y_hat):
+        """
+        This function makes a pretty version of the output of the LSTM, where bars show the boundaries of words.
+        Args:
+            line: the Line instance that is segmented
+            y_hat: the estimated Bies instance for the line
+        """
+        boundaries = self._get_word_boundaries(line, y_hat)
+        words = [line.unsegmented[boundaries[i]: boundaries[i + 1]] for i in range(len(boundaries) - 1)]
+        return "".join("|" + word for word in words) + "|"
+
+    def _get_word_boundaries(self, line, y_hat):
+        """
+        This function returns the offsets (in code points) of the word boundaries that the LSTM found in a line. The
+        output always starts with 0 and ends with the length of the line, so word i is between output[i] and
+        output[i + 1].
+        Args:
+            line: the Line instance that is segmented
+            y_hat: the estimated Bies instance for the line, decoded by Bies.decode
+        """
+        if len(line.unsegmented) == 0:
+            return [0]
+        if self.embedding_type == "codepoints":
+            unit_brkpoints = np.arange(len(line.unsegmented) + 1)
+        else:
+            unit_brkpoints = np.array(line.char_brkpoints)
+        boundaries = unit_brkpoints[y_hat.get_word_starts()].tolist()
+        if len(boundaries) == 0 or boundaries[0] != 0:
+            boundaries.insert(0, 0)
+        boundaries.append(len(line.unsegmented))
+        return boundaries
 
     def segment_arbitrary_line(self, input_line):
         """
@@ -557,70 +935,220 @@ class WordSegmenter:
         Args:
             input_line: the string that needs to be segmented. It is supposed to be unsegmented
         """
+        if self.cache is not None:
+            return self.segment_lines([input_line])[0]
         line = Line(input_line, "unsegmented")
-        grapheme_clusters_in_line = len(line.char_brkpoints) - 1
+        y_hat = Bies(input_bies=self._manual_predict(self._get_line_unit_ids(line)), input_type="mat")
+        y_hat.decode(self._get_bies_decoder())
+        return self._get_pretty_segmented(line, y_hat)
 
-        # Using LSTM model to segment the input line
-        if self.embedding_type == "codepoints":
-            x_data = []
-            for i in range(len(line.unsegmented)):
-                x_data.append(CodePoint(line.unsegmented[i], self.codepoint_dic))
-        else:
-            x_data = []
-            for i in range(grapheme_clusters_in_line):
-                char_start = line.char_brkpoints[i]
-                char_finish = line.char_brkpoints[i + 1]
-                curr_char = line.unsegmented[char_start: char_finish]
-                x_data.append(GraphemeCluster(curr_char, self.graph_clust_dic, self.letters_dic))
-        y_hat = Bies(input_bies=self._manual_predict(x_data), input_type="mat")
-
-        # Making a pretty version of the output of the LSTM, where bars show the boundaries of words
-        y_hat_pretty = ""
-        if self.embedding_type == "codepoints":
-            for i in range(len(line.unsegmented)):
-                if y_hat.str[i] in ['b', 's']:
-                    y_hat_pretty += "|"
-                y_hat_pretty += line.unsegmented[i]
-            y_hat_pretty += "|"
+    def segment_long_line(self, input_text, window=2000, overlap=200, output="words"):
+        """
+        This function segments an arbitrarily long unsegmented text and yields its words (or word boundary offsets) one
+        by one, so that the output starts before the whole input is processed. The text is processed in windows of
+        about `window` code points. Each window is run through the LSTM model with `overlap` extra code points of
+        context on both sides, and only the BIES decisions for the middle part of the window are kept, so the memory
+        usage only depends on the window size. Since the bidirectional LSTM sees a finite context at the seams of
+        windows, the output only approximately matches segment_arbitrary_line for the whole text. With an overlap of at
+        least 50 code points it matched for all Thai models on texts of a few thousand code points, but smaller overlaps
+        can change the words around seams.
+        Args:
+            input_text: the unsegmented text. It can be a string, or an iterable of strings (e.g. chunks of a file) that
+            are processed as one long line
+            window: the number of code points whose BIES decisions are kept from each run of the model
+            overlap: the number of code points of context used on each side of a window
+            output: "words" to yield the words, or "offsets" to yield the word boundary offsets in the whole text,
+            starting with 0 and ending with the length of the text, as in the output of segment_lines(output="offsets")
+        """
+        if isinstance(input_text, str):
+            pieces = (input_text[i: i + window] for i in range(0, len(input_text), window))
         else:
-            y_hat_pretty = ""
-            for i in range(grapheme_clusters_in_line):
-                char_start = line.char_brkpoints[i]
-                char_finish = line.char_brkpoints[i + 1]
-                curr_char = line.unsegmented[char_start: char_finish]
-                if y_hat.str[i] in ['b', 's']:
-                    y_hat_pretty += "|"
-                y_hat_pretty += curr_char
-            y_hat_pretty += "|"
-
-        return y_hat_pretty
+            pieces = iter(input_text)
+        # buf holds the text that is not segmented yet, preceded by `left` code points that are only used as context.
+        # base is the offset of buf in the whole text.
+        buf = ""
+        left = 0
+        base = 0
+        exhausted = False
+        word = ""
+        if output == "offsets":
+            yield 0
+        while True:
+            while not exhausted and len(buf) - left < window + overlap:
+                piece = next(pieces, None)
+                if piece is None:
+                    exhausted = True
+                else:
+                    buf += piece
+            if len(buf) == left:
+                break
+            line = Line(buf, "unsegmented")
+            char_brkpoints = line.char_brkpoints
+
+            # Finding where decisions of this window end. It should be a grapheme cluster boundary at least `overlap`
+            # code points before the end of buf, unless the input is finished.
+            seg_end = len(buf)
+            if not exhausted:
+                seg_end = None
+                for brkpoint in char_brkpoints:
+                    if brkpoint > left and (seg_end is None or brkpoint <= left + window):
+                        seg_end = brkpoint
+
+            y_hat = Bies(input_bies=self._manual_predict(self._get_line_unit_ids(line)), input_type="mat")
+            y_hat.decode(self._get_bies_decoder())
+            if self.embedding_type == "codepoints":
+                unit_brkpoints = range(len(buf) + 1)
+            else:
+                unit_brkpoints = char_brkpoints
+            for i in range(len(unit_brkpoints) - 1):
+                unit_start = unit_brkpoints[i]
+                if unit_start < left:
+                    continue
+                if unit_start >= seg_end:
+                    break
+                if y_hat.str[i] in ['b', 's'] and len(word) > 0:
+                    yield base + unit_start if output == "offsets" else word
+                    word = ""
+                word += buf[unit_start: unit_brkpoints[i + 1]]
+
+            # Keeping `overlap` code points (starting at a grapheme cluster boundary) as the left context of next window
+            context_start = 0
+            for brkpoint in char_brkpoints:
+                if brkpoint <= seg_end - overlap:
+                    context_start = brkpoint
+            buf = buf[context_start:]
+            base += context_start
+            left = seg_end - context_start
+        if len(word) > 0:
+            yield base + len(buf) if output == "offsets" else word
+
+    def segment_lines(self, input_lines, batch_size=64, output="pretty"):
+        """
+        This function segments a list of unsegmented lines and returns the same output as calling
+        segment_arbitrary_line for each of them. Lines are sorted by length and grouped into batches of similar length,
+        so that each batch is run through the LSTM model at once with little padding.
+        Args:
+            input_lines: a list of strings that need to be segmented
+            batch_size: the maximum number of lines that are run through the model together
+            output: "pretty" to return the segmented lines as segment_arbitrary_line does, or "offsets" to return the
+            list of word boundary offsets of each line (see _get_word_boundaries)
+        """
+        if self.cache is not None:
+            return self._segment_lines_cached(input_lines, batch_size, output)
+        return self._segment_lines_uncached(input_lines, batch_size, output)
+
+    def _segment_lines_uncached(self, input_lines, batch_size, output):
+        """
+        This function segments a list of lines with the LSTM model, without using the cache. See segment_lines.
+        Args:
+            input_lines: a list of strings that need to be segmented
+            batch_size: the maximum number of lines that are run through the model together
+            output: "pretty" or "offsets"
+        """
+        lines = [Line(input_line, "unsegmented") for input_line in input_lines]
+        x_data = self._get_lines_unit_ids(lines)
+        order = sorted(range(len(lines)), key=lambda ind: len(x_data[ind]))
+        out = [None] * len(lines)
+        for st in range(0, len(order), batch_size):
+            batch = order[st: st + batch_size]
+            y_hats = self._manual_predict_batch([x_data[ind] for ind in batch])
+            for ind, y_hat in zip(batch, y_hats):
+                y_hat = Bies(input_bies=y_hat, input_type="mat")
+                y_hat.decode(self._get_bies_decoder())
+                if output == "offsets":
+                    out[ind] = self._get_word_boundaries(lines[ind], y_hat)
+                else:
+                    out[ind] = self._get_pretty_segmented(lines[ind], y_hat)
+        return out
+
+    def _segment_lines_cached(self, input_lines, batch_size, output):
+        """
+        This function segments a list of lines chunk by chunk (see segmentation_cache.split_chunks). Only chunks that
+        are not in the cache are run through the LSTM model, in batches, and their offsets are added to the cache.
+        Args:
+            input_lines: a list of strings that need to be segmented
+            batch_size: the maximum number of lines that are run through the model together
+            output: "pretty" or "offsets"
+        """
+        cache_name = self._get_cache_name()
+        line_chunks = [split_chunks(input_line) for input_line in input_lines]
+        chunk_offsets = {}
+        missing = []
+        for chunks in line_chunks:
+            for chunk in chunks:
+                if chunk not in chunk_offsets:
+                    chunk_offsets[chunk] = self.cache.get(cache_name, chunk)
+                    if chunk_offsets[chunk] is None:
+                        missing.append(chunk)
+        if len(missing) > 0:
+            for chunk, offsets in zip(missing, self._segment_lines_uncached(missing, batch_size, "offsets")):
+                self.cache.put(cache_name, chunk, offsets)
+                chunk_offsets[chunk] = offsets
+
+        out = []
+        for input_line, chunks in zip(input_lines, line_chunks):
+            boundaries = [0]
+            chunk_start = 0
+            for chunk in chunks:
+                boundaries.extend(chunk_start + offset for offset in chunk_offsets[chunk][1:])
+                chunk_start += len(chunk)
+            if output == "offsets":
+                out.append(boundaries)
+            else:
+                words = [input_line[boundaries[i]: boundaries[i + 1]] for i in range(len(boundaries) - 1)]
+                out.append("".join("|" + word for word in words) + "|")
+        return out
+
+    def _get_cache_name(self):
+        """
+        This function returns the model name that is used in the keys of the cache. The BIES decoder can change the
+        output of a model, so it gets separate keys.
+        """
+        cache_name = self.name
+        if self._get_bies_decoder() != "argmax":
+            cache_name += " ({} decoder)".format(self.bies_decoder)
+        return cache_name
 
     def save_model(self):
         """
         This function saves the current trained model of this word_segmenter instance.
         """
-        # Save the model using Keras
-        self.model.save(Path.joinpath(Path(__file__).parent.parent.absolute(), "Models/" + self.name))
+        model_dir = get_model_dir(self.name)
+        # Save the model using Keras, if it has been trained in this session
+        if self.model is not None:
+            self.model.save(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        weights = self.get_weights()
+
         # Save one np array that holds all weights
-        file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Models/" + self.name + "/weights")
-        np.save(str(file), self.model.weights)
+        file = Path.joinpath(model_dir, "weights")
+        weights_arr = np.empty(len(weights), dtype=object)
+        for i in range(len(weights)):
+            weights_arr[i] = weights[i]
+        np.save(str(file), weights_arr)
+
+        # The dictionary of the model, which is saved in json and binary formats
+        dic = None
+        if "grapheme_clusters" in self.embedding_type:
+            dic = self.graph_clust_dic
+        elif "codepoints" in self.embedding_type:
+            dic = self.codepoint_dic
+
+        # Save the model in the binary format that can be memory-mapped for fast loading
+        save_weights_bin(Path.joinpath(model_dir, "weights.bin"), model_name=self.name,
+                         embedding_type=self.input_embedding_type, weights=weights, dic=dic)
 
         # Save the model in json format, that has both weights and grapheme clusters dictionary
-        json_file = Path.joinpath(Path(__file__).parent.parent.absolute(), "Models/" + self.name + "/weights.json")
+        json_file = Path.joinpath(model_dir, "weights.json")
         with open(str(json_file), 'w') as wfile:
             output = dict()
             output["model"] = self.name
-            if "grapheme_clusters" in self.embedding_type:
-                output["dic"] = self.graph_clust_dic
-            elif "codepoints" in self.embedding_type:
-                if self.language == "Thai":
-                    output["dic"] = constants.THAI_CODE_POINT_DICTIONARY
-                if self.language == "Burmese":
-                    output["dic"] = constants.BURMESE_CODE_POINT_DICTIONARY
-            for i in range(len(self.model.weights)):
+            if dic is not None:
+                output["dic"] = dic
+            for i in range(len(weights)):
                 dic_model = dict()
                 dic_model["v"] = 1
-                mat = self.model.weights[i].numpy()
+                mat = weights[i]
                 dim0 = mat.shape[0]
                 dim1 = 1
                 if len(mat.shape) == 1:
@@ -640,19 +1168,92 @@ class WordSegmenter:
         input_model: the input model
         """
         self.model = input_model
+        self.model_weights = None
+        self.compiled_segmenter = None
+
+    def set_weights(self, weights):
+        """
+        This function sets the weights of the model directly, without a Keras model. This is how saved models are loaded
+        for segmentation and evaluation, so that TensorFlow is not needed.
+        Args:
+            weights: a list of the nine weight matrices of the model, in the order of model.weights
+        """
+        self.model = None
+        self.model_weights = weights
+        self.compiled_segmenter = None
 
+    def get_weights(self):
+        """
+        This function returns the weights of the model as a list of nine numpy arrays, in the order of model.weights.
+        """
+        if self.model is not None:
+            return [mat.numpy() for mat in self.model.weights]
+        return self.model_weights
 
-def pick_lstm_model(model_name, embedding, train_data, eval_data):
+    def set_bies_decoder(self, method):
+        """
+        This function sets how the BIES probabilities that the model estimates are decoded to words, in segmentation and
+        evaluation (see bies.decode_bies). By default, segmentation uses "argmax" and evaluation uses "normalize", so
+        the accuracy of a model is computed as it always has been. Setting "argmax" or "viterbi" makes evaluation use
+        the same decoder as segmentation, which changes the BIES accuracy and F1 score of lines with invalid BIES
+        sequences.
+        Args:
+            method: "argmax", "viterbi", "normalize", or None for the defaults
+        """
+        self.bies_decoder = method
+
+    def _get_bies_decoder(self, evaluation=False):
+        """
+        This function returns the method that BIES probabilities are decoded with (see set_bies_decoder).
+        Args:
+            evaluation: if True, the method for evaluation is returned, and otherwise the method for segmentation
+        """
+        if self.bies_decoder is not None:
+            return self.bies_decoder
+        return "normalize" if evaluation else "argmax"
+
+    def set_cache(self, cache):
+        """
+        This function sets a SegmentationCache that segment_arbitrary_line and segment_lines use, or removes it if cache
+        is None. With a cache, lines are split into chunks at whitespace and punctuation, and each chunk is segmented on
+        its own, so the LSTM model doesn't see context across chunks and the output can differ slightly from segmenting
+        whole lines. The cache is keyed by the model name, so it should be cleared if the weights of the model change.
+        Args:
+            cache: a SegmentationCache instance, or None
+        """
+        self.cache = cache
+
+    def set_feature_cache(self, feature_cache):
+        """
+        This function sets a FeatureCache that train_model and test_model_line_by_line use to save the featurized
+        training, validation, and test data, or removes it if feature_cache is None. Later runs with the same data,
+        embedding type, and dictionaries (e.g. trials of Bayesian optimization) then load the arrays instead of reading
+        and featurizing the data again.
+        Args:
+            feature_cache: a FeatureCache instance, or None
+        """
+        self.feature_cache = feature_cache
+
+
+def pick_lstm_model(model_name, embedding, train_data, eval_data, file_format=None):
     """
-    This function returns a saved word segmentation instance w.r.t input specifics
+    This function returns a saved word segmentation instance w.r.t input specifics. The model is loaded from its
+    weights file, so TensorFlow is not used.
     Args:
         model_name: name of the model
-        embedding: embedding type used to train the model
+        embedding: embedding type used to train the model. If None, it is read from the binary model file or inferred
+        from the name of the model.
         train_data: the data set used to train the model
         eval_data: the data set to test the model. Often, it should have the same structure as training data set.
+        file_format: the weights file to load the model from, "bin" for weights.bin, "json" for weights.json, or "npy"
+        for weights.npy. If None, weights.bin is used if it exists, and weights.json otherwise.
     """
-    file = Path.joinpath(Path(__file__).parent.parent.absolute(), 'Models/' + model_name)
-    model = keras.models.load_model(file)
+    saved_model = load_model_weights(model_name, file_format=file_format)
+    weights = saved_model["weights"]
+    if embedding is None:
+        embedding = saved_model.get("embedding")
+    if embedding is None:
+        embedding = embedding_from_name(model_name)
 
     # Figuring out name of the model
     language = None
@@ -669,9 +1270,9 @@ def pick_lstm_model(model_name, embedding, train_data, eval_data):
               " it by other types of data sets (not recommended).".format(model_name))
 
     # Figuring out values for different hyper-parameters
-    input_clusters_num = model.weights[0].shape[0]
-    input_embedding_dim = model.weights[0].shape[1]
-    input_hunits = model.weights[1].shape[1]//4
+    input_clusters_num = weights[0].shape[0]
+    input_embedding_dim = weights[0].shape[1]
+    input_hunits = weights[1].shape[1]//4
     input_n = None
     input_t = None
     if "genvec" in model_name or "graphclust" in model_name:
@@ -697,5 +1298,12 @@ def pick_lstm_model(model_name, embedding, train_data, eval_data):
                                    input_hunits=input_hunits, input_dropout_rate=0.2, input_output_dim=4,
                                    input_epochs=15, input_training_data=train_data, input_evaluation_data=eval_data,
                                    input_language=language, input_embedding_type=embedding)
-    word_segmenter.set_model(model)
+
+    # Using the dictionary that the model has been trained with, if it is saved with the model
+    if saved_model["dic"] is not None:
+        if "grapheme_clusters" in word_segmenter.embedding_type:
+            word_segmenter.graph_clust_dic = saved_model["dic"]
+        elif word_segmenter.embedding_type == "codepoints":
+            word_segmenter.codepoint_dic = saved_model["dic"]
+    word_segmenter.set_weights(weights)
     return word_segmenter
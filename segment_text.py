@@ -2,14 +2,31 @@
 # License & terms of use: http://www.unicode.org/copyright.html
 # Lint as: python3
 from lstm_word_segmentation.word_segmenter import pick_lstm_model
-import glob, sys, getopt
+from lstm_word_segmentation.model_io import embedding_from_name
+import glob, sys, getopt, itertools, collections, multiprocessing, time
+import contextlib, codecs, os, select, stat
 
 """
 A sample / simple program to segment the text from standard input
 and output the input with segmented result to standout output.
+
+Input is read lazily and segmented in micro-batches of lines, and the output
+of each micro-batch is written at once and flushed, so the program can be
+used as a filter over large or unbounded streams with constant memory. When
+the input is a pipe or a terminal, a micro-batch is also segmented as soon as
+no more input arrives for a short time, so interactive or slow producers see
+the output of each line without waiting for the micro-batch to fill up.
 """
 
 model_name = "Thai_codepoints_exclusive_model4_heavy"
+# Number of lines that are segmented together (a micro-batch)
+chunk_size = 256
+# Seconds that a line read from a pipe or a terminal waits for its micro-batch to fill up
+flush_delay = 0.05
+# The output format: "echo", "text", or "offsets"
+output_format = "echo"
+# The model used in this process. In --jobs mode, each worker process loads it once.
+word_segmenter = None
 
 def available_models():
   return [ m.replace("Models/", "") \
@@ -25,30 +42,158 @@ def print_models():
       print("  ", m)
 
 def print_usage():
-  print('segment_text.py -h -l -m model')
+  print('segment_text.py -h -l -m model -i input_file -j jobs -b lines -d seconds -f format')
   print("""
         -h      \tHelp / Usage
         -l      \tList models
         -m model\tSpecify model
+        -i input_file\tRead the text from input_file instead of standard input
+        -j, --jobs N\tSegment the text in N worker processes
+        -b lines\tNumber of lines segmented together (default 256)
+        -d seconds\tFor a pipe or terminal input, segment the lines read so
+                \tfar when no more input arrives for this long (default 0.05)
+        -f format\tOutput format: echo (default) prints Input: and Output:
+                \tlines, text prints only the segmented lines, and offsets
+                \tprints the word boundary offsets of each line
         """)
   print_models()
 
-def embedding_from_name(name):
-  if "_codepoints_" in name:
-    return "codepoints"
-  else:
-    return "grapheme_clusters_tf"
+def load_model(name):
+  global word_segmenter
+  # Messages printed while loading go to stderr, to keep the output clean
+  with contextlib.redirect_stdout(sys.stderr):
+    word_segmenter = pick_lstm_model(model_name=name,
+                                     embedding=embedding_from_name(name),
+                                     train_data="", eval_data="")
+
+def segment_chunk(lines, output):
+  return word_segmenter.segment_lines(lines, output=output)
+
+def get_stream_fd(file):
+  """
+  Returns the file descriptor of file if it is a pipe, a socket, or a
+  terminal, whose input can arrive slowly, and None otherwise (e.g. for
+  regular files, or objects without a file descriptor).
+  """
+  try:
+    fd = file.fileno()
+    mode = os.fstat(fd).st_mode
+  except (AttributeError, OSError, ValueError):
+    return None
+  if os.name != "posix" or stat.S_ISREG(mode):
+    return None
+  return fd
+
+def read_chunks(file):
+  fd = get_stream_fd(file)
+  if fd is not None:
+    yield from read_stream_chunks(fd, getattr(file, "encoding", None) or "utf-8")
+    return
+  # Strips the newline character
+  while True:
+    lines = [line.strip() for line in itertools.islice(file, chunk_size)]
+    if not lines:
+      return
+    yield lines
+
+def read_stream_chunks(fd, encoding):
+  """
+  Yields chunks of at most chunk_size lines from a pipe or a terminal. The
+  lines read so far are yielded when chunk_size lines are read, or when no
+  more input arrives for flush_delay seconds after the first line of the
+  chunk, so a slow producer never waits for a full chunk. The descriptor is
+  read directly, since the buffer of a Python file object hides whether more
+  input is ready.
+  """
+  decoder = codecs.getincrementaldecoder(encoding)()
+  partial = ""
+  lines = []
+  deadline = None
+  while True:
+    if len(lines) >= chunk_size:
+      yield lines[:chunk_size]
+      lines = lines[chunk_size:]
+      deadline = time.monotonic() + flush_delay if lines else None
+      continue
+    if lines:
+      timeout = max(deadline - time.monotonic(), 0)
+      if not select.select([fd], [], [], timeout)[0]:
+        yield lines
+        lines = []
+        deadline = None
+        continue
+    data = os.read(fd, 65536)
+    if not data:
+      partial += decoder.decode(b"", final=True)
+      if partial:
+        lines.append(partial.strip())
+      for st in range(0, len(lines), chunk_size):
+        yield lines[st: st + chunk_size]
+      return
+    # Strips the newline character
+    pieces = (partial + decoder.decode(data)).split("\n")
+    partial = pieces.pop()
+    if pieces and not lines:
+      deadline = time.monotonic() + flush_delay
+    lines.extend(piece.strip() for piece in pieces)
+
+def segment_file(file, jobs, output="pretty"):
+  """
+  Yields (input lines, segmented lines) for chunks of the file, in input order.
+  With more than one job, chunks are segmented by a pool of worker processes
+  that each load the model once. Only a few chunks per worker are in flight at
+  a time, so the input is never read into memory as a whole.
+  """
+  if jobs <= 1:
+    load_model(model_name)
+    for lines in read_chunks(file):
+      yield lines, segment_chunk(lines, output)
+    return
+  with multiprocessing.Pool(jobs, initializer=load_model,
+                            initargs=(model_name,)) as pool:
+    pending = collections.deque()
+    for lines in read_chunks(file):
+      pending.append((lines, pool.apply_async(segment_chunk, (lines, output))))
+      if len(pending) >= 2 * jobs:
+        lines, result = pending.popleft()
+        yield lines, result.get()
+    while pending:
+      lines, result = pending.popleft()
+      yield lines, result.get()
+
+def format_chunk(lines, outputs):
+  if output_format == "text":
+    return "".join(output + "\n" for output in outputs)
+  if output_format == "offsets":
+    return "".join(" ".join(map(str, output)) + "\n" for output in outputs)
+  return "".join("Input:\t" + line + "\nOutput:\t" + output + "\n"
+                 for line, output in zip(lines, outputs))
 
 def main(argv):
-   global model_name
+   global model_name, chunk_size, flush_delay, output_format
+   jobs = 1
+   input_file = None
    try:
-     opts, args = getopt.getopt(argv,"hlm::")
+     opts, args = getopt.getopt(argv,"hlm::i:j:b:d:f:", ["jobs="])
    except getopt.GetoptError:
      print_usage()
      sys.exit(2)
    for opt, arg in opts:
       if opt == '-m':
         model_name = arg
+      if opt == '-i':
+        input_file = arg
+      if opt in ('-j', '--jobs'):
+        jobs = int(arg)
+      if opt == '-b':
+        chunk_size = max(int(arg), 1)
+      if opt == '-d':
+        flush_delay = max(float(arg), 0)
+      if opt == '-f':
+        if arg not in ("echo", "text", "offsets"):
+          print_usage()
+          sys.exit(2)
+        output_format = arg
       if opt == '-h':
         print_usage()
         sys.exit()
@@ -57,21 +202,27 @@ def main(argv):
         sys.exit()
 
    file1 = sys.stdin
-   Lines = file1.readlines()
-
-   embedding = embedding_from_name(model_name)
-   word_segmenter = pick_lstm_model(model_name=model_name, embedding=embedding,
-                                    train_data="", eval_data="")
+   if input_file is not None:
+     file1 = open(input_file, encoding="utf-8")
 
-   print("Model:", model_name, sep='\t')
-   print("Embedding:", embedding, sep='\t')
+   if output_format == "echo":
+     print("Model:", model_name, sep='\t')
+     print("Embedding:", embedding_from_name(model_name), sep='\t')
 
-   count = 0
-   # Strips the newline character
-   for line in Lines:
-     line = line.strip()
-     print("Input:", line, sep='\t')
-     print("Output:", word_segmenter.segment_arbitrary_line(line), sep='\t')
+   num_lines = 0
+   num_chars = 0
+   start_time = time.time()
+   output = "offsets" if output_format == "offsets" else "pretty"
+   for lines, outputs in segment_file(file1, jobs, output):
+     sys.stdout.write(format_chunk(lines, outputs))
+     sys.stdout.flush()
+     num_chars += sum(len(line) for line in lines)
+     num_lines += len(lines)
+   elapsed = max(time.time() - start_time, 1e-9)
+   print("Segmented {} lines ({} chars) in {:.2f}s with {} job(s): "
+         "{:.1f} lines/s, {:.1f} chars/s".format(
+             num_lines, num_chars, elapsed, jobs, num_lines / elapsed,
+             num_chars / elapsed), file=sys.stderr)
 
 if __name__ == "__main__":
   main(sys.argv[1:])
@@ -0,0 +1,44 @@
+from collections import namedtuple
+import unittest
+import numpy as np
+from lstm_word_segmentation.accuracy import Accuracy
+
+
+class TestAccuracy(unittest.TestCase):
+    def test_update(self):
+        TestCase = namedtuple("TestCase", ["true_bies", "est_bies", "expected"])
+        # expected is (bies_mismatch, true_words, segmented_words, correctly_segmented_words)
+        cases = [
+            TestCase("biesbe", "biesbe", (0, 3, 3, 3)),
+            TestCase("biesbe", "bebebe", (3, 3, 3, 1)),
+            TestCase("bies", "ssss", (3, 2, 4, 1)),
+            TestCase("ieie", "bebe", (2, 0, 2, 0)),
+            TestCase("ibe", "sbe", (1, 1, 2, 1)),
+            TestCase("sbe", "sb", (-1, 2, 2, 1)),
+            TestCase("", "", (0, 0, 0, 0)),
+        ]
+        labels = {"b": 0, "i": 1, "e": 2, "s": 3}
+        for cas in cases:
+            accuracy = Accuracy()
+            accuracy.update(true_bies=cas.true_bies, est_bies=cas.est_bies)
+            computed = (accuracy.bies_mismatch, accuracy.true_words, accuracy.segmented_words,
+                        accuracy.correctly_segmented_words)
+            self.assertEqual(cas.expected, computed)
+            self.assertEqual(len(cas.true_bies), accuracy.bies_length)
+            label_accuracy = Accuracy()
+            label_accuracy.update(true_bies=np.array([labels[ch] for ch in cas.true_bies], dtype=np.int8),
+                                  est_bies=np.array([labels[ch] for ch in cas.est_bies], dtype=np.int8))
+            self.assertEqual(vars(accuracy), vars(label_accuracy))
+
+        # update_many gives the same counts as updating line by line
+        accuracy = Accuracy()
+        for cas in cases:
+            accuracy.update(true_bies=cas.true_bies, est_bies=cas.est_bies)
+        many_accuracy = Accuracy()
+        many_accuracy.update_many(true_bies_list=[cas.true_bies for cas in cases],
+                                  est_bies_list=[cas.est_bies for cas in cases])
+        self.assertEqual(vars(accuracy), vars(many_accuracy))
+
+
+if __name__ == "__main__":
+    unittest.main()
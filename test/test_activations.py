@@ -0,0 +1,28 @@
+from collections import namedtuple
+import unittest
+from lstm_word_segmentation.activations import sigmoid, tanh
+import numpy as np
+
+
+class TestActivations(unittest.TestCase):
+    def test_sigmoid(self):
+        TestCase = namedtuple("TestCase", ["input", "expected"])
+        cases = [
+            TestCase(np.array([0.0]), np.array([0.5])),
+            TestCase(np.array([0, 1, 100, -1, -10, -1000]), np.array([0.5, 0.73105858, 1, 0.26894142, 0.00004540, 0])),
+            TestCase(np.array([[0, 1], [-1, 1000]], dtype=np.float32), np.array([[0.5, 0.73105858], [0.26894142, 1]])),
+        ]
+        for cas in cases:
+            computed = sigmoid(inp=cas.input)
+            np.testing.assert_almost_equal(cas.expected, computed)
+
+    def test_in_place(self):
+        inp = np.array([[0, 1, -1, 2]], dtype=np.float32)
+        out = sigmoid(inp[:, :2], out=inp[:, :2])
+        tanh(inp[:, 2:], out=inp[:, 2:])
+        np.testing.assert_almost_equal(np.array([[0.5, 0.73105858, -0.76159416, 0.96402758]]), inp)
+        self.assertIs(out.base, inp)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from collections import namedtuple
+import unittest
+from lstm_word_segmentation.benchmark import BENCHMARK_VERSION, compare_benchmarks, make_synthetic_lines
+
+
+def make_results(chars_per_sec, latency_p50_ms, load_time_s):
+    metrics = {"chars_per_sec": chars_per_sec, "latency_p50_ms": latency_p50_ms}
+    model = {"load_time_s": load_time_s, "peak_rss_mb": 100.0, "datasets": {"synthetic_64": metrics}}
+    return {"version": BENCHMARK_VERSION, "settings": {}, "models": {"Thai_graphclust_model4_heavy": model,
+                                                                     "ICU_Thai": model}}
+
+
+class TestCompareBenchmarks(unittest.TestCase):
+    def test_compare_benchmarks(self):
+        TestCase = namedtuple("TestCase", ["results", "expected"])
+        baseline = make_results(chars_per_sec=1000.0, latency_p50_ms=1.0, load_time_s=0.01)
+        cases = [
+            TestCase(make_results(1000.0, 1.0, 0.01), []),
+            TestCase(make_results(950.0, 1.05, 0.0105), []),
+            TestCase(make_results(2000.0, 0.5, 0.001), []),
+            TestCase(make_results(800.0, 1.0, 0.01), ["Thai_graphclust_model4_heavy synthetic_64 chars_per_sec"]),
+            TestCase(make_results(1000.0, 1.5, 0.02), ["Thai_graphclust_model4_heavy load_time_s",
+                                                       "Thai_graphclust_model4_heavy synthetic_64 latency_p50_ms"]),
+        ]
+        for cas in cases:
+            regressions = compare_benchmarks(cas.results, baseline, tolerance=0.1)
+            self.assertEqual(cas.expected, [regression.split(":")[0] for regression in regressions])
+
+
+class TestMakeSyntheticLines(unittest.TestCase):
+    def test_make_synthetic_lines(self):
+        for language in ["Thai", "Burmese"]:
+            lines = make_synthetic_lines(language, length=50, num_lines=5, seed=1)
+            self.assertEqual(5, len(lines))
+            self.assertTrue(all(len(line) == 50 for line in lines))
+            self.assertEqual(lines, make_synthetic_lines(language, length=50, num_lines=5, seed=1))
+            self.assertNotEqual(lines, make_synthetic_lines(language, length=50, num_lines=5, seed=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 from collections import namedtuple
+import itertools
 import unittest
-from lstm_word_segmentation.bies import Bies
+from lstm_word_segmentation.bies import Bies, decode_bies
+import numpy as np
 
 
 class TestBies(unittest.TestCase):
@@ -41,5 +43,58 @@ class TestBies(unittest.TestCase):
             bies.normalize_bies()
             self.assertEqual(cas.expected, bies.str)
 
+    def test_decode(self):
+        TestCase = namedtuple("TestCase", ["str", "expected_argmax", "expected_viterbi", "expected_normalize"])
+        cases = [
+            TestCase("", "", "", ""),
+            TestCase("b", "s", "s", "s"),
+            TestCase("ie", "be", "be", "be"),
+            TestCase("bise", "bebe", "biie", "bess"),
+            TestCase("ssbiie", "ssbiie", "ssbiie", "ssbiie"),
+            TestCase("bb", "ss", "be", "be"),
+            TestCase("si", "be", "ss", "ss"),
+        ]
+        for cas in cases:
+            # Each unit gets probability 0.7 for its label and 0.1 for the others
+            mat = np.full([len(cas.str), 4], 0.1)
+            for i, label in enumerate(cas.str):
+                mat[i, "bies".index(label)] = 0.7
+            for method, expected in [("argmax", cas.expected_argmax), ("viterbi", cas.expected_viterbi),
+                                     ("normalize", cas.expected_normalize)]:
+                bies = Bies(input_bies=mat, input_type="mat")
+                self.assertEqual(cas.str, bies.str)
+                bies.decode(method)
+                self.assertEqual(expected, bies.str)
+
+    def test_normalize_same_as_normalize_bies(self):
+        # decode_normalized gives the labels that evaluation has always used, for all sequences of up to 6 labels
+        for length in range(1, 7):
+            for labels in itertools.product(range(4), repeat=length):
+                mat = np.full([length, 4], 0.1)
+                mat[np.arange(length), labels] = 0.7
+                bies = Bies(input_bies=mat, input_type="mat")
+                bies.normalize_bies()
+                self.assertEqual(bies.str, "".join("bies"[label] for label in decode_bies(mat, "normalize")))
+
+    def test_viterbi_is_valid_and_optimal(self):
+        valid_next = {"b": "ie", "i": "ie", "e": "bs", "s": "bs"}
+        rng = np.random.default_rng(0)
+        for length in range(1, 30):
+            mat = rng.dirichlet(np.ones(4), size=length)
+            scores = {}
+            for method in ["argmax", "viterbi"]:
+                labels = decode_bies(mat, method)
+                bies_str = "".join("bies"[label] for label in labels)
+                self.assertIn(bies_str[0], "bs")
+                self.assertIn(bies_str[-1], "es")
+                for i in range(length - 1):
+                    self.assertIn(bies_str[i + 1], valid_next[bies_str[i]])
+                scores[method] = np.sum(np.log(mat[np.arange(length), labels]))
+            self.assertGreaterEqual(scores["viterbi"], scores["argmax"] - 1e-9)
+
+    def test_get_word_starts(self):
+        self.assertEqual([0, 3, 4], Bies(input_bies="biesbe", input_type="str").get_word_starts().tolist())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,36 @@
+from collections import namedtuple
+import unittest
+import threading
+from lstm_word_segmentation.break_iterators import get_break_iterator, get_brkpoints, get_brkpoints_list
+
+
+class TestBreakIterators(unittest.TestCase):
+    def test_get_brkpoints(self):
+        TestCase = namedtuple("TestCase", ["input", "iterator_type", "expected"])
+        cases = [
+            TestCase("", "character", [0]),
+            TestCase("การเดินทางใน", "character", [0, 1, 2, 3, 4, 6, 7, 8, 9, 10, 11, 12]),
+            TestCase("hello world", "word", [0, 5, 6, 11]),
+            # Code points outside the BMP are two UTF-16 code units in ICU, but one code point in Python
+            TestCase("a😀ข", "character", [0, 1, 2, 3]),
+            TestCase("😀😀ทำสิ่งต่างๆ", "character", [0, 1, 2, 4, 7, 8, 10, 11, 12, 13]),
+            TestCase("😀😀ทำสิ่งต่างๆ", "word", [0, 1, 2, 4, 8, 13]),
+            TestCase("👍🏽x𑁇", "character", [0, 2, 3, 4]),
+        ]
+        for cas in cases:
+            self.assertEqual(cas.expected, get_brkpoints(cas.input, cas.iterator_type).tolist())
+            self.assertEqual(cas.expected, get_brkpoints_list(cas.input, cas.iterator_type))
+
+    def test_pool(self):
+        iterator = get_break_iterator("word")
+        self.assertIs(iterator, get_break_iterator("word"))
+        self.assertIsNot(iterator, get_break_iterator("character"))
+        other_thread_iterators = []
+        thread = threading.Thread(target=lambda: other_thread_iterators.append(get_break_iterator("word")))
+        thread.start()
+        thread.join()
+        self.assertIsNot(iterator, other_thread_iterators[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+from pathlib import Path
+import numpy as np
+from lstm_word_segmentation.feature_cache import FeatureCache, get_feature_key, get_file_digest
+
+
+class TestFeatureCache(unittest.TestCase):
+    def test_get_or_make(self):
+        key = get_feature_key("BEST", "training", "codepoints", [{"ก": 0}])
+        self.assertNotEqual(key, get_feature_key("BEST", "validation", "codepoints", [{"ก": 0}]))
+        self.assertNotEqual(key, get_feature_key("BEST", "training", "codepoints", [{"ก": 1}]))
+        made = []
+
+        def make_arrays():
+            made.append(True)
+            return {"x": np.arange(10, dtype=np.int32), "y": np.eye(4)[np.arange(10) % 4]}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = FeatureCache(tmp_dir)
+            self.assertIsNone(cache.load(key, ["x", "y"]))
+            first = cache.get_or_make(key, ["x", "y"], make_arrays)
+            second = cache.get_or_make(key, ["x", "y"], make_arrays)
+            self.assertEqual(1, len(made))
+            self.assertIsInstance(second["x"], np.memmap)
+            for name in ["x", "y"]:
+                self.assertEqual(first[name].dtype, second[name].dtype)
+                np.testing.assert_array_equal(first[name], second[name])
+            cache.clear()
+            self.assertIsNone(cache.load(key, ["x", "y"]))
+
+    def test_get_file_digest(self):
+        # A file rewritten with the same size and modification time gets a different digest
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir, "test.txt")
+            file.write_text("|การ|เดินทาง|ใน|\n")
+            file_stat = file.stat()
+            digest = get_file_digest(file)
+            file.write_text("|การเดินทาง|ใน|\n|")
+            os.utime(str(file), ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+            self.assertEqual(file_stat.st_size, file.stat().st_size)
+            self.assertEqual(file_stat.st_mtime_ns, file.stat().st_mtime_ns)
+            self.assertNotEqual(digest, get_file_digest(file))
+            self.assertEqual(get_file_digest(file), get_file_digest(file))
+
+
+if __name__ == "__main__":
+    unittest.main()
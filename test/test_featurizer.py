@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from lstm_word_segmentation.featurizer import Featurizer, GeneralizedVectorMemo, get_generalized_vec
+from lstm_word_segmentation.grapheme_cluster import GraphemeCluster
+from lstm_word_segmentation.code_point import CodePoint
+from lstm_word_segmentation.line import Line
+from lstm_word_segmentation.word_segmenter import WordSegmenter
+
+
+class TestFeaturizer(unittest.TestCase):
+    def test_same_as_objects(self):
+        word_segmenter = WordSegmenter(input_name="test", input_n=50, input_t=10000, input_clusters_num=350,
+                                       input_embedding_dim=16, input_hunits=23, input_dropout_rate=0.2,
+                                       input_output_dim=4, input_epochs=1, input_training_data="BEST",
+                                       input_evaluation_data="BEST", input_language="Thai",
+                                       input_embedding_type="generalized_vectors_123")
+        text = "ทำสิ่งต่างๆ ได้มากขึ้น 123 abc"
+        char_brkpoints = Line(text, "unsegmented").char_brkpoints
+        clusters = [text[char_brkpoints[i]: char_brkpoints[i + 1]] for i in range(len(char_brkpoints) - 1)]
+        objects = [GraphemeCluster(cluster, word_segmenter.graph_clust_dic, word_segmenter.letters_dic)
+                   for cluster in clusters]
+        for embedding_type in ["grapheme_clusters_tf", "generalized_vectors", "codepoints"]:
+            featurizer = Featurizer(embedding_type=embedding_type, graph_clust_dic=word_segmenter.graph_clust_dic,
+                                    codepoint_dic=word_segmenter.codepoint_dic, letters_dic=word_segmenter.letters_dic)
+            features = featurizer.featurize(text)
+            if embedding_type == "grapheme_clusters_tf":
+                self.assertEqual(np.int32, features.dtype)
+                self.assertEqual([obj.graph_clust_id for obj in objects], features.tolist())
+            elif embedding_type == "generalized_vectors":
+                np.testing.assert_almost_equal(np.array([obj.generalized_vec for obj in objects]), features)
+            else:
+                expected = [CodePoint(ch, word_segmenter.codepoint_dic).codepoint_id for ch in text]
+                self.assertEqual(expected, features.tolist())
+            self.assertEqual(len(featurizer.featurize("")), 0)
+
+    def test_codepoint_table(self):
+        codepoint_dic = {"ข": 0, "ก": 1, "ๅ": 2}
+        featurizer = Featurizer(embedding_type="codepoints", graph_clust_dic={}, codepoint_dic=codepoint_dic,
+                                letters_dic={})
+        # Code points below, inside, and above the table, and outside of the Basic Multilingual Plane
+        text = "a\u0e00กขฃๅ\u0e46\U0001f600ข"
+        self.assertEqual([3, 3, 1, 0, 3, 2, 3, 3, 0], featurizer.featurize(text).tolist())
+
+    def test_generalized_vec_memo(self):
+        letters_dic = {"ก": 0, "ข": 1}
+        memo = GeneralizedVectorMemo(letters_dic, max_size=3)
+        self.assertEqual([0, 1, 0, 2], memo.get_ids(["ก", "ข", "ก", "a"]).tolist())
+        for cluster, row in zip(["ก", "ข", "a"], memo.vecs):
+            np.testing.assert_almost_equal(get_generalized_vec(cluster, letters_dic), row)
+        self.assertEqual(0, memo.generation)
+
+        # get_ids never resets the memo, so ids of earlier calls stay valid until reset_if_full is called
+        self.assertEqual([3, 1], memo.get_ids(["1", "ข"]).tolist())
+        memo.reset_if_full()
+        self.assertEqual(1, memo.generation)
+        self.assertEqual([0, 1, 0], memo.get_ids(["1", "ข", "1"]).tolist())
+        self.assertEqual(2, len(memo.vecs))
+        np.testing.assert_almost_equal(get_generalized_vec("1", letters_dic), memo.vecs[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
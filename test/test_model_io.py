@@ -0,0 +1,64 @@
+from collections import namedtuple
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+from lstm_word_segmentation.model_io import embedding_from_name, load_model_weights, save_weights_bin, \
+    load_weights_bin, BIN_ALIGNMENT
+
+
+class TestEmbeddingFromName(unittest.TestCase):
+    def test_embedding_from_name(self):
+        TestCase = namedtuple("TestCase", ["name", "expected"])
+        cases = [
+            TestCase("Thai_codepoints_exclusive_model4_heavy", "codepoints"),
+            TestCase("Burmese_graphclust_model5_heavy", "grapheme_clusters_tf"),
+            TestCase("Thai_genvec123_model5_heavy", "generalized_vectors_123"),
+            TestCase("Burmese_genvec1235_model4_heavy", "generalized_vectors_1235"),
+        ]
+        for cas in cases:
+            self.assertEqual(cas.expected, embedding_from_name(cas.name))
+
+
+class TestLoadModelWeights(unittest.TestCase):
+    def test_load_json(self):
+        saved_model = load_model_weights("Thai_graphclust_model4_heavy", file_format="json")
+        self.assertEqual("Thai_graphclust_model4_heavy", saved_model["model"])
+        self.assertEqual(len(saved_model["dic"]) + 1, saved_model["weights"][0].shape[0])
+        shapes = [mat.shape for mat in saved_model["weights"]]
+        self.assertEqual([(350, 16), (16, 92), (23, 92), (92,), (16, 92), (23, 92), (92,), (46, 4), (4,)], shapes)
+
+    def test_bin_round_trip(self):
+        saved_model = load_model_weights("Thai_codepoints_exclusive_model4_heavy", file_format="json")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path.joinpath(Path(tmp_dir), "weights.bin")
+            save_weights_bin(file, model_name=saved_model["model"], embedding_type="codepoints",
+                             weights=saved_model["weights"], dic=saved_model["dic"])
+            for mmap in [True, False]:
+                loaded = load_weights_bin(file, mmap=mmap)
+                self.assertEqual(saved_model["model"], loaded["model"])
+                self.assertEqual("codepoints", loaded["embedding"])
+                self.assertEqual(saved_model["dic"], loaded["dic"])
+                for expected, actual in zip(saved_model["weights"], loaded["weights"]):
+                    np.testing.assert_array_equal(expected, actual)
+                    if mmap:
+                        self.assertEqual(0, actual.offset % BIN_ALIGNMENT)
+                del loaded
+
+    def test_bin_header_sizes(self):
+        # Headers of all lengths around the alignment boundaries fit before the weights
+        shapes = [(5, 2), (2, 8), (2, 8), (8,), (2, 8), (2, 8), (8,), (4, 4), (4,)]
+        weights = [np.arange(np.prod(shape), dtype=np.float32).reshape(shape) for shape in shapes]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path.joinpath(Path(tmp_dir), "weights.bin")
+            for length in range(2 * BIN_ALIGNMENT):
+                dic = {"a" * length: 0, "b": 1}
+                save_weights_bin(file, model_name="test", embedding_type="codepoints", weights=weights, dic=dic)
+                loaded = load_weights_bin(file, mmap=False)
+                self.assertEqual(dic, loaded["dic"])
+                for expected, actual in zip(weights, loaded["weights"]):
+                    np.testing.assert_array_equal(expected, actual)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from lstm_word_segmentation.parallel import parallel_map
+
+
+def _square(x):
+    return x * x
+
+
+class TestParallelMap(unittest.TestCase):
+    def test_order(self):
+        expected = [x * x for x in range(50)]
+        for jobs in [1, 3]:
+            self.assertEqual(expected, list(parallel_map(_square, (x for x in range(50)), jobs)))
+        self.assertEqual([], list(parallel_map(_square, [], 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
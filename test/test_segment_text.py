@@ -0,0 +1,37 @@
+import unittest
+import os
+import select
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent.absolute()
+
+
+class TestSegmentText(unittest.TestCase):
+    @unittest.skipIf(os.name != "posix", "select does not work on pipes on this platform")
+    def test_lines_one_at_a_time_through_a_pipe(self):
+        # With the default micro-batch of 256 lines, each line must still be segmented before the next one is written
+        process = subprocess.Popen([sys.executable, str(Path.joinpath(REPO_DIR, "segment_text.py")), "-f", "text"],
+                                   cwd=str(REPO_DIR), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL)
+        try:
+            outputs = []
+            for line in ["ทำสิ่งต่างๆได้มากขึ้น", "เพราะเขาเห็นโอกาสในการซื้อ", "การเดินทางใน"]:
+                process.stdin.write((line + "\n").encode("utf-8"))
+                process.stdin.flush()
+                ready = select.select([process.stdout], [], [], 60)[0]
+                self.assertTrue(ready, "no output for a line while the input is still open")
+                outputs.append(process.stdout.readline().decode("utf-8").rstrip("\n"))
+                self.assertEqual(line, outputs[-1].replace("|", ""))
+            process.stdin.close()
+            self.assertEqual(b"", process.stdout.read())
+            self.assertEqual(0, process.wait(timeout=60))
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+from collections import namedtuple
+import unittest
+from lstm_word_segmentation.segmentation_cache import SegmentationCache, split_chunks
+from lstm_word_segmentation.word_segmenter import pick_lstm_model
+
+
+class TestSplitChunks(unittest.TestCase):
+    def test_split_chunks(self):
+        TestCase = namedtuple("TestCase", ["input", "expected"])
+        cases = [
+            TestCase("", []),
+            TestCase("การเดินทางใน", ["การเดินทางใน"]),
+            TestCase("ข่าวด่วน: ฝนตก  หนัก", ["ข่าวด่วน", ": ฝนตก", "  หนัก"]),
+            TestCase(" (abc) ", [" (abc", ") "]),
+            # Punctuation and symbols outside of the Basic Multilingual Plane (Brahmi danda, an emoji) are delimiters
+            TestCase("ab\U00011047cd \U0001F600ef", ["ab", "\U00011047cd", " \U0001F600ef"]),
+        ]
+        for cas in cases:
+            self.assertEqual(cas.expected, split_chunks(cas.input))
+
+
+class TestSegmentationCache(unittest.TestCase):
+    def test_lru(self):
+        cache = SegmentationCache(max_entries=2)
+        cache.put("model", "a", [0, 1])
+        cache.put("model", "b", [0, 1])
+        self.assertEqual((0, 1), cache.get("model", "a"))
+        cache.put("model", "c", [0, 1])
+        self.assertIsNone(cache.get("model", "b"))
+        self.assertIsNone(cache.get("other model", "a"))
+        self.assertEqual((0, 1), cache.get("model", "c"))
+        stats = cache.get_stats()
+        self.assertEqual((2, 2, 2, 1), (stats["entries"], stats["hits"], stats["misses"], stats["evictions"]))
+
+    def test_byte_limit(self):
+        cache = SegmentationCache(max_bytes=1000)
+        for i in range(100):
+            cache.put("model", "chunk {}".format(i), [0, 5, 7])
+        self.assertLessEqual(cache.get_stats()["bytes"], 1000)
+        self.assertGreater(len(cache), 0)
+        self.assertEqual(100, len(cache) + cache.evictions)
+
+    def test_word_segmenter(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        lines = ["หน้าแรก | ข่าว | กีฬา", "ข่าว | กีฬา", ""]
+        cache = SegmentationCache()
+        word_segmenter.set_cache(cache)
+        offsets = word_segmenter.segment_lines(lines, output="offsets")
+        # Chunks are "หน้าแรก", " | ข่าว", " | กีฬา", and "ข่าว"
+        self.assertEqual(4, cache.misses)
+        self.assertEqual(offsets, word_segmenter.segment_lines(lines, output="offsets"))
+        self.assertEqual(4, cache.hits)
+        words = [lines[0][offsets[0][i]: offsets[0][i + 1]] for i in range(len(offsets[0]) - 1)]
+        self.assertEqual("|" + "|".join(words) + "|", word_segmenter.segment_arbitrary_line(lines[0]))
+        self.assertEqual("|", word_segmenter.segment_arbitrary_line(""))
+        word_segmenter.set_cache(None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+import asyncio
+import tempfile
+from pathlib import Path
+from lstm_word_segmentation.word_segmenter import pick_lstm_model
+from lstm_word_segmentation.server import SegmentationServer, SegmentationClient, MAX_PIPELINED_REQUESTS
+
+
+class _FailingWriter:
+    """
+    A StreamWriter whose connection was reset by the client.
+    """
+    def __init__(self):
+        self.closed = False
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError()
+
+    def close(self):
+        self.closed = True
+
+
+class TestSegmentationServer(unittest.TestCase):
+    def test_server(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_codepoints_exclusive_model4_heavy", embedding="codepoints",
+                                         train_data="BEST", eval_data="BEST")
+        texts = ["ทำสิ่งต่างๆ ได้มากขึ้นขณะที่อุปกรณ์ล็อกและชาร์จอยู่ด้วยโหมดแอมเบียนท์", "เพราะเขาเห็นโอกาสในการซื้อ",
+                 "", "การเดินทางใน"] * 10
+        expected = word_segmenter.segment_lines(texts, output="offsets")
+
+        async def run(unix_path):
+            server = SegmentationServer(word_segmenter, max_batch_size=8, max_wait=0.01)
+            await server.start(unix_path=unix_path)
+            clients = [await SegmentationClient().connect(unix_path=unix_path) for _ in range(3)]
+            results = await asyncio.gather(*[client.segment_many(texts) for client in clients])
+            stats = await clients[0].get_stats()
+            for client in clients:
+                await client.close()
+            await server.close()
+            return results, stats
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results, stats = asyncio.run(run(str(Path.joinpath(Path(tmp_dir), "segmenter.sock"))))
+        for result in results:
+            self.assertEqual(expected, result)
+        self.assertEqual(3 * len(texts), stats["requests"])
+        self.assertGreaterEqual(stats["batches"] * 8, stats["requests"])
+        self.assertGreater(stats["mean_batch_size"], 1)
+        self.assertIsNotNone(stats["latency_p99_ms"])
+
+    def test_long_request(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_codepoints_exclusive_model4_heavy", embedding="codepoints",
+                                         train_data="BEST", eval_data="BEST")
+        text = "เพราะเขาเห็นโอกาสในการซื้อ"
+        expected = word_segmenter.segment_lines([text], output="offsets")[0]
+
+        async def run(unix_path):
+            # Requests of more than 64 KiB (asyncio's default limit) are served, and a request longer than the limit of
+            # the server gets an error response without closing the connection
+            server = SegmentationServer(word_segmenter, max_request_size=2 ** 17)
+            await server.start(unix_path=unix_path)
+            client = await SegmentationClient().connect(unix_path=unix_path)
+            responses = await client._request_many([{"text": text, "padding": "x" * 2 ** 16}, {"text": text},
+                                                    {"text": text, "padding": "x" * 2 ** 18}, {"text": text}])
+            await client.close()
+            await server.close()
+            return responses
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            responses = asyncio.run(run(str(Path.joinpath(Path(tmp_dir), "segmenter.sock"))))
+        self.assertEqual([expected, expected, None, expected], [response.get("offsets") for response in responses])
+        self.assertIn("longer than", responses[2]["error"])
+
+    def test_failed_writer(self):
+        # When the client resets the connection, the connection is closed even if the queue of responses is full
+        server = SegmentationServer(word_segmenter=None)
+
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b'{"stats": true}\n' * (2 * MAX_PIPELINED_REQUESTS))
+            writer = _FailingWriter()
+            await asyncio.wait_for(server._handle_connection(reader, writer), 10)
+            return writer
+
+        self.assertTrue(asyncio.run(run()).closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
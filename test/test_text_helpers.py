@@ -1,6 +1,7 @@
 from collections import namedtuple
 import unittest
-from lstm_word_segmentation.text_helpers import remove_tags, clean_line, normalize_string
+from lstm_word_segmentation.text_helpers import remove_tags, clean_line, normalize_string, join_lines_in_blocks
+from lstm_word_segmentation.line import Line
 
 
 class TestRemoveTags(unittest.TestCase):
@@ -142,5 +143,21 @@ class TestNormalizeString(unittest.TestCase):
             self.assertEqual(cas.out_str, actual, cas)
 
 
+class TestJoinLinesInBlocks(unittest.TestCase):
+    def test_join_lines_in_blocks(self):
+        lines = ["การเดินทางใน", "ัทดสอบ", "abc ก", "ทำสิ่งต่างๆ ได้มากขึ้น", "\u200dทดสอบ", "เพราะเขาเห็นโอกาส"] * 3
+        blocks = list(join_lines_in_blocks(lines, block_size=1, segmented=False))
+        self.assertEqual(" ".join(lines), " ".join(blocks))
+        # Blocks never end before a line that starts with a combining mark or a zero width joiner
+        self.assertEqual(12, len(blocks))
+        self.assertEqual(Line(" ".join(lines), "unsegmented").icu_segmented,
+                         " ".join(Line(block, "unsegmented").icu_segmented for block in blocks))
+
+        segmented_lines = [Line(line, "unsegmented").icu_segmented for line in lines] + [""]
+        blocks = list(join_lines_in_blocks(segmented_lines, block_size=1))
+        self.assertEqual(" ".join(segmented_lines), " ".join(blocks))
+        self.assertEqual([], list(join_lines_in_blocks([])))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import contextlib
+import io
+import itertools
+import tempfile
+from pathlib import Path
+import numpy as np
+from lstm_word_segmentation.accuracy import Accuracy
+from lstm_word_segmentation.bies import Bies
+from lstm_word_segmentation.word_segmenter import pick_lstm_model, KerasBatchGenerator, _get_length_buckets
+
+
+class TestSegmentLongLine(unittest.TestCase):
+    def test_same_as_full_line(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        line = "ทำสิ่งต่างๆ ได้มากขึ้นขณะที่อุปกรณ์ล็อกและชาร์จอยู่ด้วยโหมดแอมเบียนท์ "
+        text = line * 30
+        expected = word_segmenter.segment_arbitrary_line(text).strip("|").split("|")
+        words = list(word_segmenter.segment_long_line(text, window=200, overlap=50))
+        self.assertEqual(expected, words)
+        pieces = (text[i: i + 17] for i in range(0, len(text), 17))
+        self.assertEqual(words, list(word_segmenter.segment_long_line(pieces, window=200, overlap=50)))
+        self.assertEqual([], list(word_segmenter.segment_long_line("")))
+
+    def test_long_varied_line(self):
+        # A line of about 2500 code points of different sentences, which is segmented in 9 windows
+        word_segmenter = pick_lstm_model(model_name="Thai_codepoints_exclusive_model7_heavy", embedding="codepoints",
+                                         train_data="exclusive BEST", eval_data="exclusive BEST")
+        sentences = ["ทำสิ่งต่างๆได้มากขึ้นขณะที่อุปกรณ์ล็อกและชาร์จอยู่ด้วยโหมดแอมเบียนท์",
+                     "เพราะเขาเห็นโอกาสในการซื้อ", "การเดินทางใน", "นั่งนายกฯต่อสมัยหน้า", "พร้อมจัดตั้ง",
+                     "ข่าวด่วน: ฝนตกหนักในกรุงเทพ"]
+        text = "".join(sentences[(i * i + 3 * i) % len(sentences)] for i in range(80))
+        expected = word_segmenter.segment_arbitrary_line(text).strip("|").split("|")
+        self.assertEqual(expected, list(word_segmenter.segment_long_line(text, window=300, overlap=50)))
+        offsets = list(word_segmenter.segment_long_line(text, window=300, overlap=50, output="offsets"))
+        self.assertEqual(word_segmenter.segment_lines([text], output="offsets")[0], offsets)
+        self.assertEqual([0], list(word_segmenter.segment_long_line("", output="offsets")))
+
+
+class TestSegmentLines(unittest.TestCase):
+    def test_non_bmp_characters(self):
+        # Offsets are in code points, also for characters that are surrogate pairs in the UTF-16 offsets of ICU
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        lines = ["a😀ข", "😀😀ทำสิ่งต่างๆ"]
+        self.assertEqual([[0, 2, 3], [0, 2, 4, 8, 13]], word_segmenter.segment_lines(lines, output="offsets"))
+        self.assertEqual(["|😀😀|ทำ|สิ่ง|ต่างๆ|"], word_segmenter.segment_lines(lines[1:]))
+
+
+class TestTestTextsLineByLine(unittest.TestCase):
+    def test_parallel_same_as_serial(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        lines = ["|ทำ|สิ่ง|ต่างๆ| |ได้|มาก|ขึ้น|", "|เพราะ|เขา|เห็น|โอกาส|ใน|การ|ซื้อ|", "|การ|เดินทาง|ใน|",
+                 "|นั่ง|นายกฯ|ต่อ|สมัย|หน้า|", "|พร้อม|จัด|ตั้ง|"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = [Path(tmp_dir, "a.txt"), Path(tmp_dir, "b.txt")]
+            files[0].write_text("\n".join(lines * 3) + "\n")
+            files[1].write_text("\n".join(lines[::-1]) + "\n")
+            serial = word_segmenter._test_texts_line_by_line(files, [-1, 4], verbose=False, jobs=1)
+            parallel = word_segmenter._test_texts_line_by_line(files, [-1, 4], verbose=False, jobs=3)
+            one_by_one = word_segmenter._test_texts_line_by_line(files, [-1, 4], verbose=False, jobs=1, batch_size=1)
+        self.assertEqual([vars(accuracy) for accuracy in serial], [vars(accuracy) for accuracy in parallel])
+        self.assertEqual([vars(accuracy) for accuracy in serial], [vars(accuracy) for accuracy in one_by_one])
+        # Only the first 4 lines of the second file are tested
+        self.assertEqual(18, serial[1].true_words)
+
+    def test_parallel_verbose_output_in_order(self):
+        # With jobs > 1 the accuracy of each file is printed by this process, in the order of the files
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        lines = ["|ทำ|สิ่ง|ต่างๆ| |ได้|มาก|ขึ้น|", "|เพราะ|เขา|เห็น|โอกาส|ใน|การ|ซื้อ|", "|การ|เดินทาง|ใน|"]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = [Path(tmp_dir, "{}.txt".format(i)) for i in range(4)]
+            for i, file in enumerate(files):
+                file.write_text("\n".join(lines[i % len(lines):] * (i + 1)) + "\n")
+            outputs = []
+            for jobs in [1, 3]:
+                with contextlib.redirect_stdout(io.StringIO()) as output:
+                    word_segmenter._test_texts_line_by_line(files, [-1] * len(files), verbose=True, jobs=jobs)
+                outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(2 * len(files), len(outputs[1].splitlines()))
+
+    def test_default_decoder_is_normalize_bies(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_graphclust_model4_heavy", embedding="grapheme_clusters_tf",
+                                         train_data="BEST", eval_data="BEST")
+        lines = ["|ทำ|สิ่ง|ต่างๆ| |ได้|มาก|ขึ้น|", "|เพราะ|เขา|เห็น|โอกาส|ใน|การ|ซื้อ|", "|นั่ง|นายกฯ|ต่อ|สมัย|หน้า|"]
+        # The accuracy of the per-line evaluation loop that the published numbers were computed with
+        expected = Accuracy()
+        for line in lines:
+            x_data, y_data = word_segmenter._get_trainable_data(line)
+            y_hat = Bies(input_bies=word_segmenter._manual_predict(x_data), input_type="mat")
+            y_hat.normalize_bies()
+            expected.update(true_bies=Bies(input_bies=y_data, input_type="mat").str, est_bies=y_hat.str)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir, "a.txt")
+            file.write_text("\n".join(lines) + "\n")
+            accuracy = word_segmenter._test_texts_line_by_line([file], [len(lines)], verbose=False, jobs=1)[0]
+        self.assertEqual(vars(expected), vars(accuracy))
+
+
+class TestManualPredictBatch(unittest.TestCase):
+    def test_same_as_manual_predict(self):
+        word_segmenter = pick_lstm_model(model_name="Thai_codepoints_exclusive_model4_heavy", embedding="codepoints",
+                                         train_data="exclusive BEST", eval_data="exclusive BEST")
+        lines = ["ทำสิ่งต่างๆได้มากขึ้น", "เพราะเขาเห็นโอกาสในการซื้อ", "", "การเดินทางใน", "นั่งนายกฯต่อสมัยหน้า"]
+        test_inputs = [word_segmenter._get_featurizer().featurize(line) for line in lines]
+        expected = [word_segmenter._manual_predict(test_input) for test_input in test_inputs]
+        # Exact batches give bitwise the same probabilities, and other batches the same labels
+        for y_hat, expected_y_hat in zip(word_segmenter._manual_predict_batch(test_inputs, exact=True), expected):
+            self.assertTrue(np.array_equal(expected_y_hat, y_hat))
+        for y_hat, expected_y_hat in zip(word_segmenter._manual_predict_batch(test_inputs), expected):
+            self.assertEqual(expected_y_hat.shape, y_hat.shape)
+            self.assertTrue(np.allclose(expected_y_hat, y_hat, atol=1e-5))
+            self.assertEqual(np.argmax(expected_y_hat, axis=1).tolist(), np.argmax(y_hat, axis=1).tolist())
+
+
+class TestGetLengthBuckets(unittest.TestCase):
+    def test_buckets(self):
+        lengths = [5, 1, 300, 3, 3, 40]
+        self.assertEqual([[1, 3], [4, 0], [5], [2]], _get_length_buckets(lengths, batch_size=2, max_units=100))
+        self.assertEqual([[1, 3, 4, 0, 5, 2]], _get_length_buckets(lengths, batch_size=64))
+        self.assertEqual([], _get_length_buckets([], batch_size=64))
+
+
+class TestKerasBatchGenerator(unittest.TestCase):
+    def test_generate(self):
+        x_data = np.arange(53, dtype=np.int32)
+        y_data = np.eye(4)[x_data % 4]
+        generator = KerasBatchGenerator(x_data, y_data, n=5, batch_size=3, seed=0)
+        self.assertEqual(3, generator.get_steps_per_pass())
+        x_first, _ = generator.generate_once("codepoints")
+        self.assertEqual(list(range(15)), x_first.flatten().tolist())
+
+        # Each pass has 3 batches of 3 different windows of 5 consecutive units, taken from all 10 windows
+        for shuffle in [True, False]:
+            batches = list(itertools.islice(generator.generate("codepoints", shuffle=shuffle), 6))
+            for pass_batches in [batches[:3], batches[3:]]:
+                starts = [int(window[0]) for x, _ in pass_batches for window in x]
+                self.assertEqual(9, len(set(starts)))
+                for x, y in pass_batches:
+                    self.assertEqual((3, 5), x.shape)
+                    self.assertEqual((3, 5, 4), y.shape)
+                    self.assertTrue(np.all(x[:, 0] % 5 == 0) and np.all(np.diff(x, axis=1) == 1))
+                    np.testing.assert_array_equal(y_data[x], y)
+            if not shuffle:
+                self.assertEqual(list(range(45)), [int(unit) for x, _ in batches[:3] for unit in x.flatten()])
+        generator = KerasBatchGenerator(x_data, y_data, n=5, batch_size=3, num_clusters=60)
+        x_man, _ = next(generator.generate("grapheme_clusters_man", prefetch=0))
+        self.assertEqual((3, 5, 60), x_man.shape)
+        self.assertTrue(np.all(np.diff(np.argmax(x_man, axis=2), axis=1) == 1))
+
+
+if __name__ == "__main__":
+    unittest.main()